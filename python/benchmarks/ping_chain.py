@@ -0,0 +1,109 @@
+"""
+Measure the simulator throughput: ping between two computers linked by a chain of N switches.
+
+Usage: uv run python benchmarks/ping_chain.py
+"""
+
+from __future__ import annotations
+
+import itertools
+import time
+from typing import TYPE_CHECKING, Self
+
+from wirecraft_server.networking import IPv4Address, IPv4Network, MacAddress, NetworkDevice
+from wirecraft_server.networking.capabilities import (
+    ARPCapability,
+    BasicEthernetFrameCapability,
+    ICMPCapability,
+    IPv4Capability,
+    Layer2Switching,
+    Routing,
+)
+from wirecraft_server.networking.requests import send_ping
+
+if TYPE_CHECKING:
+    from wirecraft_server.networking.utils import EthernetFrameT
+
+CHAIN_LENGTHS = (1, 10, 100)
+DURATION = 1.0
+
+
+def make_computer(index: int, ip: str) -> NetworkDevice:
+    computer = NetworkDevice(mac_address=MacAddress(f"02:00:00:00:00:{index:02x}"))
+    routing = Routing()
+    routing.routing_table.add_route(IPv4Network("192.168.0.0/24"))
+    computer.add_capability(
+        BasicEthernetFrameCapability(),
+        routing,
+        ARPCapability(),
+        IPv4Capability(ip_address=IPv4Address(ip)),
+        ICMPCapability(),
+    )
+    return computer
+
+
+def make_chain(length: int) -> tuple[NetworkDevice, NetworkDevice, list[NetworkDevice]]:
+    computer_a = make_computer(1, "192.168.0.1")
+    computer_b = make_computer(2, "192.168.0.2")
+    switches: list[NetworkDevice] = []
+    for i in range(length):
+        switch = NetworkDevice(mac_address=MacAddress(f"02:00:00:01:{i >> 8:02x}:{i & 0xFF:02x}"))
+        switch.add_capability(Layer2Switching())
+        switches.append(switch)
+
+    computer_a.add_connection(0, switches[0], 0)
+    for left, right in itertools.pairwise(switches):
+        left.add_connection(1, right, 0)
+    switches[-1].add_connection(1, computer_b, 0)
+    return computer_a, computer_b, switches
+
+
+class FrameCounter:
+    """Count the frames handled by the devices (a frame is counted at each hop)."""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self._handle_request = NetworkDevice.handle_request
+
+    def __enter__(self) -> Self:
+        handle_request = self._handle_request
+        counter = self
+
+        def counting(self: NetworkDevice, source: NetworkDevice, frame: EthernetFrameT) -> EthernetFrameT | None:
+            counter.count += 1
+            return handle_request(self, source, frame)
+
+        NetworkDevice.handle_request = counting
+        return self
+
+    def __exit__(self, *args: object):
+        NetworkDevice.handle_request = self._handle_request
+
+
+def measure(length: int) -> tuple[float, float]:
+    """Return the number of pings and frames per second, with a cold ARP cache and MAC address tables."""
+    computer_a, computer_b, switches = make_chain(length)
+    devices = [computer_a, computer_b, *switches]
+    target = IPv4Address("192.168.0.2")
+
+    pings = 0
+    with FrameCounter() as frames:
+        started_at = time.perf_counter()
+        while (elapsed := time.perf_counter() - started_at) < DURATION:
+            for device in devices:
+                device.reset()
+            if not send_ping(computer_a, target):
+                raise RuntimeError("The ping failed")
+            pings += 1
+    return pings / elapsed, frames.count / elapsed
+
+
+def main():
+    print(f"{'switches':>8} {'pings/s':>12} {'frames/s':>12}")
+    for length in CHAIN_LENGTHS:
+        pings, frames = measure(length)
+        print(f"{length:>8} {pings:>12.1f} {frames:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Compare the longest prefix match of RoutingTable with the previous linear scan of the routes.
+
+Usage: uv run python benchmarks/routing_table.py
+"""
+
+from __future__ import annotations
+
+import random
+import timeit
+from ipaddress import IPv4Address, IPv4Network
+
+from wirecraft_server.networking.routing import Route, RoutingTable
+
+SIZES = (10, 1_000, 50_000)
+LOOKUPS = 2_000
+
+
+def make_routes(count: int, rand: random.Random) -> list[Route]:
+    routes = [Route(destination=IPv4Network("0.0.0.0/0"), gateway=IPv4Address("10.0.0.1"), interface=0)]
+    for i in range(count - 1):
+        length = rand.choice((8, 16, 20, 24, 28, 32))
+        network = IPv4Network((rand.getrandbits(32), length), strict=False)
+        routes.append(Route(destination=network, interface=i % 48))
+    return routes
+
+
+def linear_scan(routes: list[Route], target: IPv4Address) -> Route | None:
+    """The previous implementation: the first matching route, in insertion order."""
+    for route in routes:
+        if target in route.destination:
+            return route
+    return None
+
+
+def main():
+    rand = random.Random(42)  # noqa: S311
+    print(f"{'routes':>8} {'bulk load (ms)':>15} {'linear (µs)':>12} {'lpm (µs)':>12} {'lpm cached (µs)':>16}")
+    for size in SIZES:
+        routes = make_routes(size, rand)
+        # The default route is last for the linear scan, otherwise it would match everything.
+        linear_routes = routes[1:] + routes[:1]
+        targets = [IPv4Address(rand.getrandbits(32)) for _ in range(LOOKUPS)]
+
+        load_time = timeit.timeit(lambda: RoutingTable(table=routes), number=1)
+        table = RoutingTable(table=routes)
+        number = min(LOOKUPS, max(1, 200_000 // size))
+        linear_time = (
+            timeit.timeit(lambda: [linear_scan(linear_routes, t) for t in targets[:number]], number=1) / number
+        )
+
+        def lookup_all():
+            table._cache.clear()  # pyright: ignore[reportPrivateUsage]
+            for target in targets:
+                table.get_route(target)
+
+        lpm_time = timeit.timeit(lookup_all, number=10) / (10 * LOOKUPS)
+        cached_time = timeit.timeit(lambda: [table.get_route(t) for t in targets], number=10) / (10 * LOOKUPS)
+        print(
+            f"{size:>8} {load_time * 1e3:>15.2f} {linear_time * 1e6:>12.2f} {lpm_time * 1e6:>12.2f} {cached_time * 1e6:>16.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
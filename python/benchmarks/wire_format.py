@@ -0,0 +1,57 @@
+"""
+Compare the JSON and compact wire formats on `GET_LEVEL_DEVICES_RESPONSE` messages.
+
+Usage: uv run python benchmarks/wire_format.py
+"""
+
+from __future__ import annotations
+
+import timeit
+
+from pydantic_core import from_json
+
+from wirecraft_server.codec import COMPACT_CODEC, JSON_CODEC, Codec, Message
+from wirecraft_server.database import Device
+
+SIZES = (10, 1_000, 100_000)
+
+
+def make_devices(count: int) -> list[Device]:
+    return [
+        Device(
+            id=i,
+            name=f"device-{i}",
+            type=("pc", "switch", "router")[i % 3],
+            x=i * 7 % 1920,
+            y=i * 13 % 1080,
+            level_id=1,
+            ip=f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" if i % 3 != 1 else None,
+        )
+        for i in range(count)
+    ]
+
+
+def measure(codec: Codec, devices: list[Device]) -> tuple[float, float, int]:
+    """Return the encode and decode times (in seconds) and the size (in bytes) of a message."""
+    number = max(1, 10_000 // len(devices))
+    encoded = codec.encode(Message("GET_LEVEL_DEVICES_RESPONSE", devices))
+    decode = (lambda: from_json(encoded)) if codec is JSON_CODEC else (lambda: COMPACT_CODEC.decode_message(encoded))
+
+    encode_time = timeit.timeit(lambda: codec.encode(Message("GET_LEVEL_DEVICES_RESPONSE", devices)), number=number)
+    decode_time = timeit.timeit(decode, number=number)
+    return encode_time / number, decode_time / number, len(encoded)
+
+
+def main():
+    print(f"{'devices':>8} {'format':>18} {'encode (ms)':>12} {'decode (ms)':>12} {'bytes':>12}")
+    for size in SIZES:
+        devices = make_devices(size)
+        for codec in (JSON_CODEC, COMPACT_CODEC):
+            encode_time, decode_time, length = measure(codec, devices)
+            print(
+                f"{size:>8} {codec.protocol:>18} {encode_time * 1000:>12.3f} {decode_time * 1000:>12.3f} {length:>12}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,25 @@
-from typing import Literal
+import asyncio
+import logging
+from typing import Literal, TextIO
 
 import click
 
 from wirecraft_server._logger import init_logger
 from wirecraft_server.context import ctx
+from wirecraft_server.database import connect_database
+from wirecraft_server.database.topology import TopologyImport, export_topology, import_topology
 from wirecraft_server.server import Server
 
 
-@click.command()
+@click.group(invoke_without_command=True)
 @click.option(
-    "--debug", "-d", "debug_options", multiple=True, default=[], envvar="DEBUG", help="Enable debug mode options."
+    "--debug",
+    "-d",
+    "debug_options",
+    multiple=True,
+    default=[],
+    envvar="DEBUG",
+    help="Enable debug mode options (trace: log the messages of the simulated devices).",
 )
 @click.option("--log-level", "-l", "log_level", default="INFO", envvar="LOG_LEVEL", help="Set the log level.")
 @click.option("--bind", "-b", "bind", default="localhost", envvar="BIND", help="Set the bind interface.")
@@ -42,6 +52,233 @@ from wirecraft_server.server import Server
     is_flag=True,
     show_default=True,
 )
+@click.option(
+    "--db-pool-size",
+    "db_pool_size",
+    default=5,
+    envvar="DB_POOL_SIZE",
+    help="Set the number of connections kept open to the database.",
+    type=click.IntRange(min=1),
+    show_default=True,
+)
+@click.option(
+    "--db-max-overflow",
+    "db_max_overflow",
+    default=10,
+    envvar="DB_MAX_OVERFLOW",
+    help="Set the number of connections that can be opened on top of the pool when it is exhausted.",
+    type=click.IntRange(min=0),
+    show_default=True,
+)
+@click.option(
+    "--db-pool-pre-ping",
+    "db_pool_pre_ping",
+    default=False,
+    envvar="DB_POOL_PRE_PING",
+    help="Check the connections before using them (to recover from database restarts).",
+    type=bool,
+    is_flag=True,
+    show_default=True,
+)
+@click.option(
+    "--db-statement-cache-size",
+    "db_statement_cache_size",
+    default=100,
+    envvar="DB_STATEMENT_CACHE_SIZE",
+    help="Set the number of prepared statements cached per PostgreSQL connection (0 to disable, e.g. with pgbouncer).",
+    type=click.IntRange(min=0),
+    show_default=True,
+)
+@click.option(
+    "--sqlite-journal-mode",
+    "sqlite_journal_mode",
+    default="wal",
+    envvar="SQLITE_JOURNAL_MODE",
+    help="Set the SQLite journal mode.",
+    type=click.Choice(["wal", "delete", "truncate", "persist", "memory"], case_sensitive=False),
+    show_default=True,
+)
+@click.option(
+    "--sqlite-synchronous",
+    "sqlite_synchronous",
+    default="normal",
+    envvar="SQLITE_SYNCHRONOUS",
+    help="Set how often SQLite syncs the database file to the disk.",
+    type=click.Choice(["off", "normal", "full"], case_sensitive=False),
+    show_default=True,
+)
+@click.option(
+    "--sqlite-mmap-size",
+    "sqlite_mmap_size",
+    default=256 * 1024 * 1024,
+    envvar="SQLITE_MMAP_SIZE",
+    help="Set the number of bytes of the SQLite database file mapped in memory.",
+    type=click.IntRange(min=0),
+    show_default=True,
+)
+@click.option(
+    "--sqlite-busy-timeout",
+    "sqlite_busy_timeout",
+    default=5,
+    envvar="SQLITE_BUSY_TIMEOUT",
+    help="Set the number of seconds a SQLite connection waits for a lock before failing.",
+    type=click.FloatRange(min=0),
+    show_default=True,
+)
+@click.option(
+    "--send-queue-size",
+    "send_queue_size",
+    default=256,
+    envvar="SEND_QUEUE_SIZE",
+    help="Set the maximum number of messages waiting to be sent to a client.",
+    type=click.IntRange(min=1),
+    show_default=True,
+)
+@click.option(
+    "--slow-client-policy",
+    "slow_client_policy",
+    default="drop",
+    envvar="SLOW_CLIENT_POLICY",
+    help="What to do when the send queue of a client is full: drop the messages, or disconnect the client.",
+    type=click.Choice(["drop", "disconnect"], case_sensitive=False),
+    show_default=True,
+)
+@click.option(
+    "--slow-client-drop-threshold",
+    "slow_client_drop_threshold",
+    default=1024,
+    envvar="SLOW_CLIENT_DROP_THRESHOLD",
+    help="Disconnect a client after this number of consecutive dropped messages.",
+    type=click.IntRange(min=1),
+    show_default=True,
+)
+@click.option(
+    "--max-concurrent-events",
+    "max_concurrent_events",
+    default=8,
+    envvar="MAX_CONCURRENT_EVENTS",
+    help="Set the maximum number of events handled concurrently.",
+    type=click.IntRange(min=1),
+    show_default=True,
+)
+@click.option(
+    "--level-cache-size",
+    "level_cache_size",
+    default=64,
+    envvar="LEVEL_CACHE_SIZE",
+    help="Set the maximum number of levels kept in memory.",
+    type=click.IntRange(min=1),
+    show_default=True,
+)
+@click.option(
+    "--level-cache-ttl",
+    "level_cache_ttl",
+    default=600,
+    envvar="LEVEL_CACHE_TTL",
+    help="Set the number of seconds an idle level is kept in memory.",
+    type=click.FloatRange(min=0),
+    show_default=True,
+)
+@click.option(
+    "--position-flush-interval",
+    "position_flush_interval",
+    default=1,
+    envvar="POSITION_FLUSH_INTERVAL",
+    help="Set the number of seconds between two writes of the device positions to the database.",
+    type=click.FloatRange(min=0),
+    show_default=True,
+)
+@click.option(
+    "--tick-rate",
+    "tick_rate",
+    default=20,
+    envvar="TICK_RATE",
+    help="Set the number of ticks per second.",
+    type=click.FloatRange(min=0, min_open=True),
+    show_default=True,
+)
+@click.option(
+    "--min-tick-rate",
+    "min_tick_rate",
+    default=5,
+    envvar="MIN_TICK_RATE",
+    help="Set the number of ticks per second the server can slow down to when it is overloaded.",
+    type=click.FloatRange(min=0, min_open=True),
+    show_default=True,
+)
+@click.option(
+    "--max-tick-catch-up",
+    "max_tick_catch_up",
+    default=5,
+    envvar="MAX_TICK_CATCH_UP",
+    help="Set the maximum number of late ticks run back to back, the next late ticks are skipped.",
+    type=click.IntRange(min=0),
+    show_default=True,
+)
+@click.option(
+    "--simulation-events-per-tick",
+    "simulation_events_per_tick",
+    default=10_000,
+    envvar="SIMULATION_EVENTS_PER_TICK",
+    help="Set the maximum number of simulation events processed per level at each tick.",
+    type=click.IntRange(min=1),
+    show_default=True,
+)
+@click.option(
+    "--simulation-trace-size",
+    "simulation_trace_size",
+    default=1024,
+    envvar="SIMULATION_TRACE_SIZE",
+    help="Set the number of packet trace events kept per level for the clients (0 to disable the trace).",
+    type=click.IntRange(min=0),
+    show_default=True,
+)
+@click.option(
+    "--grading-backend",
+    "grading_backend",
+    default="thread",
+    envvar="GRADING_BACKEND",
+    help="Where the tests of a level are evaluated when a simulation is launched.",
+    type=click.Choice(["inline", "thread", "process"], case_sensitive=False),
+    show_default=True,
+)
+@click.option(
+    "--grading-workers",
+    "grading_workers",
+    default=4,
+    envvar="GRADING_WORKERS",
+    help="Set the number of threads or processes evaluating the tests.",
+    type=click.IntRange(min=1),
+    show_default=True,
+)
+@click.option(
+    "--grading-timeout",
+    "grading_timeout",
+    default=10,
+    envvar="GRADING_TIMEOUT",
+    help="Set the maximum number of seconds to evaluate the tests of a level.",
+    type=click.FloatRange(min=0, min_open=True),
+    show_default=True,
+)
+@click.option(
+    "--grading-cache-size",
+    "grading_cache_size",
+    default=4096,
+    envvar="GRADING_CACHE_SIZE",
+    help="Set the number of test results kept, to avoid running the tests again when nothing changed.",
+    type=click.IntRange(min=0),
+    show_default=True,
+)
+@click.option(
+    "--grading-prewarm",
+    "grading_prewarm",
+    default=False,
+    envvar="GRADING_PREWARM",
+    help="Fill the ARP and MAC address tables from the topology before running the tests.",
+    type=bool,
+    is_flag=True,
+    show_default=True,
+)
 def main(
     debug_options: list[str],
     log_level: str,
@@ -49,6 +286,31 @@ def main(
     database: str,
     database_type: Literal["sqlite", "postgresql"],
     reset_database: bool = False,
+    db_pool_size: int = 5,
+    db_max_overflow: int = 10,
+    db_pool_pre_ping: bool = False,
+    db_statement_cache_size: int = 100,
+    sqlite_journal_mode: Literal["wal", "delete", "truncate", "persist", "memory"] = "wal",
+    sqlite_synchronous: Literal["off", "normal", "full"] = "normal",
+    sqlite_mmap_size: int = 256 * 1024 * 1024,
+    sqlite_busy_timeout: float = 5,
+    send_queue_size: int = 256,
+    slow_client_policy: Literal["drop", "disconnect"] = "drop",
+    slow_client_drop_threshold: int = 1024,
+    max_concurrent_events: int = 8,
+    level_cache_size: int = 64,
+    level_cache_ttl: float = 600,
+    position_flush_interval: float = 1,
+    tick_rate: float = 20,
+    min_tick_rate: float = 5,
+    max_tick_catch_up: int = 5,
+    simulation_events_per_tick: int = 10_000,
+    simulation_trace_size: int = 1024,
+    grading_backend: Literal["inline", "thread", "process"] = "thread",
+    grading_workers: int = 4,
+    grading_timeout: float = 10,
+    grading_cache_size: int = 4096,
+    grading_prewarm: bool = False,
 ) -> None:
     ctx.set(
         debug_options=debug_options,
@@ -56,12 +318,77 @@ def main(
         database=database,
         database_type=database_type,
         reset_database=reset_database,
+        db_pool_size=db_pool_size,
+        db_max_overflow=db_max_overflow,
+        db_pool_pre_ping=db_pool_pre_ping,
+        db_statement_cache_size=db_statement_cache_size,
+        sqlite_journal_mode=sqlite_journal_mode,
+        sqlite_synchronous=sqlite_synchronous,
+        sqlite_mmap_size=sqlite_mmap_size,
+        sqlite_busy_timeout=sqlite_busy_timeout,
+        send_queue_size=send_queue_size,
+        slow_client_policy=slow_client_policy,
+        slow_client_drop_threshold=slow_client_drop_threshold,
+        max_concurrent_events=max_concurrent_events,
+        level_cache_size=level_cache_size,
+        level_cache_ttl=level_cache_ttl,
+        position_flush_interval=position_flush_interval,
+        tick_rate=tick_rate,
+        min_tick_rate=min_tick_rate,
+        max_tick_catch_up=max_tick_catch_up,
+        simulation_events_per_tick=simulation_events_per_tick,
+        simulation_trace_size=simulation_trace_size,
+        grading_backend=grading_backend,
+        grading_workers=grading_workers,
+        grading_timeout=grading_timeout,
+        grading_cache_size=grading_cache_size,
+        grading_prewarm=grading_prewarm,
     )
     init_logger(log_level)
+    if "trace" in debug_options:
+        # The messages of the simulated devices.
+        logging.getLogger("wirecraft_server.networking.trace").setLevel(logging.DEBUG)
 
+    if click.get_current_context().invoked_subcommand is not None:
+        return
     server = Server()
     server.start()
 
 
+@main.command("import-topology")
+@click.argument("level_id", type=int)
+@click.argument("file", type=click.File("r"), default="-")
+@click.option("--replace", is_flag=True, help="Remove the devices and cables of the level first.")
+def import_topology_command(level_id: int, file: TextIO, replace: bool) -> None:
+    """Import the devices and cables of a level from a JSON Lines FILE (the standard input by default)."""
+
+    async def run() -> TopologyImport:
+        engine = await connect_database()
+        try:
+            return await import_topology(level_id, file, replace=replace)
+        finally:
+            await engine.dispose()
+
+    result = asyncio.run(run())
+    click.echo(f"Imported {result.devices} devices and {result.cables} cables in level {level_id}.", err=True)
+
+
+@main.command("export-topology")
+@click.argument("level_id", type=int)
+@click.argument("file", type=click.File("w"), default="-")
+def export_topology_command(level_id: int, file: TextIO) -> None:
+    """Export the devices and cables of a level to a JSON Lines FILE (the standard output by default)."""
+
+    async def run():
+        engine = await connect_database()
+        try:
+            async for line in export_topology(level_id):
+                file.write(line)
+        finally:
+            await engine.dispose()
+
+    asyncio.run(run())
+
+
 if __name__ == "__main__":
     main()
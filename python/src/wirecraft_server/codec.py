@@ -0,0 +1,195 @@
+"""
+The wire formats used to exchange messages with the clients.
+
+The format is negotiated per connection with the websocket subprotocol:
+- `wirecraft.json` (default): every message is the JSON object `{"t": type, "d": data}`.
+- `wirecraft.compact`: binary frames starting with an opcode byte. The hot events (position updates and device lists)
+  have a fixed struct layout, the other events are sent as a JSON object after the opcode `GENERIC`.
+
+Compact layouts (little endian):
+- device: `<IIii?4sHB` id, level_id, x, y, has_ip, ip (4 bytes), name length, type length; then name and type (utf-8)
+- UPDATE_DEVICE_POSITION: `<Iii` device_id, x, y
+- UPDATE_DEVICE_POSITION_RESPONSE: a device
+- GET_LEVEL_DEVICES_RESPONSE: `<I` number of devices, then the devices
+"""
+
+from __future__ import annotations
+
+import socket
+import struct
+from collections.abc import Callable, Collection
+from enum import IntEnum
+from operator import itemgetter
+from typing import Any, ClassVar
+
+from pydantic_core import from_json, to_json
+
+from .database.models import Device
+
+type DecodedMessage = str | bytes | dict[str, Any]
+
+
+class Message:
+    """
+    A message to send to the clients, encoded at most once per wire format whatever the number of recipients.
+    """
+
+    __slots__ = ("_encoded", "data", "type")
+
+    def __init__(self, type: str, data: Any):
+        self.type = type
+        self.data = data
+        self._encoded: dict[str, bytes] = {}
+
+    def __repr__(self):
+        return f"Message({self.type})"
+
+    def encode(self, codec: Codec) -> bytes:
+        encoded = self._encoded.get(codec.protocol)
+        if encoded is None:
+            encoded = self._encoded[codec.protocol] = codec.encode(self)
+        return encoded
+
+
+class Codec:
+    protocol: ClassVar[str]
+
+    def encode(self, message: Message) -> bytes:
+        raise NotImplementedError
+
+    def decode(self, raw: str | bytes) -> DecodedMessage:
+        """
+        Decode a message received from a client.
+        The result is either a JSON document, or an already decoded `{"t": type, "d": data}` dict.
+        """
+        raise NotImplementedError
+
+
+class JsonCodec(Codec):
+    protocol = "wirecraft.json"
+
+    def encode(self, message: Message) -> bytes:
+        return to_json({"t": message.type, "d": message.data})
+
+    def decode(self, raw: str | bytes) -> DecodedMessage:
+        # The JSON is validated directly by the router.
+        return raw
+
+
+class Opcode(IntEnum):
+    GENERIC = 0
+    UPDATE_DEVICE_POSITION = 1
+    UPDATE_DEVICE_POSITION_RESPONSE = 2
+    GET_LEVEL_DEVICES_RESPONSE = 3
+
+
+_DEVICE = struct.Struct("<IIii?4sHB")
+_POSITION = struct.Struct("<Iii")
+_COUNT = struct.Struct("<I")
+_NO_IP = bytes(4)
+
+
+# The devices are read from their `__dict__`: the SQLAlchemy attribute descriptors are too slow for large lists.
+_device_fields = itemgetter("id", "name", "type", "x", "y", "level_id", "ip")
+
+
+def _encode_device_parts(device: Device, parts: list[bytes]):
+    id, name, type, x, y, level_id, ip = _device_fields(device.__dict__)
+    name = name.encode()
+    type = type.encode()
+    ip_bytes = _NO_IP if ip is None else socket.inet_aton(ip)
+    parts.append(_DEVICE.pack(id, level_id, x, y, ip is not None, ip_bytes, len(name), len(type)))
+    parts.append(name)
+    parts.append(type)
+
+
+def encode_device(device: Device) -> bytes:
+    parts: list[bytes] = []
+    _encode_device_parts(device, parts)
+    return b"".join(parts)
+
+
+def encode_devices(devices: Collection[Device]) -> bytes:
+    parts = [_COUNT.pack(len(devices))]
+    for device in devices:
+        _encode_device_parts(device, parts)
+    return b"".join(parts)
+
+
+def decode_device(raw: bytes, offset: int = 0) -> tuple[dict[str, Any], int]:
+    """Decode a device from `offset`, return the device and the offset of the next data."""
+    id, level_id, x, y, has_ip, ip, name_length, type_length = _DEVICE.unpack_from(raw, offset)
+    offset += _DEVICE.size
+    name = raw[offset : offset + name_length].decode()
+    offset += name_length
+    type = raw[offset : offset + type_length].decode()
+    offset += type_length
+    device = {
+        "id": id,
+        "name": name,
+        "type": type,
+        "x": x,
+        "y": y,
+        "level_id": level_id,
+        "ip": socket.inet_ntoa(ip) if has_ip else None,
+    }
+    return device, offset
+
+
+def decode_devices(raw: bytes, offset: int = 0) -> tuple[list[dict[str, Any]], int]:
+    (count,) = _COUNT.unpack_from(raw, offset)
+    offset += _COUNT.size
+    devices: list[dict[str, Any]] = []
+    for _ in range(count):
+        device, offset = decode_device(raw, offset)
+        devices.append(device)
+    return devices, offset
+
+
+class CompactCodec(Codec):
+    protocol = "wirecraft.compact"
+
+    encoders: ClassVar[dict[str, tuple[Opcode, Callable[[Any], bytes]]]] = {
+        "UPDATE_DEVICE_POSITION_RESPONSE": (Opcode.UPDATE_DEVICE_POSITION_RESPONSE, encode_device),
+        "GET_LEVEL_DEVICES_RESPONSE": (Opcode.GET_LEVEL_DEVICES_RESPONSE, encode_devices),
+    }
+
+    def encode(self, message: Message) -> bytes:
+        encoder = self.encoders.get(message.type)
+        if encoder is None:
+            return bytes((Opcode.GENERIC,)) + to_json({"t": message.type, "d": message.data})
+        opcode, encode = encoder
+        return bytes((opcode,)) + encode(message.data)
+
+    def decode(self, raw: str | bytes) -> DecodedMessage:
+        if isinstance(raw, str):
+            # A text frame is always JSON.
+            return raw
+        opcode = raw[0]
+        if opcode == Opcode.UPDATE_DEVICE_POSITION:
+            device_id, x, y = _POSITION.unpack_from(raw, 1)
+            return {"t": "UPDATE_DEVICE_POSITION", "d": {"device_id": device_id, "x": x, "y": y}}
+        if opcode == Opcode.GENERIC:
+            return raw[1:]
+        raise ValueError(f"Unknown opcode {opcode}")
+
+    @staticmethod
+    def decode_message(raw: bytes) -> tuple[str, Any]:
+        """Decode a message sent by the server (the client side of the format)."""
+        opcode = raw[0]
+        if opcode == Opcode.UPDATE_DEVICE_POSITION_RESPONSE:
+            return "UPDATE_DEVICE_POSITION_RESPONSE", decode_device(raw, 1)[0]
+        if opcode == Opcode.GET_LEVEL_DEVICES_RESPONSE:
+            return "GET_LEVEL_DEVICES_RESPONSE", decode_devices(raw, 1)[0]
+        payload = from_json(raw[1:])
+        return payload["t"], payload["d"]
+
+    @staticmethod
+    def encode_position(device_id: int, x: int, y: int) -> bytes:
+        """Encode an UPDATE_DEVICE_POSITION message (the client side of the format)."""
+        return bytes((Opcode.UPDATE_DEVICE_POSITION,)) + _POSITION.pack(device_id, x, y)
+
+
+JSON_CODEC = JsonCodec()
+COMPACT_CODEC = CompactCodec()
+CODECS: dict[str, Codec] = {codec.protocol: codec for codec in (COMPACT_CODEC, JSON_CODEC)}
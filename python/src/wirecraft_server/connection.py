@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+from collections import deque
+from collections.abc import Callable, Hashable, Iterable
+from typing import Any, Literal
+
+from aiohttp import web
+
+from .codec import JSON_CODEC, Codec, Message
+
+type SlowClientPolicy = Literal["drop", "disconnect"]
+
+logger = logging.getLogger(__name__)
+
+
+class _QueuedMessage:
+    __slots__ = ("key", "message")
+
+    def __init__(self, key: Hashable | None, message: Message):
+        self.key = key
+        self.message = message
+
+
+class Client:
+    """
+    A client connected to the server through a websocket.
+
+    The messages are not sent directly: they are put in a bounded queue, drained by a writer task dedicated to the
+    client. This way, a slow client never blocks the event handlers nor the other clients.
+    The messages are encoded with the wire format negotiated by the client (see `codec`) when they are sent.
+    When the queue is full, the slow client policy applies:
+    - "drop": the new message is dropped. After `drop_threshold` consecutive drops, the client is disconnected.
+    - "disconnect": the client is disconnected right away.
+
+    A message that can't be encoded is logged and dropped. If the websocket fails, the client is disconnected, and
+    `on_disconnect` is called so the server unregisters it right away.
+    """
+
+    def __init__(
+        self,
+        ws: web.WebSocketResponse,
+        max_queue_size: int = 256,
+        policy: SlowClientPolicy = "drop",
+        drop_threshold: int = 1024,
+        codec: Codec = JSON_CODEC,
+        on_disconnect: Callable[[Client], Any] | None = None,
+    ):
+        self.ws = ws
+        self.codec = codec
+        self.on_disconnect = on_disconnect
+        # The level the client is currently playing, set by the subscriptions registry.
+        self.level_id: int | None = None
+
+        self.max_queue_size = max_queue_size
+        self.policy: SlowClientPolicy = policy
+        self.drop_threshold = drop_threshold
+
+        self._queue: deque[_QueuedMessage] = deque()
+        # The queued messages that can be superseded by a newer one, by coalescing key.
+        self._coalescable: dict[Hashable, _QueuedMessage] = {}
+        self._ready = asyncio.Event()
+        self._writer_task: asyncio.Task[None] | None = None
+        self._close_task: asyncio.Task[Any] | None = None
+
+        self.sent_count = 0
+        self.coalesced_count = 0
+        self.dropped_count = 0
+        self._consecutive_drops = 0
+
+    def __repr__(self):
+        return f"Client(level_id={self.level_id})"
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    def start(self):
+        """Start the writer task."""
+        self._writer_task = asyncio.create_task(self._writer())
+
+    async def stop(self):
+        """Stop the writer task. The messages still in the queue are discarded."""
+        if self._writer_task is not None:
+            self._writer_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._writer_task
+            self._writer_task = None
+        self._queue.clear()
+        self._coalescable.clear()
+
+    def send(self, message: Message, key: Hashable | None = None):
+        """
+        Queue a message for the client.
+
+        If a key is given, the message supersedes the queued message with the same key (if it has not been sent yet).
+        """
+        if key is not None and (queued := self._coalescable.get(key)) is not None:
+            queued.message = message
+            self.coalesced_count += 1
+            return
+
+        if len(self._queue) >= self.max_queue_size:
+            self._overflow()
+            return
+
+        queued = _QueuedMessage(key, message)
+        self._queue.append(queued)
+        if key is not None:
+            self._coalescable[key] = queued
+        self._ready.set()
+
+    def _overflow(self):
+        self.dropped_count += 1
+        self._consecutive_drops += 1
+        if self.policy == "disconnect" or self._consecutive_drops >= self.drop_threshold:
+            self.disconnect("send queue full")
+        else:
+            logger.debug("%s send queue is full, message dropped", self)
+
+    def disconnect(self, reason: str):
+        """Close the connection of the client and unregister it."""
+        if self._close_task is not None:
+            return
+        logger.warning("Disconnecting %s: %s", self, reason)
+        self._close_task = asyncio.create_task(self.ws.close())
+        if self.on_disconnect is not None:
+            self.on_disconnect(self)
+
+    async def _writer(self):
+        while True:
+            await self._ready.wait()
+            while self._queue:
+                queued = self._queue.popleft()
+                if queued.key is not None:
+                    del self._coalescable[queued.key]
+                try:
+                    data = queued.message.encode(self.codec)
+                except Exception:
+                    logger.exception("%s failed to encode a %r message, message dropped", self, queued.message.type)
+                    self.dropped_count += 1
+                    continue
+                try:
+                    await self.ws.send_bytes(data)
+                except ConnectionError:
+                    logger.debug("%s connection lost, stop sending messages", self)
+                    self.disconnect("connection lost")
+                    return
+                except Exception:
+                    logger.exception("%s failed to send a message, stop sending messages", self)
+                    self.disconnect("send failed")
+                    return
+                self.sent_count += 1
+                self._consecutive_drops = 0
+            self._ready.clear()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "level_id": self.level_id,
+            "codec": self.codec.protocol,
+            "queue_depth": self.queue_depth,
+            "sent": self.sent_count,
+            "coalesced": self.coalesced_count,
+            "dropped": self.dropped_count,
+        }
+
+
+class LevelSubscriptions:
+    """
+    Registry of the clients playing each level.
+    This is used to send the state updates of a level only to the clients that are displaying it.
+    """
+
+    def __init__(self) -> None:
+        self._levels: dict[int, set[Client]] = {}
+
+    def subscribe(self, client: Client, level_id: int):
+        """Subscribe the client to a level. A client can only be subscribed to a single level at a time."""
+        if client.level_id == level_id:
+            return
+        self.unsubscribe(client)
+        self._levels.setdefault(level_id, set()).add(client)
+        client.level_id = level_id
+        logger.debug("%s subscribed to level %s", client, level_id)
+
+    def unsubscribe(self, client: Client):
+        if client.level_id is None:
+            return
+        clients = self._levels.get(client.level_id)
+        if clients is not None:
+            clients.discard(client)
+            if not clients:
+                del self._levels[client.level_id]
+        client.level_id = None
+
+    def clients(self, level_id: int) -> Iterable[Client]:
+        """Get the clients subscribed to a level."""
+        return self._levels.get(level_id, ())
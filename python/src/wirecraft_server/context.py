@@ -1,7 +1,12 @@
 from __future__ import annotations
 
 from collections.abc import Sequence
-from typing import Any, Literal
+from typing import TYPE_CHECKING, Any, Literal
+
+if TYPE_CHECKING:
+    from .connection import SlowClientPolicy
+    from .database.engine import SQLiteJournalMode, SQLiteSynchronous
+    from .grading import GradingBackend
 
 MISSING: Any = object()
 
@@ -20,6 +25,31 @@ class Context:
         self.database: str = MISSING
         self.database_type: Literal["sqlite", "postgresql"] = MISSING
         self.reset_database: bool = MISSING
+        self.db_pool_size: int = MISSING
+        self.db_max_overflow: int = MISSING
+        self.db_pool_pre_ping: bool = MISSING
+        self.db_statement_cache_size: int = MISSING
+        self.sqlite_journal_mode: SQLiteJournalMode = MISSING
+        self.sqlite_synchronous: SQLiteSynchronous = MISSING
+        self.sqlite_mmap_size: int = MISSING
+        self.sqlite_busy_timeout: float = MISSING
+        self.send_queue_size: int = MISSING
+        self.slow_client_policy: SlowClientPolicy = MISSING
+        self.slow_client_drop_threshold: int = MISSING
+        self.max_concurrent_events: int = MISSING
+        self.level_cache_size: int = MISSING
+        self.level_cache_ttl: float = MISSING
+        self.position_flush_interval: float = MISSING
+        self.tick_rate: float = MISSING
+        self.min_tick_rate: float = MISSING
+        self.max_tick_catch_up: int = MISSING
+        self.simulation_events_per_tick: int = MISSING
+        self.simulation_trace_size: int = MISSING
+        self.grading_backend: GradingBackend = MISSING
+        self.grading_workers: int = MISSING
+        self.grading_timeout: float = MISSING
+        self.grading_cache_size: int = MISSING
+        self.grading_prewarm: bool = MISSING
 
     def set(
         self,
@@ -28,12 +58,62 @@ class Context:
         database: str,
         database_type: Literal["sqlite", "postgresql"],
         reset_database: bool,
+        db_pool_size: int = 5,
+        db_max_overflow: int = 10,
+        db_pool_pre_ping: bool = False,
+        db_statement_cache_size: int = 100,
+        sqlite_journal_mode: SQLiteJournalMode = "wal",
+        sqlite_synchronous: SQLiteSynchronous = "normal",
+        sqlite_mmap_size: int = 256 * 1024 * 1024,
+        sqlite_busy_timeout: float = 5,
+        send_queue_size: int = 256,
+        slow_client_policy: SlowClientPolicy = "drop",
+        slow_client_drop_threshold: int = 1024,
+        max_concurrent_events: int = 8,
+        level_cache_size: int = 64,
+        level_cache_ttl: float = 600,
+        position_flush_interval: float = 1,
+        tick_rate: float = 20,
+        min_tick_rate: float = 5,
+        max_tick_catch_up: int = 5,
+        simulation_events_per_tick: int = 10_000,
+        simulation_trace_size: int = 1024,
+        grading_backend: GradingBackend = "thread",
+        grading_workers: int = 4,
+        grading_timeout: float = 10,
+        grading_cache_size: int = 4096,
+        grading_prewarm: bool = False,
     ) -> None:
         self.debug_options = debug_options
         self.bind = bind
         self.database = database
         self.database_type = database_type
         self.reset_database = reset_database
+        self.db_pool_size = db_pool_size
+        self.db_max_overflow = db_max_overflow
+        self.db_pool_pre_ping = db_pool_pre_ping
+        self.db_statement_cache_size = db_statement_cache_size
+        self.sqlite_journal_mode = sqlite_journal_mode
+        self.sqlite_synchronous = sqlite_synchronous
+        self.sqlite_mmap_size = sqlite_mmap_size
+        self.sqlite_busy_timeout = sqlite_busy_timeout
+        self.send_queue_size = send_queue_size
+        self.slow_client_policy = slow_client_policy
+        self.slow_client_drop_threshold = slow_client_drop_threshold
+        self.max_concurrent_events = max_concurrent_events
+        self.level_cache_size = level_cache_size
+        self.level_cache_ttl = level_cache_ttl
+        self.position_flush_interval = position_flush_interval
+        self.tick_rate = tick_rate
+        self.min_tick_rate = min_tick_rate
+        self.max_tick_catch_up = max_tick_catch_up
+        self.simulation_events_per_tick = simulation_events_per_tick
+        self.simulation_trace_size = simulation_trace_size
+        self.grading_backend = grading_backend
+        self.grading_workers = grading_workers
+        self.grading_timeout = grading_timeout
+        self.grading_cache_size = grading_cache_size
+        self.grading_prewarm = grading_prewarm
 
 
 ctx = Context()
@@ -10,6 +10,8 @@ from sqlalchemy.ext.asyncio import AsyncEngine
 from sqlmodel import SQLModel
 
 from ..context import ctx
+from .cache import level_cache as level_cache
+from .engine import create_database_engine
 from .models import Cable as Cable, Device as Device, LevelState as LevelState
 from .session import async_session as async_session
 
@@ -58,3 +60,22 @@ async def init_db(engine: AsyncEngine):
                 )
                 # await conn.run_sync(SQLModel.metadata.drop_all)
             await conn.run_sync(do_run_migrations)
+
+
+async def connect_database() -> AsyncEngine:
+    """Create the engine of the database configured in the context, bind the sessions to it and run the migrations."""
+    engine = create_database_engine(
+        ctx.database_type,
+        ctx.database,
+        pool_size=ctx.db_pool_size,
+        max_overflow=ctx.db_max_overflow,
+        pool_pre_ping=ctx.db_pool_pre_ping,
+        statement_cache_size=ctx.db_statement_cache_size,
+        sqlite_journal_mode=ctx.sqlite_journal_mode,
+        sqlite_synchronous=ctx.sqlite_synchronous,
+        sqlite_mmap_size=ctx.sqlite_mmap_size,
+        sqlite_busy_timeout=ctx.sqlite_busy_timeout,
+    )
+    async_session.configure(bind=engine)
+    await init_db(engine)
+    return engine
@@ -0,0 +1,364 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from typing import TYPE_CHECKING, Any, Literal
+
+from pydantic import BaseModel, Field
+from sqlmodel import col, select, update
+
+from .models import Cable, Device, LevelState
+from .session import async_session
+
+if TYPE_CHECKING:
+    from ..simulation import LevelNetwork
+
+type ObjectKind = Literal["device", "cable"]
+type ChangeOperation = Literal["add", "update", "remove"]
+
+logger = logging.getLogger(__name__)
+
+
+class ObjectsDiff[T](BaseModel):
+    added: list[T] = []
+    updated: list[T] = []
+    removed: list[int] = []
+
+
+class LevelDiff(BaseModel):
+    """
+    The changes of a level since a given version.
+    If `snapshot` is true, the changes couldn't be computed and `added` contains all the objects of the level.
+    """
+
+    level_id: int
+    version: int
+    snapshot: bool
+    devices: ObjectsDiff[Device] = Field(default_factory=ObjectsDiff[Device])
+    cables: ObjectsDiff[Cable] = Field(default_factory=ObjectsDiff[Cable])
+
+
+class LevelData:
+    """
+    The state of a level, as stored in the database.
+
+    Every change is recorded in a bounded change log with its version, so a client can ask only for the changes since
+    the last version it knows.
+    The simulated network of the level (see `simulation.get_level_network`) is built on the first launch, then patched
+    with the changes of the level.
+    """
+
+    def __init__(
+        self,
+        level_id: int,
+        devices: dict[int, Device],
+        cables: dict[int, Cable],
+        version: int,
+        change_log_size: int = 1024,
+    ):
+        self.level_id = level_id
+        self.devices = devices
+        self.cables = cables
+        self.last_access = time.monotonic()
+        self.network: LevelNetwork | None = None
+
+        self.version = version
+        self.changes: deque[tuple[int, ObjectKind, ChangeOperation, int]] = deque(maxlen=change_log_size)
+        # The changes up to this version are not in the change log anymore (or have never been).
+        self.truncated_version = version
+
+    def __repr__(self):
+        return f"LevelData(level_id={self.level_id}, devices={len(self.devices)}, cables={len(self.cables)})"
+
+    def record(self, version: int, kind: ObjectKind, operation: ChangeOperation, object_id: int):
+        if len(self.changes) == self.changes.maxlen:
+            self.truncated_version = self.changes[0][0]
+        self.changes.append((version, kind, operation, object_id))
+        self.version = version
+
+    def snapshot(self) -> LevelDiff:
+        return LevelDiff(
+            level_id=self.level_id,
+            version=self.version,
+            snapshot=True,
+            devices=ObjectsDiff(added=list(self.devices.values())),
+            cables=ObjectsDiff(added=list(self.cables.values())),
+        )
+
+    def diff(self, since_version: int) -> LevelDiff:
+        """Get the changes since a version, or a snapshot if the change log doesn't go back that far."""
+        if not self.truncated_version <= since_version <= self.version:
+            return self.snapshot()
+
+        # The first operation done on each object since the version.
+        first_operations: dict[ObjectKind, dict[int, ChangeOperation]] = {"device": {}, "cable": {}}
+        for version, kind, operation, object_id in reversed(self.changes):
+            if version <= since_version:
+                break
+            first_operations[kind][object_id] = operation
+
+        return LevelDiff(
+            level_id=self.level_id,
+            version=self.version,
+            snapshot=False,
+            devices=_diff_objects(self.devices, first_operations["device"]),
+            cables=_diff_objects(self.cables, first_operations["cable"]),
+        )
+
+
+def _diff_objects[T](objects: dict[int, T], first_operations: dict[int, ChangeOperation]) -> ObjectsDiff[T]:
+    diff = ObjectsDiff[T]()
+    for object_id, operation in first_operations.items():
+        current = objects.get(object_id)
+        if current is None:
+            # An object both added and removed since the version is unknown to the client.
+            if operation != "add":
+                diff.removed.append(object_id)
+        elif operation == "add":
+            diff.added.append(current)
+        else:
+            diff.updated.append(current)
+    return diff
+
+
+class LevelCache:
+    """
+    In-memory write-through cache of the levels state.
+
+    The devices and cables of the levels that are played are kept in memory, so reads never touch the database.
+    All the writes go through this cache: they are first applied to the database, then to the cached level.
+    The levels that are not accessed for `ttl` seconds are evicted, and there is at most `max_levels` levels cached
+    (the least recently used are evicted first).
+
+    The positions of the devices are an exception: they change at every step of a drag, so they are only applied in
+    memory, and written to the database in batch by `flush_positions` (the last position of a device wins).
+
+    The versions of the changes are shared by all the levels. They are seeded with the current time (in milliseconds),
+    so the versions known by a client before a restart of the server are older than the new ones.
+    """
+
+    def __init__(self, max_levels: int = 64, ttl: float = 600, change_log_size: int = 1024):
+        self.max_levels = max_levels
+        self.ttl = ttl
+        self.change_log_size = change_log_size
+        self._version = time.time_ns() // 1_000_000
+        self._levels: OrderedDict[int, LevelData] = OrderedDict()
+        self._loading: dict[int, asyncio.Task[LevelData]] = {}
+        # Map a device id to its level id, for the events that only reference a device.
+        self._device_levels: dict[int, int] = {}
+        # The positions not written to the database yet, by device id.
+        self._pending_positions: dict[int, tuple[int, int]] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.flushed_positions = 0
+
+    def configure(self, max_levels: int, ttl: float):
+        self.max_levels = max_levels
+        self.ttl = ttl
+
+    def clear(self):
+        self._levels.clear()
+        self._device_levels.clear()
+
+    async def get_level(self, level_id: int) -> LevelData:
+        """Get the state of a level, loading it from the database if needed."""
+        self.evict_idle()
+        level = self._levels.get(level_id)
+        if level is not None:
+            self.hits += 1
+            self._touch(level)
+            return level
+
+        self.misses += 1
+        # Concurrent requests for the same level share the same loading task.
+        task = self._loading.get(level_id)
+        if task is None:
+            task = self._loading[level_id] = asyncio.create_task(self._load(level_id))
+            task.add_done_callback(lambda _: self._loading.pop(level_id, None))
+        return await asyncio.shield(task)
+
+    async def _loaded_level(self, level_id: int) -> LevelData | None:
+        """
+        Get a level if it is cached or being loaded, without loading it.
+
+        The writers use it after their commit: a level whose load started before the commit may not see the new
+        object, so they wait for the load to end and apply their change to the loaded level.
+        """
+        level = self._levels.get(level_id)
+        if level is None and (task := self._loading.get(level_id)) is not None:
+            level = await asyncio.shield(task)
+        return level
+
+    async def sync_level(self, level_id: int, since_version: int) -> LevelDiff:
+        """Get the changes of a level since a version."""
+        level = await self.get_level(level_id)
+        return level.diff(since_version)
+
+    def _record(self, level: LevelData, kind: ObjectKind, operation: ChangeOperation, object_id: int):
+        self._version += 1
+        level.record(self._version, kind, operation, object_id)
+
+    def device_level_id(self, device_id: int) -> int | None:
+        """The id of the level of a device, if the level is cached."""
+        return self._device_levels.get(device_id)
+
+    async def get_device_level(self, device_id: int) -> LevelData:
+        """Get the state of the level a device belongs to."""
+        level_id = self._device_levels.get(device_id)
+        if level_id is None:
+            async with async_session() as session:
+                result = await session.exec(select(Device.level_id).where(Device.id == device_id))
+                level_id = result.one_or_none()
+            if level_id is None:
+                raise ValueError(f"Device {device_id} not found.")
+        return await self.get_level(level_id)
+
+    async def get_device(self, device_id: int) -> Device:
+        level = await self.get_device_level(device_id)
+        return level.devices[device_id]
+
+    async def add_device(self, device: Device) -> Device:
+        async with async_session() as session:
+            session.add(device)
+            await session.commit()
+        if (level := await self._loaded_level(device.level_id)) is not None:
+            level.devices[device.id] = device
+            self._device_levels[device.id] = level.level_id
+            if level.network is not None:
+                level.network.add_device(device)
+            self._record(level, "device", "add", device.id)
+        return device
+
+    async def update_device(self, device_id: int, **values: Any) -> Device:
+        """Update some fields of a device."""
+        level = await self.get_device_level(device_id)
+        device = level.devices[device_id]
+        async with async_session() as session:
+            statement = update(Device).where(col(Device.id) == device_id).values(**values)
+            await session.exec(statement)  # pyright: ignore[reportCallIssue, reportArgumentType] sqlmodel only types selects
+            await session.commit()
+        for name, value in values.items():
+            setattr(device, name, value)
+        if level.network is not None:
+            level.network.update_device(device)
+        self._record(level, "device", "update", device_id)
+        return device
+
+    async def update_device_position(self, device_id: int, x: int, y: int) -> Device:
+        """Move a device. The new position is written to the database on the next `flush_positions`."""
+        level = await self.get_device_level(device_id)
+        device = level.devices[device_id]
+        device.x = x
+        device.y = y
+        self._pending_positions[device_id] = (x, y)
+        self._record(level, "device", "update", device_id)
+        return device
+
+    async def flush_positions(self):
+        """Write the pending positions to the database, in a single batched UPDATE."""
+        if not self._pending_positions:
+            return
+        pending, self._pending_positions = self._pending_positions, {}
+        try:
+            async with async_session() as session:
+                await session.exec(
+                    update(Device),  # pyright: ignore[reportCallIssue, reportArgumentType]
+                    params=[{"id": device_id, "x": x, "y": y} for device_id, (x, y) in pending.items()],
+                )
+                await session.commit()
+        except Exception:
+            # Keep the positions for the next flush, unless they have been moved again in the meantime.
+            for device_id, position in pending.items():
+                self._pending_positions.setdefault(device_id, position)
+            raise
+        self.flushed_positions += len(pending)
+        logger.debug("%s device positions written to the database", len(pending))
+
+    async def add_cable(self, cable: Cable) -> Cable:
+        async with async_session() as session:
+            session.add(cable)
+            await session.commit()
+        if (level := await self._loaded_level(cable.level_id)) is not None:
+            level.cables[cable.id] = cable
+            if level.network is not None:
+                level.network.add_cable(cable)
+            self._record(level, "cable", "add", cable.id)
+        return cable
+
+    def invalidate(self, level_id: int):
+        """Forget a level changed without the cache (e.g. by a bulk import), it is loaded again on its next access."""
+        if (level := self._levels.get(level_id)) is not None:
+            self._evict(level)
+        # The versions known by the clients are now older than the one of the reloaded level, so they get a snapshot.
+        self._version += 1
+
+    def cached_levels(self) -> list[LevelData]:
+        return list(self._levels.values())
+
+    def evict_idle(self):
+        """Evict the levels that have not been accessed for `ttl` seconds."""
+        deadline = time.monotonic() - self.ttl
+        while self._levels:
+            level = next(iter(self._levels.values()))
+            if level.last_access > deadline:
+                break
+            self._evict(level)
+
+    def _touch(self, level: LevelData):
+        level.last_access = time.monotonic()
+        self._levels.move_to_end(level.level_id)
+
+    def _evict(self, level: LevelData):
+        logger.debug("Evicting %r from the cache", level)
+        del self._levels[level.level_id]
+        for device_id in level.devices:
+            self._device_levels.pop(device_id, None)
+        self.evictions += 1
+
+    async def _load(self, level_id: int) -> LevelData:
+        level = await self._read_level(level_id)
+        # The level may have been evicted before its positions were flushed.
+        for device_id, device in level.devices.items():
+            if (position := self._pending_positions.get(device_id)) is not None:
+                device.x, device.y = position
+        self._levels[level_id] = level
+        for device_id in level.devices:
+            self._device_levels[device_id] = level_id
+        while len(self._levels) > self.max_levels:
+            self._evict(next(iter(self._levels.values())))
+        return level
+
+    async def _read_level(self, level_id: int) -> LevelData:
+        version = self._version
+        async with async_session.begin() as session:
+            result = await session.exec(select(LevelState).where(LevelState.id == level_id))
+            if result.one_or_none() is None:
+                session.add(LevelState(id=level_id))
+                await session.flush()
+            devices = (await session.exec(select(Device).where(Device.level_id == level_id))).all()
+            cables = (await session.exec(select(Cable).where(Cable.level_id == level_id))).all()
+
+        return LevelData(
+            level_id,
+            {device.id: device for device in devices},
+            {cable.id: cable for cable in cables},
+            version,
+            self.change_log_size,
+        )
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "levels": len(self._levels),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "pending_positions": len(self._pending_positions),
+            "flushed_positions": self.flushed_positions,
+        }
+
+
+level_cache = LevelCache()
@@ -0,0 +1,87 @@
+"""
+The database engine, tuned for each database type.
+
+- SQLite: the pragmas are set on every new connection. With the WAL journal, the readers don't block the writer (and
+  the other way around), and `synchronous=NORMAL` only syncs the journal at the checkpoints. The busy timeout makes the
+  concurrent writers wait for the lock instead of failing with "database is locked".
+- PostgreSQL: the size of the connection pool, and the prepared statements cache of asyncpg.
+"""
+
+from __future__ import annotations
+
+import logging
+import urllib.parse
+from pathlib import Path
+from typing import Any, Literal
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+type DatabaseType = Literal["sqlite", "postgresql"]
+type SQLiteJournalMode = Literal["wal", "delete", "truncate", "persist", "memory"]
+type SQLiteSynchronous = Literal["off", "normal", "full"]
+
+logger = logging.getLogger(__name__)
+
+
+def database_url(database_type: DatabaseType, database: str) -> str:
+    if database_type == "sqlite":
+        path = Path(database)
+        resolved = path.resolve()
+        encoded_path = urllib.parse.quote(str(resolved))
+        return f"sqlite+aiosqlite:///{encoded_path}"
+    if database_type == "postgresql":
+        return f"postgresql+asyncpg://{database}"
+    raise ValueError(f"Unsupported database type: {database_type}")
+
+
+def create_database_engine(
+    database_type: DatabaseType,
+    database: str,
+    *,
+    pool_size: int = 5,
+    max_overflow: int = 10,
+    pool_pre_ping: bool = False,
+    statement_cache_size: int = 100,
+    sqlite_journal_mode: SQLiteJournalMode = "wal",
+    sqlite_synchronous: SQLiteSynchronous = "normal",
+    sqlite_mmap_size: int = 256 * 1024 * 1024,
+    sqlite_busy_timeout: float = 5,
+) -> AsyncEngine:
+    """
+    Create the engine of the database.
+
+    `pool_size`, `max_overflow` and `pool_pre_ping` configure the connection pool, `statement_cache_size` is the number
+    of prepared statements kept per connection by asyncpg (0 to disable them, e.g. behind pgbouncer).
+    The `sqlite_*` options are the pragmas set on the SQLite connections (the busy timeout is in seconds).
+    """
+    url = database_url(database_type, database)
+    options: dict[str, Any] = {"pool_size": pool_size, "max_overflow": max_overflow, "pool_pre_ping": pool_pre_ping}
+
+    if database_type == "postgresql":
+        # The cache of asyncpg, and the one of the SQLAlchemy adapter on top of it.
+        options["connect_args"] = {
+            "statement_cache_size": statement_cache_size,
+            "prepared_statement_cache_size": statement_cache_size,
+        }
+        return create_async_engine(url, **options)
+
+    engine = create_async_engine(url, **options)
+    pragmas = (
+        f"PRAGMA journal_mode={sqlite_journal_mode}",
+        f"PRAGMA synchronous={sqlite_synchronous}",
+        f"PRAGMA mmap_size={sqlite_mmap_size}",
+        f"PRAGMA busy_timeout={int(sqlite_busy_timeout * 1000)}",
+    )
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection: Any, connection_record: Any):  # pyright: ignore[reportUnusedFunction]
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+    logger.debug("SQLite pragmas: %s", ", ".join(pragmas))
+    return engine
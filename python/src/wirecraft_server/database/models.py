@@ -7,11 +7,11 @@ from ..utils import id_to_mac
 
 class Cable(SQLModel, table=True):
     id: int = Field(default=None, primary_key=True)
-    device_id_1: int = Field(default=None, foreign_key="device.id")
+    device_id_1: int = Field(default=None, foreign_key="device.id", index=True)
     port_1: int
-    device_id_2: int = Field(default=None, foreign_key="device.id")
+    device_id_2: int = Field(default=None, foreign_key="device.id", index=True)
     port_2: int
-    level_id: int = Field(default=None, foreign_key="levelstate.id")
+    level_id: int = Field(default=None, foreign_key="levelstate.id", index=True)
 
 
 class Device(SQLModel, table=True):
@@ -37,7 +37,7 @@ class Device(SQLModel, table=True):
     # frozen: bool = Field(default=False, exclude=True)
     frozen_name: bool = Field(default=False, exclude=True)
     deletable: bool = Field(default=True, exclude=True)
-    level_id: int = Field(default=None, foreign_key="levelstate.id")
+    level_id: int = Field(default=None, foreign_key="levelstate.id", index=True)
     ip: str | None = None
     # default_gateway: str | None = None
     # subnet_mask: str | None = None
@@ -0,0 +1,190 @@
+"""
+Bulk import and export of the topology of a level (its devices and cables), in the JSON Lines format.
+
+Each line is a device or a cable, e.g.:
+```json
+{"kind": "device", "id": 1, "name": "sw1", "type": "switch", "x": 0, "y": 0, "ip": null, ...}
+{"kind": "cable", "device_id_1": 1, "port_1": 1, "device_id_2": 2, "port_2": 1}
+```
+The ids of the devices are only references inside a file: the cables reference their devices by these ids, and the
+imported devices get new ids from the database. A cable must come after its devices (an export writes all the devices
+first).
+
+A whole topology is imported in a single transaction, with the rows inserted by batches (one `executemany` per batch).
+"""
+
+from __future__ import annotations
+
+import logging
+from collections.abc import AsyncIterator, Iterable
+from typing import Annotated, Any, Literal, cast
+
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
+from sqlalchemy import ScalarResult, delete, insert
+from sqlmodel import col, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .cache import level_cache
+from .models import Cable, Device, LevelState
+from .session import async_session
+
+logger = logging.getLogger(__name__)
+
+# The number of rows inserted (or read) at once.
+BATCH_SIZE = 1000
+
+
+class DeviceRecord(BaseModel):
+    kind: Literal["device"] = "device"
+    id: int
+    name: str
+    type: str
+    x: int = 0
+    y: int = 0
+    ip: str | None = None
+    frozen_name: bool = False
+    deletable: bool = True
+
+
+class CableRecord(BaseModel):
+    kind: Literal["cable"] = "cable"
+    device_id_1: int
+    port_1: int
+    device_id_2: int
+    port_2: int
+
+
+# A plain alias (not a `type` statement): `TypeAdapter` is typed to take the annotation itself.
+TopologyRecord = Annotated[DeviceRecord | CableRecord, Field(discriminator="kind")]
+
+_record_adapter: TypeAdapter[DeviceRecord | CableRecord] = TypeAdapter(TopologyRecord)
+
+
+class TopologyImport(BaseModel):
+    """
+    The result of an import: the number of devices and cables added to the level.
+    If the import failed, the error and the number of the invalid line (nothing has been imported then).
+    """
+
+    level_id: int
+    devices: int = 0
+    cables: int = 0
+    error: str | None = None
+    line: int | None = None
+
+
+class TopologyLineError(ValueError):
+    """An invalid line of an imported topology."""
+
+    def __init__(self, line: int, error: Exception):
+        super().__init__(f"Invalid topology line {line}: {error}")
+        self.line = line
+
+
+async def export_topology(level_id: int) -> AsyncIterator[str]:
+    """Yield the lines of the devices, then of the cables of a level, streamed from the database."""
+    # The positions are only written to the database from time to time.
+    await level_cache.flush_positions()
+    async with async_session() as session:
+        devices = await session.stream_scalars(
+            select(Device).where(Device.level_id == level_id).execution_options(yield_per=BATCH_SIZE)
+        )
+        async for device in devices:
+            yield DeviceRecord.model_validate(device, from_attributes=True).model_dump_json() + "\n"
+
+        cables = await session.stream_scalars(
+            select(Cable).where(Cable.level_id == level_id).execution_options(yield_per=BATCH_SIZE)
+        )
+        async for cable in cables:
+            yield CableRecord.model_validate(cable, from_attributes=True).model_dump_json() + "\n"
+
+
+async def import_topology(level_id: int, lines: Iterable[str], *, replace: bool = False) -> TopologyImport:
+    """
+    Add the devices and cables of JSON lines to a level, in a single transaction.
+    With `replace`, the devices and cables of the level are removed first.
+    Raise a `TopologyLineError` if a line is invalid, nothing is imported then.
+    """
+    await level_cache.flush_positions()
+    async with async_session.begin() as session:
+        if await session.get(LevelState, level_id) is None:
+            session.add(LevelState(id=level_id))
+            await session.flush()
+        if replace:
+            await session.exec(delete(Cable).where(col(Cable.level_id) == level_id))  # pyright: ignore[reportCallIssue, reportArgumentType]
+            await session.exec(delete(Device).where(col(Device.level_id) == level_id))  # pyright: ignore[reportCallIssue, reportArgumentType]
+
+        importer = _TopologyImporter(session, level_id)
+        for number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                await importer.add(_record_adapter.validate_json(line))
+            except (ValidationError, ValueError) as exc:
+                raise TopologyLineError(number, exc) from exc
+        await importer.flush()
+
+    # The cached level doesn't know about the new rows.
+    level_cache.invalidate(level_id)
+    logger.info(
+        "Imported %s devices and %s cables in level %s", importer.result.devices, importer.result.cables, level_id
+    )
+    return importer.result
+
+
+class _TopologyImporter:
+    def __init__(self, session: AsyncSession, level_id: int):
+        self.session = session
+        self.level_id = level_id
+        self.result = TopologyImport(level_id=level_id)
+        # The ids of the imported devices, by their ids in the file.
+        self.device_ids: dict[int, int] = {}
+        self.seen_device_ids: set[int] = set()
+        self.devices: list[DeviceRecord] = []
+        self.cables: list[dict[str, Any]] = []
+
+    async def add(self, record: TopologyRecord):
+        if isinstance(record, DeviceRecord):
+            if record.id in self.seen_device_ids:
+                raise ValueError(f"Duplicate device id {record.id}.")
+            self.seen_device_ids.add(record.id)
+            self.devices.append(record)
+            if len(self.devices) >= BATCH_SIZE:
+                await self._flush_devices()
+            return
+
+        if self.devices:
+            await self._flush_devices()
+        values = record.model_dump(exclude={"kind"})
+        for field in ("device_id_1", "device_id_2"):
+            device_id = self.device_ids.get(values[field])
+            if device_id is None:
+                raise ValueError(f"Unknown device id {values[field]}.")
+            values[field] = device_id
+        values["level_id"] = self.level_id
+        self.cables.append(values)
+        if len(self.cables) >= BATCH_SIZE:
+            await self._flush_cables()
+
+    async def flush(self):
+        await self._flush_devices()
+        await self._flush_cables()
+
+    async def _flush_devices(self):
+        if not self.devices:
+            return
+        rows = [device.model_dump(exclude={"kind", "id"}) | {"level_id": self.level_id} for device in self.devices]
+        statement = insert(Device).returning(col(Device.id), sort_by_parameter_order=True)
+        result = await self.session.exec(statement, params=rows)  # pyright: ignore[reportCallIssue, reportArgumentType, reportUnknownVariableType]
+        device_ids = cast("ScalarResult[int]", result.scalars())  # pyright: ignore[reportUnknownMemberType]
+        for device, device_id in zip(self.devices, device_ids, strict=True):
+            self.device_ids[device.id] = device_id
+        self.result.devices += len(self.devices)
+        self.devices.clear()
+
+    async def _flush_cables(self):
+        if not self.cables:
+            return
+        await self.session.exec(insert(Cable), params=self.cables)  # pyright: ignore[reportCallIssue, reportArgumentType]
+        self.result.cables += len(self.cables)
+        self.cables.clear()
@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections.abc import Hashable, Iterable
+from typing import TYPE_CHECKING, Any
+
+from .database import level_cache
+
+if TYPE_CHECKING:
+    from .connection import Client
+    from .handlers_core import Event
+
+logger = logging.getLogger(__name__)
+
+
+class _KeyState:
+    """The events in progress (or waiting) for a given key."""
+
+    __slots__ = ("reads", "write")
+
+    def __init__(self) -> None:
+        self.write: asyncio.Task[None] | None = None
+        self.reads: set[asyncio.Task[None]] = set()
+
+
+class LatencyStats:
+    """Latency statistics of an event type, in seconds."""
+
+    __slots__ = ("count", "max_duration", "max_wait", "total_duration", "total_wait")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_duration = 0.0
+        self.max_duration = 0.0
+
+    def add(self, wait: float, duration: float):
+        self.count += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        self.total_duration += duration
+        self.max_duration = max(self.max_duration, duration)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "count": self.count,
+            "avg_wait": self.total_wait / self.count,
+            "max_wait": self.max_wait,
+            "avg_duration": self.total_duration / self.count,
+            "max_duration": self.max_duration,
+        }
+
+
+def get_event_keys(data: Any, client: Client) -> Iterable[Hashable]:
+    """
+    The keys an event depends on: the client that sent it, and the level / device it touches.
+
+    The events that only reference a device also depend on the level of the device, so they keep their order with the
+    changes of the whole level (a cable added, a launch...). The level is found in the level cache: it is known once
+    the level has been loaded, which is always the case for a client displaying it.
+    """
+    yield client
+    level_id = getattr(data, "level_id", None)
+    if (device_id := getattr(data, "device_id", None)) is not None:
+        yield ("device", device_id)
+        if level_id is None:
+            level_id = level_cache.device_level_id(device_id)
+    if level_id is not None:
+        yield ("level", level_id)
+
+
+class EventExecutor:
+    """
+    Run the events received from the clients concurrently, with at most `max_concurrency` events running at the same
+    time.
+
+    The events that touch the same keys (see `get_event_keys`) keep their order: an event that changes the state of a
+    level waits for all the previous events with a common key, and blocks the next ones. The other events (the reads)
+    only wait for the previous state changes, so consecutive reads run in parallel.
+    """
+
+    def __init__(self, max_concurrency: int):
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._keys: dict[Hashable, _KeyState] = {}
+        self._tasks: set[asyncio.Task[None]] = set()
+        self.latencies: dict[str, LatencyStats] = {}
+
+    def submit(self, event: Event[Any, Any], data: Any, client: Client) -> asyncio.Task[None]:
+        """Schedule the execution of an event. The events must be submitted in the order they are received."""
+        keys = list(get_event_keys(data, client))
+        is_write = event.scope == "level"
+
+        dependencies: set[asyncio.Task[None]] = set()
+        for key in keys:
+            state = self._keys.get(key)
+            if state is None:
+                continue
+            if state.write is not None:
+                dependencies.add(state.write)
+            if is_write:
+                dependencies.update(state.reads)
+
+        task = asyncio.create_task(self._run(event, data, client, dependencies, time.perf_counter()))
+        self._tasks.add(task)
+        task.add_done_callback(lambda task: self._done(task, keys))
+
+        for key in keys:
+            state = self._keys.setdefault(key, _KeyState())
+            if is_write:
+                state.write = task
+                state.reads.clear()
+            else:
+                state.reads.add(task)
+        return task
+
+    async def _run(
+        self,
+        event: Event[Any, Any],
+        data: Any,
+        client: Client,
+        dependencies: set[asyncio.Task[None]],
+        submitted_at: float,
+    ):
+        if dependencies:
+            await asyncio.wait(dependencies)
+        async with self._semaphore:
+            started_at = time.perf_counter()
+            try:
+                await event(data, client)
+            except Exception:
+                logger.exception("Error while handling event %s:", event.type)
+            finished_at = time.perf_counter()
+
+        latency = self.latencies.get(event.type)
+        if latency is None:
+            latency = self.latencies[event.type] = LatencyStats()
+        latency.add(started_at - submitted_at, finished_at - started_at)
+
+    def _done(self, task: asyncio.Task[None], keys: Iterable[Hashable]):
+        self._tasks.discard(task)
+        for key in keys:
+            state = self._keys.get(key)
+            if state is None:
+                continue
+            if state.write is task:
+                state.write = None
+            state.reads.discard(task)
+            if state.write is None and not state.reads:
+                del self._keys[key]
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "in_progress": len(self._tasks),
+            "latencies": {event_type: latency.stats() for event_type, latency in self.latencies.items()},
+        }
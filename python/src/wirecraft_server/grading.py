@@ -0,0 +1,359 @@
+"""
+The evaluation of the tasks of a level, when a simulation is launched.
+
+The tests are CPU bound, so they don't run on the event loop (unless the backend is "inline"): the tasks of the level
+are evaluated in parallel in a pool of threads or processes. A launch has a timeout, the tasks not evaluated in time are
+marked as failed. A test already running can't be interrupted: its worker is abandoned until it finishes, and its result
+is ignored.
+
+Each test runs on its own fork of a state of the network (see `networking.state`): the tests don't change the tables
+learned by the live network and don't depend on each other, so their results can be cached and they can run in any
+order. The state is empty, or pre-warmed from the topology (`prewarm`).
+
+With the "thread" backend the event loop stays responsive, but the tests don't really run in parallel (because of the
+GIL). The threads share the live network of the level (see `simulation.get_level_network`), which is only built once
+and then patched. It is not patched during a launch: LAUNCH_SIMULATION is a change of the level for the event executor,
+so the changes of the level (including the device updates, see `executor.get_event_keys`) wait for it to end. If a
+worker is abandoned after the timeout, the network it reads is detached from the level, and a new one is built on the
+next launch. With the "process" backend the tests do run in parallel, but snapshots of the level and the tasks are sent
+to the worker processes, and each of them builds its own network.
+
+The results of the tests are cached, with a fingerprint of the part of the level they depend on (see
+`Test.dependencies`): a launch only runs the tests whose devices or cables changed since the previous launches.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import functools
+import hashlib
+import logging
+import multiprocessing
+import time
+from collections import OrderedDict
+from collections.abc import Collection, Iterable, Sequence
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Literal
+
+from .database.models import Cable, Device
+from .networking.state import NetworkState
+from .simulation import LevelNetwork, get_level_network
+from .static.tests import TestFailure
+
+if TYPE_CHECKING:
+    from .database.cache import LevelData
+    from .static.base import Level, Task
+    from .static.tests import Test
+
+type GradingBackend = Literal["inline", "thread", "process"]
+# The error message of a failed test, None if the test passed.
+type TestResult = str | None
+
+logger = logging.getLogger(__name__)
+
+
+class LevelSnapshot:
+    """A copy of the devices and the cables of a level, the workers build their own network from it."""
+
+    __slots__ = ("cables", "devices")
+
+    def __init__(self, devices: list[Device], cables: list[Cable]):
+        self.devices = devices
+        self.cables = cables
+
+    @classmethod
+    def from_level(cls, level: LevelData) -> LevelSnapshot:
+        return cls(
+            [Device.model_validate(device.model_dump()) for device in level.devices.values()],
+            [Cable.model_validate(cable.model_dump()) for cable in level.cables.values()],
+        )
+
+    def build(self) -> LevelNetwork:
+        return LevelNetwork.build(self.devices, self.cables)
+
+
+class LevelTopology:
+    """
+    The devices of a level by name, and the cables between them: what the tests depend on, and its fingerprint.
+
+    The fingerprints only use the names, the types and the IP addresses of the devices, and the ports of the cables,
+    so they don't change when the devices are moved (or deleted and added again).
+    """
+
+    __slots__ = ("_by_name", "_cables", "_devices", "_fingerprint")
+
+    def __init__(self, devices: Iterable[Device], cables: Iterable[Cable]):
+        self._devices = {device.id: device for device in devices}
+        self._by_name: dict[str, set[int]] = {}
+        for device in self._devices.values():
+            self._by_name.setdefault(device.name, set()).add(device.id)
+        # The cables connected to each device.
+        self._cables: dict[int, list[Cable]] = {}
+        for cable in cables:
+            self._cables.setdefault(cable.device_id_1, []).append(cable)
+            self._cables.setdefault(cable.device_id_2, []).append(cable)
+        self._fingerprint: str | None = None
+
+    def find(self, name: str) -> set[int]:
+        """The ids of the devices with this name."""
+        return set(self._by_name.get(name, ()))
+
+    def component(self, name: str) -> set[int]:
+        """The ids of the devices with this name, and of all the devices connected to them (directly or not)."""
+        device_ids = self.find(name)
+        stack = list(device_ids)
+        while stack:
+            for cable in self._cables.get(stack.pop(), ()):
+                for device_id in (cable.device_id_1, cable.device_id_2):
+                    if device_id not in device_ids and device_id in self._devices:
+                        device_ids.add(device_id)
+                        stack.append(device_id)
+        return device_ids
+
+    def fingerprint(self, device_ids: Collection[int] | None = None) -> str:
+        """The fingerprint of some devices and the cables between them, or of the whole level."""
+        if device_ids is None:
+            if self._fingerprint is None:
+                self._fingerprint = self.fingerprint(self._devices.keys())
+            return self._fingerprint
+
+        devices = self._devices
+        described_devices = sorted(
+            (device.name, device.type, device.ip or "") for device in map(devices.get, device_ids) if device is not None
+        )
+        described_cables: set[tuple[tuple[str, int], ...]] = set()
+        for device_id in device_ids:
+            for cable in self._cables.get(device_id, ()):
+                if cable.device_id_1 in device_ids and cable.device_id_2 in device_ids:
+                    ends = (
+                        (devices[cable.device_id_1].name, cable.port_1),
+                        (devices[cable.device_id_2].name, cable.port_2),
+                    )
+                    described_cables.add(tuple(sorted(ends)))
+
+        description = repr((described_devices, sorted(described_cables)))
+        return hashlib.blake2b(description.encode(), digest_size=16).hexdigest()
+
+
+def evaluate_tests(
+    tests: Sequence[Test], devices: Sequence[Device], network: LevelNetwork, state: NetworkState
+) -> list[TestResult]:
+    """
+    Run the tests of a task until the first failure, each on its own fork of `state`, return their results.
+    Their traffic is recorded in the trace of the network, if it has one.
+    """
+    trace = network.trace
+    results: list[TestResult] = []
+    for test in tests:
+        try:
+            with state.fork().activate(), trace.activate() if trace is not None else contextlib.nullcontext():
+                test(
+                    devices=devices,
+                    network=network.devices,
+                    map_names=network.names,
+                    reachability=network.reachability,
+                )
+        except TestFailure as e:
+            results.append(e.message)
+            break
+        results.append(None)
+    return results
+
+
+def _evaluate_tests_snapshot(tests: Sequence[Test], snapshot: LevelSnapshot, prewarm: bool) -> list[TestResult]:
+    """Run in the worker processes: the tests are evaluated on a network of their own."""
+    network = snapshot.build()
+    return evaluate_tests(tests, snapshot.devices, network, network.state(prewarm))
+
+
+class Grader:
+    """
+    Evaluate the tasks of the levels with the given backend, using at most `workers` threads or processes.
+    The results of the last `cache_size` tests are kept (least recently used first out).
+    With `prewarm`, the tests start with the ARP and MAC address tables filled from the topology.
+    """
+
+    def __init__(
+        self,
+        backend: GradingBackend = "thread",
+        workers: int = 4,
+        timeout: float = 10,
+        cache_size: int = 4096,
+        prewarm: bool = False,
+    ):
+        self.backend = backend
+        self.workers = workers
+        self.timeout = timeout
+        self.cache_size = cache_size
+        self.prewarm = prewarm
+        self._executor: Executor | None = None
+        # (level id, test, fingerprint of its dependencies) -> result
+        self._results: OrderedDict[tuple[int, str, str], TestResult] = OrderedDict()
+
+        self.launches = 0
+        self.timeouts = 0
+        # The evaluations still running in a worker when their launch timed out.
+        self.abandoned = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.total_duration = 0.0
+        self.max_duration = 0.0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.backend == "process":
+                # The server runs threads (aiosqlite...), forking it is not safe.
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+            else:
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="grader")
+        return self._executor
+
+    async def grade(self, level: Level, level_data: LevelData) -> list[Task]:
+        """Evaluate the tasks of a level, return them with their result."""
+        start = time.perf_counter()
+        deadline = start + self.timeout
+        topology = LevelTopology(level_data.devices.values(), level_data.cables.values())
+
+        tasks: list[Task] = []
+        to_evaluate: list[tuple[Task, list[tuple[int, str, str]]]] = []
+        for level_task in level.tasks:
+            task = level_task.model_copy()
+            tasks.append(task)
+            keys = [(level.id, repr(test), topology.fingerprint(test.dependencies(topology))) for test in task.tests]
+            if not self._use_cached_results(task, keys):
+                to_evaluate.append((task, keys))
+
+        if to_evaluate:
+            if self.backend == "inline":
+                self._grade_inline(to_evaluate, level_data, deadline)
+            else:
+                await self._grade_in_executor(to_evaluate, level_data, deadline)
+
+        duration = time.perf_counter() - start
+        self.launches += 1
+        self.total_duration += duration
+        self.max_duration = max(self.max_duration, duration)
+        return tasks
+
+    def _use_cached_results(self, task: Task, keys: list[tuple[int, str, str]]) -> bool:
+        """Set the result of the task from the cached results of its tests, return False if one of them is missing."""
+        results: list[TestResult] = []
+        for key in keys:
+            if key not in self._results:
+                self.cache_misses += 1
+                return False
+            self._results.move_to_end(key)
+            results.append(self._results[key])
+            if results[-1] is not None:
+                break
+        self.cache_hits += 1
+        self._set_result(task, results)
+        return True
+
+    def _set_result(self, task: Task, results: list[TestResult], keys: list[tuple[int, str, str]] | None = None):
+        """Set the result of a task from the results of its tests, and cache them if their keys are given."""
+        task.completed = not results or results[-1] is None
+        task.error_message = results[-1] if results else None
+        if keys is not None:
+            for key, result in zip(keys, results, strict=False):
+                self._results[key] = result
+                self._results.move_to_end(key)
+            while len(self._results) > self.cache_size:
+                self._results.popitem(last=False)
+
+    def _grade_inline(
+        self, tasks: list[tuple[Task, list[tuple[int, str, str]]]], level_data: LevelData, deadline: float
+    ):
+        # The network is kept between the launches and patched when the level changes.
+        network = get_level_network(level_data)
+        state = network.state(self.prewarm)
+        devices = list(level_data.devices.values())
+        for task, keys in tasks:
+            if time.perf_counter() > deadline:
+                self._timed_out(task)
+                continue
+            self._set_result(task, evaluate_tests(task.tests, devices, network, state), keys)
+
+    async def _grade_in_executor(
+        self, tasks: list[tuple[Task, list[tuple[int, str, str]]]], level_data: LevelData, deadline: float
+    ):
+        executor = self._get_executor()
+        network: LevelNetwork | None = None
+        if self.backend == "process":
+            snapshot = LevelSnapshot.from_level(level_data)
+            evaluate = functools.partial(_evaluate_tests_snapshot, snapshot=snapshot, prewarm=self.prewarm)
+        else:
+            # The threads read the live network of the level, each test runs on its own fork of the state.
+            network = get_level_network(level_data)
+            state_future = executor.submit(network.state, self.prewarm)
+            state = asyncio.wrap_future(state_future)
+            done, _ = await asyncio.wait((state,), timeout=max(deadline - time.perf_counter(), 0))
+            if not done:
+                if self._abandon(state_future):
+                    self._detach_network(level_data, network)
+                for task, _ in tasks:
+                    self._timed_out(task)
+                return
+            devices = list(level_data.devices.values())
+            evaluate = functools.partial(evaluate_tests, devices=devices, network=network, state=state.result())
+        futures = {executor.submit(evaluate, task.tests): (task, keys) for task, keys in tasks}
+        waiters = {future: asyncio.wrap_future(future) for future in futures}
+        await asyncio.wait(waiters.values(), timeout=max(deadline - time.perf_counter(), 0))
+
+        abandoned = False
+        for future, (task, keys) in futures.items():
+            if not waiters[future].done():
+                abandoned |= self._abandon(future)
+                self._timed_out(task)
+            elif (exception := waiters[future].exception()) is not None:
+                logger.error("Failed to evaluate the task %r", task.name, exc_info=exception)
+                task.completed = False
+                task.error_message = "The task couldn't be evaluated."
+            else:
+                self._set_result(task, waiters[future].result(), keys)
+        if abandoned and network is not None:
+            self._detach_network(level_data, network)
+
+    def _abandon(self, future: Future[Any]) -> bool:
+        """
+        Give up on an evaluation: it is cancelled if it is still queued, a running one can't be interrupted.
+        Return True if it is left running.
+        """
+        if future.cancel():
+            return False
+        self.abandoned += 1
+        logger.warning("An evaluation is still running after the timeout, its worker is abandoned until it ends")
+        return True
+
+    def _detach_network(self, level_data: LevelData, network: LevelNetwork):
+        """Leave the network to the abandoned workers: the changes of the level must not be applied under them."""
+        if level_data.network is network:
+            level_data.network = None
+            logger.debug(
+                "Detached %r from level %s, it is still used by abandoned workers", network, level_data.level_id
+            )
+
+    def _timed_out(self, task: Task):
+        self.timeouts += 1
+        task.completed = False
+        task.error_message = f"The evaluation timed out after {self.timeout} seconds."
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "backend": self.backend,
+            "prewarm": self.prewarm,
+            "launches": self.launches,
+            "timeouts": self.timeouts,
+            "abandoned": self.abandoned,
+            "cached_results": len(self._results),
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "avg_duration": self.total_duration / self.launches if self.launches else 0.0,
+            "max_duration": self.max_duration,
+        }
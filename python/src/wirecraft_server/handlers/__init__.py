@@ -1,4 +1,6 @@
 from .cables import CablesHandler as CablesHandler
 from .devices import DevicesHandler as DevicesHandler
 from .launch import LaunchHandler as LaunchHandler
+from .simulation import SimulationHandler as SimulationHandler
 from .tasks import TasksHandler as TasksHandler
+from .topology import TopologyHandler as TopologyHandler
@@ -3,9 +3,8 @@ from __future__ import annotations
 from collections.abc import Sequence
 
 from pydantic import BaseModel
-from sqlmodel import select
 
-from ..database import Cable, async_session
+from ..database import Cable, level_cache
 from ..handlers_core import Handler, event
 
 
@@ -18,17 +17,11 @@ class GetLevelCablesData(BaseModel):
 
 
 class CablesHandler(Handler):
-    @event
+    @event(coalesce=True)
     async def get_level_cables(self, data: GetLevelCablesData) -> Sequence[Cable]:
-        statement = select(Cable).where(Cable.level_id == data.level_id)
-        async with async_session() as session:
-            result = await session.exec(statement)
-            cables = result.all()
-        return cables
+        level = await level_cache.get_level(data.level_id)
+        return list(level.cables.values())
 
-    @event
+    @event(scope="level")
     async def add_cable(self, data: Cable):
-        async with async_session() as session:
-            session.add(data)
-            await session.commit()
-        return data
+        return await level_cache.add_cable(data)
@@ -4,9 +4,9 @@ from collections.abc import Sequence
 from ipaddress import IPv4Address
 
 from pydantic import BaseModel, Field
-from sqlmodel import select
 
-from ..database import Device, LevelState, async_session
+from ..database import Device, level_cache
+from ..database.cache import LevelDiff
 from ..handlers_core import Handler, event
 
 
@@ -55,58 +55,44 @@ class GetDeviceData(BaseModel):
     device_id: int
 
 
+class SyncLevelData(BaseModel):
+    """
+    Payload for the sync_level ws method.
+    """
+
+    level_id: int
+    since_version: int
+
+
 class DevicesHandler(Handler):
-    @event
+    @event(coalesce=True)
     async def get_level_devices(self, data: GetLevelDevicesData) -> Sequence[Device]:
-        async with async_session.begin() as session:
-            statement = select(LevelState).where(LevelState.id == data.level_id)
-            result = await session.exec(statement)
-            level_state = result.one_or_none()
-            if level_state is None:
-                session.add(LevelState(id=data.level_id))
-                await session.flush()
-            statement = select(Device).where(Device.level_id == data.level_id)
-            result = await session.exec(statement)
-            devices = result.all()
-        return devices
+        level = await level_cache.get_level(data.level_id)
+        return list(level.devices.values())
 
     @event
+    async def sync_level(self, data: SyncLevelData) -> LevelDiff:
+        """
+        Get the devices and cables added, updated or removed since a version of the level.
+        The response contains the new version to use for the next sync.
+        """
+        return await level_cache.sync_level(data.level_id, data.since_version)
+
+    @event(coalesce=True)
     async def get_device(self, data: GetDeviceData) -> Device:
-        async with async_session() as session:
-            statement = select(Device).where(Device.id == data.device_id)
-            result = await session.exec(statement)
-            device = result.one()
-        return device
+        return await level_cache.get_device(data.device_id)
 
-    @event
+    @event(scope="level")
     async def add_device(self, data: Device):
-        async with async_session() as session:
-            session.add(data)
-            await session.commit()
-        return data
+        return await level_cache.add_device(data)
 
-    @event
+    @event(scope="level", coalesce=True)
     async def update_device_position(self, data: UpdateDevicePositionData):
-        async with async_session() as session:
-            statement = select(Device).where(Device.id == data.device_id)
-            result = await session.exec(statement)
-            device = result.one()
-            device.x = data.x
-            device.y = data.y
-            await session.commit()
-        return device
+        return await level_cache.update_device_position(data.device_id, data.x, data.y)
 
-    @event
+    @event(scope="level", coalesce=True)
     async def update_device(self, data: UpdateDeviceData) -> Device:
-        async with async_session() as session:
-            stmt = select(Device).where(Device.id == data.device_id)
-            result = await session.exec(stmt)
-            device = result.one()
-            if data.name:
-                device.name = data.name
-            if data.ip is not None:
-                device.ip = str(data.ip)
-            else:
-                device.ip = None
-            await session.commit()
-        return device
+        values: dict[str, str | None] = {"ip": None if data.ip is None else str(data.ip)}
+        if data.name:
+            values["name"] = data.name
+        return await level_cache.update_device(data.device_id, **values)
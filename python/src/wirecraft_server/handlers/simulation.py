@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+from pydantic import BaseModel
+
+from ..context import ctx
+from ..database import level_cache
+from ..handlers_core import Handler, event
+from ..networking.trace import TraceEvent
+from ..simulation import get_level_network
+
+
+class GetSimulationTraceData(BaseModel):
+    level_id: int
+    # The sequence number of the last event already received.
+    since: int = 0
+
+
+class SimulationHandler(Handler):
+    @event
+    async def get_simulation_trace(self, data: GetSimulationTraceData) -> list[TraceEvent]:
+        """
+        Get the packet trace of the simulation of a level, since the last event received.
+        The trace of a level is only recorded once a client asked for it: the pings of the next launches are in it.
+        """
+        if not ctx.simulation_trace_size:
+            return []
+        level_data = await level_cache.get_level(data.level_id)
+        trace = get_level_network(level_data).enable_trace(ctx.simulation_trace_size)
+        return trace.events(since=data.since)
@@ -18,7 +18,7 @@ class GetLevelIdData(BaseModel):
 
 
 class TasksHandler(Handler):
-    @event
+    @event(coalesce=True)
     async def get_level_tasks(self, data: GetLevelIdData) -> Sequence[Task]:
         level = levels[data.level_id]
         return level.tasks
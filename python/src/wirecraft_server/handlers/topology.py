@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+from pydantic import BaseModel
+
+from ..database.topology import TopologyImport, TopologyLineError, export_topology, import_topology
+from ..handlers_core import Handler, event
+
+
+class ImportTopologyData(BaseModel):
+    """
+    Payload for the import_topology ws method.
+    """
+
+    level_id: int
+    # The devices and cables, in the JSON Lines format (see `database.topology`).
+    topology: str
+    replace: bool = False
+
+
+class ExportTopologyData(BaseModel):
+    """
+    Payload for the export_topology ws method.
+    """
+
+    level_id: int
+
+
+class TopologyExport(BaseModel):
+    level_id: int
+    topology: str
+
+
+class TopologyHandler(Handler):
+    @event(scope="level")
+    async def import_topology(self, data: ImportTopologyData) -> TopologyImport:
+        """
+        Add many devices and cables to a level at once.
+        The clients playing the level should sync it when they receive the response, unless it has an error: nothing
+        is imported if a line is invalid, the response gives the number of the line.
+        """
+        try:
+            return await import_topology(data.level_id, data.topology.splitlines(), replace=data.replace)
+        except TopologyLineError as exc:
+            return TopologyImport(level_id=data.level_id, error=str(exc), line=exc.line)
+
+    @event
+    async def export_topology(self, data: ExportTopologyData) -> TopologyExport:
+        """
+        Get the devices and cables of a level, in the JSON Lines format.
+        The rows are streamed from the database, but the export is not streamed to the client: it is sent as a single
+        response, built in memory.
+        """
+        lines = [line async for line in export_topology(data.level_id)]
+        return TopologyExport(level_id=data.level_id, topology="".join(lines))
@@ -38,46 +38,116 @@ When a client send through the websocket a json object like this:
 The `ping` function will be called with the `MyDataModel` instance as argument.
 
 That's all you need to do to create a new event.
+
+If the function returns something, it is sent back as a `PING_RESPONSE` event. By default, the response is only sent to
+the client that sent the event. For the events that change the state of a level, use `@event(scope="level")`: the
+response is then sent to all the clients playing the level.
+If the response of an event fully describes an object (or a list of objects), use `@event(coalesce=True)`: a response
+that is not sent yet to a slow client is replaced by the newer one.
 """
 
 from __future__ import annotations
 
 import inspect
+import logging
 import typing
-from collections.abc import Callable
-from typing import TYPE_CHECKING, Any, Self
+from collections.abc import Callable, Iterable
+from typing import TYPE_CHECKING, Annotated, Any, Literal, Self, Union, overload
 
-from pydantic import BaseModel
+from pydantic import AfterValidator, BaseModel, Discriminator, Tag, TypeAdapter, ValidationError
+
+from .codec import DecodedMessage, Message
 
 if TYPE_CHECKING:
+    from wirecraft_server.connection import Client
     from wirecraft_server.server import Server
 
     type DataEventCallbackT[H: Handler, T: BaseModel] = Callable[[H, T], Any]
     type SimpleEventCallbackT[H: Handler] = Callable[[H], Any]
     type EventCallbackT[H: Handler, T: BaseModel] = DataEventCallbackT[H, T] | SimpleEventCallbackT[H]
 
+type EventScope = Literal["client", "level"]
+
+logger = logging.getLogger(__name__)
+
+
+class Payload[T](BaseModel):
+    """
+    The structure of every message exchanged through the websocket.
+    t for type and d for data, inspired by https://discord.com/developers/docs/events/gateway-events#payload-structure
+    """
+
+    t: str
+    d: T
+
+
+class EmptyPayload(BaseModel):
+    """Payload of the events that don't expect any data."""
+
+    t: str
+    d: Any = None
+
 
 class Event[H: Handler, T: BaseModel]:
-    def __init__(self, type: str, data_type: type[T] | None, func: EventCallbackT[H, T]):
+    def __init__(
+        self,
+        type: str,
+        data_type: type[T] | None,
+        func: EventCallbackT[H, T],
+        scope: EventScope = "client",
+        coalesce: bool = False,
+    ):
         self.type = type
         self.data_type = data_type
         self.callback = func
+        self.scope = scope
+        self.coalesce = coalesce
         self.handler: H | None = None
 
-    async def __call__(self, data: str) -> Any:
+    @property
+    def payload_type(self) -> type[BaseModel]:
+        """
+        The model used to validate a whole message targeting this event.
+        SQLModel tables are not validated when they are nested in another model, so we call `model_validate` on them
+        explicitly (the data is still decoded only once).
+        """
+        if self.data_type is None:
+            return EmptyPayload
+        if self.data_type.model_config.get("table", False):
+            return Payload[Annotated[Any, AfterValidator(self.data_type.model_validate)]]
+        return Payload[self.data_type]
+
+    async def __call__(self, data: T | None, client: Client) -> Any:
         if self.handler is None:
             raise ValueError("Event handler not set.")
 
+        server = self.handler.server
+        if (level_id := getattr(data, "level_id", None)) is not None:
+            server.subscriptions.subscribe(client, level_id)
+
         if self.data_type is None:
             response = await self.callback(self.handler)  # pyright: ignore[reportCallIssue]
         else:
-            parsed_data = self.data_type.model_validate(data)  # TODO(airopi): add error handling
-            response = await self.callback(self.handler, parsed_data)  # pyright: ignore[reportCallIssue]
+            response = await self.callback(self.handler, data)  # pyright: ignore[reportCallIssue, reportArgumentType]
 
         if response is None:
             return
 
-        await self.handler.server.broadcast_json({"t": self.type + "_RESPONSE", "d": response})
+        # The response is serialized once per wire format, whatever the number of recipients.
+        message = Message(self.type + "_RESPONSE", response)
+        # A newer response supersedes the responses about the same object that are not sent yet.
+        key = (self.type, getattr(response, "id", None)) if self.coalesce else None
+        if self.scope == "client":
+            client.send(message, key)
+            return
+
+        level_id = getattr(response, "level_id", None)
+        if level_id is None:
+            level_id = client.level_id
+        if level_id is None:
+            client.send(message, key)
+        else:
+            await server.broadcast(message, server.subscriptions.clients(level_id), key)
 
 
 class HandlerMeta(type):
@@ -108,14 +178,78 @@ class Handler(metaclass=HandlerMeta):
         self.server = server
 
 
-def event[H: Handler, T: BaseModel](f: EventCallbackT[H, T]) -> Event[H, T]:
-    annotations = typing.get_type_hints(f)
-    signature = inspect.signature(f)
-    _, *parameters = signature.parameters
-    model = None if not parameters else annotations[parameters[0]]
-
-    return Event(
-        f.__name__.upper(),
-        model,
-        f,
-    )
+def _get_event_type(value: Any) -> str | None:
+    if isinstance(value, dict):
+        return value.get("t")  # pyright: ignore[reportUnknownMemberType, reportUnknownVariableType]
+    return getattr(value, "t", None)
+
+
+class EventRouter:
+    """
+    The routing table between the event types and the events, built once from all the handlers.
+
+    All the payloads are validated with a single discriminated union: the raw message is decoded only once, and the
+    data is directly validated into the `data_type` of the targeted event.
+    The messages already decoded by a binary codec are validated the same way, from python objects.
+    """
+
+    def __init__(self, handlers: Iterable[Handler]):
+        self.routes: dict[str, Event[Any, Any]] = {}
+        for handler in handlers:
+            for event_type, event in handler.__handler_events__.items():
+                if event_type in self.routes:
+                    raise ValueError(f"Event {event_type} is handled by multiple handlers.")
+                self.routes[event_type] = event
+
+        choices = tuple(Annotated[event.payload_type, Tag(event.type)] for event in self.routes.values())
+        self._adapter: TypeAdapter[Payload[Any] | EmptyPayload] = TypeAdapter(
+            Annotated[Union[choices], Discriminator(_get_event_type)]  # type: ignore # noqa: UP007
+        )
+
+    def parse(self, raw: DecodedMessage) -> tuple[Event[Any, Any], Any] | None:
+        """
+        Decode and validate a message.
+        Return the targeted event with its validated data, or None if the message can't be handled.
+        """
+        try:
+            payload = self._adapter.validate_python(raw) if isinstance(raw, dict) else self._adapter.validate_json(raw)
+        except ValidationError as e:
+            error = e.errors()[0]
+            if error["type"] in ("union_tag_invalid", "union_tag_not_found"):
+                logger.warning("Unhandled event: %s", raw)
+            else:
+                logger.error("Invalid data for event %s: %s", error["loc"][0] if error["loc"] else None, e)  # noqa: TRY400
+            return None
+        return self.routes[payload.t], payload.d
+
+
+@overload
+def event[H: Handler, T: BaseModel](f: EventCallbackT[H, T], /) -> Event[H, T]: ...
+
+
+@overload
+def event[H: Handler, T: BaseModel](
+    *, scope: EventScope = "client", coalesce: bool = False
+) -> Callable[[EventCallbackT[H, T]], Event[H, T]]: ...
+
+
+def event[H: Handler, T: BaseModel](
+    f: EventCallbackT[H, T] | None = None, /, *, scope: EventScope = "client", coalesce: bool = False
+) -> Event[H, T] | Callable[[EventCallbackT[H, T]], Event[H, T]]:
+    def decorator(f: EventCallbackT[H, T]) -> Event[H, T]:
+        annotations = typing.get_type_hints(f)
+        signature = inspect.signature(f)
+        _, *parameters = signature.parameters
+        model = None if not parameters else annotations[parameters[0]]
+
+        return Event(
+            f.__name__.upper(),
+            model,
+            f,
+            scope,
+            coalesce,
+        )
+
+    if f is None:
+        return decorator
+    return decorator(f)
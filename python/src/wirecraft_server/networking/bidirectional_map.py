@@ -1,16 +1,31 @@
 from __future__ import annotations
 
-from pydantic import RootModel
+from collections.abc import Iterable, Iterator
+from typing import Any
 
+from pydantic import GetCoreSchemaHandler
+from pydantic_core import core_schema
 
-class BidirectionalMap[K, V](RootModel[dict[K, V]]):
-    def __init__(self, _revert_reference: BidirectionalMap[V, K] | None = None):
-        super().__init__({})  # type: ignore
 
-        if _revert_reference is None:
-            self._inverse = BidirectionalMap(self)
-        else:
-            self._inverse = _revert_reference
+class BidirectionalMap[K, V]:
+    """
+    A one-to-one mapping, that can be looked up by key and by value (with `inverse`).
+
+    It is two plain dicts kept consistent: setting a key (or a value) already in the map replaces its previous pair, so
+    a value always has a single key. The inverse map shares the dicts, it is only built the first time it is used.
+    """
+
+    __slots__ = ("_inverse", "_inverse_root", "root")
+
+    root: dict[K, V]
+    _inverse_root: dict[V, K]
+    _inverse: BidirectionalMap[V, K] | None
+
+    def __init__(self, items: Iterable[tuple[K, V]] = ()):
+        self.root = {}
+        self._inverse_root = {}
+        self._inverse = None
+        self.update(items)
 
     def __repr__(self):
         return f"BidirectionalMap({self.root})"
@@ -21,6 +36,12 @@ class BidirectionalMap[K, V](RootModel[dict[K, V]]):
         Get the inverse of this bidirectional map.
         This allows you to look up keys by their values.
         """
+        if self._inverse is None:
+            inverse = BidirectionalMap[V, K]()
+            inverse.root = self._inverse_root
+            inverse._inverse_root = self.root
+            inverse._inverse = self
+            self._inverse = inverse
         return self._inverse
 
     def __getitem__(self, key: K) -> V:
@@ -29,21 +50,57 @@ class BidirectionalMap[K, V](RootModel[dict[K, V]]):
     def __setitem__(self, key: K, value: V):
         self.set(key, value)
 
+    def __delitem__(self, key: K):
+        self.pop(key)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.root
+
+    def __len__(self):
+        return len(self.root)
+
+    def __iter__(self) -> Iterator[K]:
+        return iter(self.root)
+
     def set(self, key: K, value: V):
-        self.root[key] = value
-        self._inverse.root[value] = key
+        """Map `key` to `value`, removing the previous pairs of the key and of the value."""
+        root = self.root
+        inverse_root = self._inverse_root
+        if key in root:
+            del inverse_root[root[key]]
+        if value in inverse_root:
+            del root[inverse_root[value]]
+        root[key] = value
+        inverse_root[value] = key
+
+    def update(self, items: Iterable[tuple[K, V]]):
+        """Add pairs, e.g. the `items()` of a dict."""
+        for key, value in items:
+            self.set(key, value)
 
-    def get(self, key: K):
+    def get(self, key: K) -> V | None:
         return self.root.get(key)
 
+    def pop(self, key: K) -> V:
+        value = self.root.pop(key)
+        del self._inverse_root[value]
+        return value
+
+    def clear(self):
+        self.root.clear()
+        self._inverse_root.clear()
+
     def keys(self):
         return self.root.keys()
 
     def values(self):
-        return self._inverse.root.keys()
+        return self._inverse_root.keys()
 
     def items(self):
         return self.root.items()
 
-    def __iter__(self):  # type: ignore
-        return iter(self.root)
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source: Any, handler: GetCoreSchemaHandler) -> core_schema.CoreSchema:
+        return core_schema.is_instance_schema(
+            cls, serialization=core_schema.plain_serializer_function_ser_schema(lambda value: value.root)
+        )
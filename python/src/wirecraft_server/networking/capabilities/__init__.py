@@ -3,3 +3,4 @@ from .ethernet import BasicEthernetFrameCapability as BasicEthernetFrameCapabili
 from .icmp import ICMPCapability as ICMPCapability
 from .ipv4 import IPv4Capability as IPv4Capability
 from .routing import Routing as Routing
+from .spanning_tree import SpanningTree as SpanningTree
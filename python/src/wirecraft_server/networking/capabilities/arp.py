@@ -7,33 +7,60 @@ from pydantic import Field
 from ..device import NetworkDevice
 from ..mac_address import MacAddress
 from ..osi import ARPOpCode, ARPPacket
-from ..utils import BidirectionalMap
+from ..state import read_table, write_table
 from .base import Capability
 from .ipv4 import IPv4Capability
+from .routing import Routing
 
 
 class ARPCapability(Capability):
+    """
+    Answer the ARP requests for the IP address of the device, and learn the MAC addresses of the senders.
+    The live table is `arp_table`, use `lookup` and `learn` to use the table of the active state (see
+    `networking.state`).
+    """
+
     handle = ARPPacket
 
-    arp_table: BidirectionalMap[IPv4Address, MacAddress] = Field(
-        init=False, default_factory=BidirectionalMap[IPv4Address, MacAddress]
-    )
+    arp_table: dict[IPv4Address, MacAddress] = Field(init=False, default_factory=dict[IPv4Address, MacAddress])
+
+    def wire(self):
+        self._ipv4 = self._device.get_capability(IPv4Capability)
+        self._routing = self._device.get_capability(Routing)
+
+    @property
+    def ipv4(self) -> IPv4Capability | None:
+        """The IPv4 capability of the device, resolved when the capabilities are wired."""
+        return self._ipv4
+
+    @property
+    def routing(self) -> Routing | None:
+        """The routing capability of the device, resolved when the capabilities are wired."""
+        return self._routing
+
+    def reset(self):
+        self.arp_table.clear()
 
     def __call__(self, /, source: NetworkDevice, packet: ARPPacket) -> ARPPacket | None:
-        ipv4_cap = self._device.get_capability(IPv4Capability)
+        ipv4_cap = self._ipv4
         if ipv4_cap is None:
             self._device.log("IPv4 capability not found, cannot handle ARP request.")
             return None
 
-        self._device.log(f"Handling ARP request from {source}")
-        self._device.log(f"Adding {packet.sender_ip} to ARP table with MAC {packet.sender_mac}")
-        self.arp_table[packet.sender_ip] = packet.sender_mac
+        self._device.log("Handling ARP request from %s", source)
+        self._device.log("Adding %s to ARP table with MAC %s", packet.sender_ip, packet.sender_mac)
+        write_table(self.arp_table)[packet.sender_ip] = packet.sender_mac
+
+        if packet.opcode is not ARPOpCode.REQUEST:
+            return None
 
         if packet.target_ip != ipv4_cap.ip_address:
-            self._device.log(f"ARP request for {packet.target_ip}, not for this device.")
+            self._device.log("ARP request for %s, not for this device.", packet.target_ip)
             return
 
-        self._device.log(f"ARP request for {ipv4_cap.ip_address} (self), replying with MAC {self._device.mac_address}")
+        self._device.log(
+            "ARP request for %s (self), replying with MAC %s", ipv4_cap.ip_address, self._device.mac_address
+        )
         return ARPPacket(
             opcode=ARPOpCode.REPLY,
             sender_mac=self._device.mac_address,
@@ -42,18 +69,26 @@ class ARPCapability(Capability):
             target_ip=packet.sender_ip,
         )
 
+    def lookup(self, ip_address: IPv4Address) -> MacAddress | None:
+        """The MAC address learned for an IP address."""
+        return read_table(self.arp_table).get(ip_address)
+
+    def learn(self, ip_address: IPv4Address, mac_address: MacAddress):
+        write_table(self.arp_table)[ip_address] = mac_address
+
     def resolve_mac(self, target_ip: IPv4Address) -> MacAddress | None:
-        self._device.log(f"Resolving MAC for {target_ip}")
-        if target_ip in self.arp_table:
-            self._device.log(f"Found MAC {self.arp_table.get(target_ip)} in arp table for IP {target_ip}")
-            return self.arp_table.get(target_ip)
+        self._device.log("Resolving MAC for %s", target_ip)
+        mac_address = self.lookup(target_ip)
+        if mac_address is not None:
+            self._device.log("Found MAC %s in arp table for IP %s", mac_address, target_ip)
+            return mac_address
 
-        self._device.log(f"IP {target_ip} not in ARP table")
+        self._device.log("IP %s not in ARP table", target_ip)
 
         from ..requests import send_arp_request
 
         send_arp_request(self._device, target_ip)
-        mac_address = self.arp_table.get(target_ip)
+        mac_address = self.lookup(target_ip)
         if mac_address is None:
-            self._device.log(f"Failed to resolve MAC address for {target_ip}")
+            self._device.log("Failed to resolve MAC address for %s", target_ip)
         return mac_address
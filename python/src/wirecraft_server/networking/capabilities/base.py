@@ -1,22 +1,52 @@
 from __future__ import annotations
 
-from typing import Any, ClassVar
+from typing import TYPE_CHECKING, Any, ClassVar
 
 from pydantic import BaseModel
 
 from ..device import NetworkDevice
 from ..osi import OsiDataModel
 
+if TYPE_CHECKING:
+    from ..engine import SimulationEngine
+
 
 class Capability(BaseModel):
+    """
+    A feature of a device, handling a type of data (`handle`) received by the device.
+
+    The references used for every frame (the device, the other capabilities...) are set by `bind_to` and `wire`
+    without being declared with `PrivateAttr`: the declared private attributes of pydantic are much slower to read.
+    """
+
     handle: ClassVar[type[OsiDataModel] | None] = None
 
     def bind_to(self, device: NetworkDevice):
         self._device = device
 
+    def wire(self):
+        """
+        Resolve the references to the other capabilities of the device.
+        Called when the capabilities of the device change, this method should be overridden in the capabilities that
+        use other capabilities.
+        """
+
+    def reset(self):
+        """
+        Forget the state learned during a simulation.
+        This method should be overridden in the capabilities that learn something from the traffic.
+        """
+
     def __call__(self, /, source: NetworkDevice, data: Any) -> Any | None:
         """
         Call the capability with the data.
         This method should be overridden in subclasses to handle specific data types.
         """
         raise NotImplementedError("This method should be overridden in subclasses")
+
+    def receive(self, engine: SimulationEngine, port: int, frame: Any) -> None:
+        """
+        Handle a frame delivered by the simulation engine on a port of the device.
+        This method should be overridden in the capabilities that handle the frames (see `handle`).
+        """
+        raise NotImplementedError(f"{type(self).__name__} can't be used with the simulation engine")
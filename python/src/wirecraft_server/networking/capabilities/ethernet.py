@@ -1,30 +1,73 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING
-
-from pydantic import PrivateAttr
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, ClassVar
 
 from ..device import NetworkDevice
 from ..mac_address import MacAddress
-from ..osi import EthernetFrame
-from ..utils import BidirectionalMap, broadcast_helper
+from ..osi import ARPPacket, EthernetFrame, IPv4Packet
+from ..state import read_table, write_table
+from ..utils import broadcast_helper
 from .base import Capability
+from .spanning_tree import SpanningTree
 
 if TYPE_CHECKING:
+    from ..engine import SimulationEngine
     from ..utils import EthernetFrameT
 
 
+class FloodGuard:
+    """
+    The switches already crossed by the frames being forwarded, for a whole `handle_request` exchange.
+
+    A frame is forwarded as is from switch to switch, so a switch handling the same frame a second time means the
+    frame went around a loop: the switch drops it instead of forwarding it again. This bounds the work of a flood to
+    one visit per switch, and the depth of the recursion to `Layer2Switching.MAX_FORWARDING_DEPTH` switches.
+    """
+
+    __slots__ = ("_frames", "_visited", "depth")
+
+    def __init__(self):
+        self._visited: set[tuple[int, int]] = set()
+        # Keep the frames alive, so their ids are not reused during the exchange.
+        self._frames: list[EthernetFrameT] = []
+        self.depth = 0
+
+    def visit(self, device: NetworkDevice, frame: EthernetFrameT) -> bool:
+        """Record a switch handling a frame, return False if it already did."""
+        key = (id(device), id(frame))
+        if key in self._visited:
+            return False
+        self._visited.add(key)
+        self._frames.append(frame)
+        return True
+
+
+_flood_guard: ContextVar[FloodGuard | None] = ContextVar("flood_guard", default=None)
+
+
 class BasicEthernetFrameCapability(Capability):
     handle = EthernetFrame
 
+    def wire(self):
+        # The capabilities handling the payloads of the frames.
+        self._arp_handler = self._device.data_handlers.get(ARPPacket)
+        self._ipv4_handler = self._device.data_handlers.get(IPv4Packet)
+
     def __call__(self, /, source: NetworkDevice, frame: EthernetFrameT) -> EthernetFrameT | None:
         if not frame.destination_mac.is_broadcast and frame.destination_mac != self._device.mac_address:
-            self._device.log(f"Packet not for this device: {frame.destination_mac} != {self._device.mac_address}")
+            self._device.log("Packet not for this device: %s != %s", frame.destination_mac, self._device.mac_address)
             return
 
-        handler_cap = self._device.data_handlers.get(type(frame.payload))
+        payload_type = type(frame.payload)
+        if payload_type is IPv4Packet:
+            handler_cap = self._ipv4_handler
+        elif payload_type is ARPPacket:
+            handler_cap = self._arp_handler
+        else:
+            handler_cap = None
         if not handler_cap:
-            self._device.log(f"No handler found for payload type {type(frame.payload)}")
+            self._device.log("No handler found for payload type %s", type(frame.payload))
             return None
 
         response = handler_cap(self._device, frame.payload)
@@ -32,35 +75,139 @@ class BasicEthernetFrameCapability(Capability):
             return None
 
         return EthernetFrame(
-            destination_mac=frame.destination_mac,
+            destination_mac=frame.source_mac,
             source_mac=self._device.mac_address,
             payload=response,
         )
 
+    def receive(self, engine: SimulationEngine, port: int, frame: EthernetFrameT):
+        source = self._device.connected_devices.inverse.get(port)
+        if source is None:
+            return
+        response = self(source, frame)
+        if response is not None:
+            engine.transmit(self._device, port, response)
+
 
 class Layer2Switching(Capability):
+    """
+    Forward the frames to the port of their destination, or flood them to all the other ports.
+
+    A switch never forwards the same frame twice (see `FloodGuard`, and `RECENT_FRAMES` with the simulation engine), so
+    the loops of the network can't take the simulation down: the frames going around a loop are dropped and counted in
+    `loops_detected`. Add the `SpanningTree` capability to the switches to block the redundant ports instead.
+
+    The MAC address table and the recent frames are learned tables: the ones of the active state are used if there is
+    one (see `networking.state`).
+    """
+
     handle = EthernetFrame
 
-    _mac_address_table: BidirectionalMap[MacAddress, int] = PrivateAttr(
-        default_factory=BidirectionalMap[MacAddress, int]
-    )
+    # The maximum number of switches crossed by a frame, during a `handle_request` exchange or with the simulation engine
+    # (see `SimulationEngine.max_hops`).
+    MAX_FORWARDING_DEPTH: ClassVar[int] = 128
+    # The number of frames remembered by a switch with the simulation engine, to detect the loops.
+    RECENT_FRAMES: ClassVar[int] = 256
+
+    def bind_to(self, device: NetworkDevice):
+        super().bind_to(device)
+        # Several MAC addresses can be learned on the same port (behind another switch).
+        self._mac_address_table: dict[MacAddress, int] = {}
+        self._recent_frames: dict[int, EthernetFrameT] = {}
+        self._loops_detected = 0
+
+    def wire(self):
+        self._spanning_tree = self._device.get_capability(SpanningTree)
+
+    @property
+    def loops_detected(self) -> int:
+        return self._loops_detected
+
+    def lookup(self, mac_address: MacAddress) -> int | None:
+        """The port a MAC address was learned on."""
+        return read_table(self._mac_address_table).get(mac_address)
+
+    def learn(self, mac_address: MacAddress, port: int):
+        write_table(self._mac_address_table)[mac_address] = port
+
+    def reset(self):
+        self._mac_address_table.clear()
+        self._recent_frames.clear()
+        self._loops_detected = 0
+
+    def _is_blocked(self, port: int) -> bool:
+        spanning_tree = self._spanning_tree
+        return spanning_tree is not None and spanning_tree.is_blocked(port)
 
     def __call__(self, /, source: NetworkDevice, frame: EthernetFrameT):
-        self._populate_mac_address_table(source, frame)
+        if self._is_blocked(self._device.connected_devices[source]):
+            return None
 
-        if frame.destination_mac.is_broadcast:
-            return self._broadcast(source, frame)
+        guard = _flood_guard.get()
+        token = None
+        if guard is None:
+            guard = FloodGuard()
+            token = _flood_guard.set(guard)
+        try:
+            if not guard.visit(self._device, frame):
+                self._loops_detected += 1
+                self._device.log("Frame from %s already forwarded, dropping it (loop detected)", frame.source_mac)
+                return None
+            if guard.depth >= self.MAX_FORWARDING_DEPTH:
+                self._device.log("Frame from %s crossed too many switches, dropping it", frame.source_mac)
+                return None
+
+            guard.depth += 1
+            try:
+                self._populate_mac_address_table(source, frame)
+
+                if frame.destination_mac.is_broadcast:
+                    return self._broadcast(source, frame)
+
+                return self._layer2_switching(source, frame)
+            finally:
+                guard.depth -= 1
+        finally:
+            if token is not None:
+                _flood_guard.reset(token)
+
+    def receive(self, engine: SimulationEngine, port: int, frame: EthernetFrameT):
+        if self._is_blocked(port):
+            return
 
-        return self._layer2_switching(source, frame)
+        recent_frames = write_table(self._recent_frames)
+        if recent_frames.get(id(frame)) is frame:
+            self._loops_detected += 1
+            engine.drop_looped(self._device, port, frame)
+            return
+        if len(recent_frames) >= self.RECENT_FRAMES:
+            del recent_frames[next(iter(recent_frames))]
+        recent_frames[id(frame)] = frame
+
+        mac_address_table = read_table(self._mac_address_table)
+        if frame.source_mac not in mac_address_table:
+            mac_address_table = write_table(self._mac_address_table)
+            mac_address_table[frame.source_mac] = port
+
+        if not frame.destination_mac.is_broadcast:
+            destination_port = mac_address_table.get(frame.destination_mac)
+            if destination_port is not None:
+                if destination_port != port:
+                    engine.forward(self._device, destination_port, frame)
+                return
+
+        for other_port in self._device.connected_devices.values():
+            if other_port != port and not self._is_blocked(other_port):
+                engine.forward(self._device, other_port, frame)
 
     def _layer2_switching(self, source: NetworkDevice, frame: EthernetFrameT) -> EthernetFrameT | None:
         """Making an atomic method so a layer3 switch can reuse it."""
-        if frame.destination_mac in self._mac_address_table:
-            self._device.log(f"Destination MAC {frame.destination_mac} known, forwarding to device")
-            device_port = self._mac_address_table[frame.destination_mac]
+        device_port = read_table(self._mac_address_table).get(frame.destination_mac)
+        if device_port is not None:
+            self._device.log("Destination MAC %s known, forwarding to device", frame.destination_mac)
             return self._device.connected_devices.inverse[device_port].handle_request(self._device, frame)
 
-        self._device.log(f"Destination MAC {frame.destination_mac} unknown, broadcasting the request")
+        self._device.log("Destination MAC %s unknown, broadcasting the request", frame.destination_mac)
         return self._broadcast(self._device, frame)
 
     def _populate_mac_address_table(self, source: NetworkDevice, frame: EthernetFrameT):
@@ -68,19 +215,23 @@ class Layer2Switching(Capability):
         Populate the MAC address table with the source MAC address and the port it was received on.
         This is used to learn the MAC addresses of connected devices.
         """
-        if frame.source_mac not in self._mac_address_table:
+        if frame.source_mac not in read_table(self._mac_address_table):
             self._device.log(
-                f"Adding {frame.source_mac} to MAC address table on interface {self._device.connected_devices[source]}"
+                "Adding %s to MAC address table on interface %s",
+                frame.source_mac,
+                self._device.connected_devices[source],
             )
-            self._mac_address_table[frame.source_mac] = self._device.connected_devices[source]
+            write_table(self._mac_address_table)[frame.source_mac] = self._device.connected_devices[source]
 
     def _broadcast(self, source: NetworkDevice, frame: EthernetFrameT):
-        self._device.log(f"Broadcast packet received from {frame.source_mac}, forwarding to all other devices")
+        self._device.log("Broadcast packet received from %s, forwarding to all other devices", frame.source_mac)
         for device in broadcast_helper(self._device.connected_devices, source):
+            if self._is_blocked(self._device.connected_devices[device]):
+                continue
             response = device.handle_request(self._device, frame)
             if response:
-                self._device.log(f"Got a response from {device}!")
+                self._device.log("Got a response from %s!", device)
                 self._device.log("Updating MAC address table.")
-                self._mac_address_table[response.source_mac] = self._device.connected_devices[device]
+                write_table(self._mac_address_table)[response.source_mac] = self._device.connected_devices[device]
                 self._device.log("Return response to source.")
                 return response
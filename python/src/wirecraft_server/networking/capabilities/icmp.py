@@ -9,7 +9,7 @@ class ICMPCapability(Capability):
     handle = ICMPMessage
 
     def __call__(self, source: NetworkDevice, message: ICMPMessage) -> ICMPMessage | None:
-        self._device.log(f"Handling ICMP message from {source.mac_address}")
+        self._device.log("Handling ICMP message from %s", source.mac_address)
 
         if message.type is ICMPType.ECHO_REQUEST:
             self._device.log("Received ICMP Echo Request, sending Echo Reply")
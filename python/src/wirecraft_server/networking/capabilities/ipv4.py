@@ -3,7 +3,7 @@ from __future__ import annotations
 from ipaddress import IPv4Address
 
 from ..device import NetworkDevice
-from ..osi import IPv4Packet
+from ..osi import DEFAULT_TTL, ICMPMessage, IPv4Packet
 from .base import Capability
 
 
@@ -12,19 +12,18 @@ class IPv4Capability(Capability):
 
     ip_address: IPv4Address
 
-    def __call__(self, source: NetworkDevice, packet: IPv4Packet) -> IPv4Packet | None:
-        ipv4_cap = self._device.get_capability(IPv4Capability)
-        if ipv4_cap is None:
-            self._device.log("IPv4 capability not found, cannot handle ARP request.")
-            return None
+    def wire(self):
+        # The capability handling the payloads of the packets.
+        self._icmp_handler = self._device.data_handlers.get(ICMPMessage)
 
-        if packet.destination_ip != ipv4_cap.ip_address:
-            self._device.log(f"Packet not for this device: {packet.destination_ip} != {ipv4_cap.ip_address}")
+    def __call__(self, source: NetworkDevice, packet: IPv4Packet) -> IPv4Packet | None:
+        if packet.destination_ip != self.ip_address:
+            self._device.log("Packet not for this device: %s != %s", packet.destination_ip, self.ip_address)
             return None
 
-        handler_cap = self._device.data_handlers.get(type(packet.payload))
+        handler_cap = self._icmp_handler if type(packet.payload) is ICMPMessage else None
         if not handler_cap:
-            self._device.log(f"No handler found for payload type {type(packet.payload)}")
+            self._device.log("No handler found for payload type %s", type(packet.payload))
             return None
 
         response = handler_cap(self._device, packet.payload)
@@ -32,8 +31,8 @@ class IPv4Capability(Capability):
             return None
 
         return IPv4Packet(
-            ttl=packet.ttl,  # TTL should be decremented in a real implementation
-            source_ip=ipv4_cap.ip_address,
+            ttl=DEFAULT_TTL,  # A reply is a new packet, it doesn't inherit the TTL of the request
+            source_ip=self.ip_address,
             destination_ip=packet.source_ip,  # Reply to the source IP
             payload=response,
         )
@@ -12,9 +12,9 @@ class Routing(Capability):
     routing_table: RoutingTable = Field(init=False, default_factory=RoutingTable)
 
     def resolve_route(self, target_ip: IPv4Address) -> Route | None:
-        self._device.log(f"Resolving the route for {target_ip}")
+        self._device.log("Resolving the route for %s", target_ip)
         route = self.routing_table.get_route(target_ip)
         if route is None:
-            self._device.log(f"No route found for {target_ip}")
-        self._device.log(f"Route found: {route}")
+            self._device.log("No route found for %s", target_ip)
+        self._device.log("Route found: %s", route)
         return route
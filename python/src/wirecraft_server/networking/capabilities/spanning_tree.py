@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+from collections import deque
+
+from ..device import NetworkDevice
+from .base import Capability
+
+
+class SpanningTree(Capability):
+    """
+    A simplified spanning tree protocol: the switches running it block their redundant ports, so the frames can't
+    circulate in the loops of the network.
+
+    There are no BPDUs: the tree is computed at once for all the switches of the bridged domain (the switches running
+    the spanning tree connected to each other). The switch with the lowest MAC address is the root bridge, and the links
+    of the shortest paths to the root bridge (the lowest MAC address wins a tie) are the only links kept between the
+    switches. The ports connected to other devices are never blocked.
+
+    The tree is computed the first time it is needed, and again after `invalidate` (or `reset`) is called on a switch
+    of the domain.
+    """
+
+    def bind_to(self, device: NetworkDevice):
+        super().bind_to(device)
+        self._blocked_ports: frozenset[int] | None = None
+
+    def reset(self):
+        self.invalidate()
+
+    def invalidate(self):
+        """Compute the tree again the next time it is needed, after a change of the topology."""
+        self._blocked_ports = None
+
+    @property
+    def blocked_ports(self) -> frozenset[int]:
+        if self._blocked_ports is None:
+            compute_spanning_tree(self._device)
+        assert self._blocked_ports is not None  # noqa: S101 set by compute_spanning_tree
+        return self._blocked_ports
+
+    def is_blocked(self, port: int) -> bool:
+        return port in self.blocked_ports
+
+
+def compute_spanning_tree(device: NetworkDevice):
+    """Compute the blocked ports of all the switches of the bridged domain of a switch running the spanning tree."""
+
+    def bridges(device: NetworkDevice) -> list[NetworkDevice]:
+        return sorted(
+            (neighbour for neighbour in device.connected_devices if SpanningTree in neighbour.capabilities),
+            key=lambda neighbour: neighbour.mac_address.value,
+        )
+
+    # Find the domain, and its root bridge.
+    domain = {device}
+    queue = deque((device,))
+    while queue:
+        for neighbour in bridges(queue.popleft()):
+            if neighbour not in domain:
+                domain.add(neighbour)
+                queue.append(neighbour)
+    root = min(domain, key=lambda bridge: bridge.mac_address.value)
+
+    # Breadth-first from the root: the first link reaching a switch is the one kept.
+    parents: dict[NetworkDevice, NetworkDevice | None] = {root: None}
+    queue = deque((root,))
+    while queue:
+        bridge = queue.popleft()
+        for neighbour in bridges(bridge):
+            if neighbour not in parents:
+                parents[neighbour] = bridge
+                queue.append(neighbour)
+
+    for bridge in domain:
+        blocked = frozenset(
+            port
+            for neighbour, port in bridge.connected_devices.items()
+            if neighbour in parents and parents[neighbour] is not bridge and parents[bridge] is not neighbour
+        )
+        spanning_tree = bridge.get_capability(SpanningTree)
+        assert spanning_tree is not None  # noqa: S101 the domain only contains the switches running it
+        spanning_tree._blocked_ports = blocked  # pyright: ignore[reportPrivateUsage]
+        if blocked:
+            bridge.log("Spanning tree: blocking the ports %s", sorted(blocked))
@@ -1,16 +1,37 @@
 from __future__ import annotations
 
+import functools
+import logging
+from collections.abc import Mapping
+from types import MappingProxyType
 from typing import TYPE_CHECKING
 
 from pydantic import BaseModel, Field
 
+from .bidirectional_map import BidirectionalMap
 from .mac_address import MacAddress
-from .osi import OsiDataModel
-from .utils import BidirectionalMap
+from .osi import EthernetFrame, OsiDataModel
 
 if TYPE_CHECKING:
+    from .engine import SimulationEngine
     from .utils import EthernetFrameT
 
+# The messages of the devices, disabled unless this logger is set to DEBUG (`--debug trace`).
+trace_logger = logging.getLogger("wirecraft_server.networking.trace")
+
+
+@functools.cache
+def compile_dispatch(
+    capability_types: tuple[type[Capability], ...],
+) -> Mapping[type[OsiDataModel], type[Capability]]:
+    """
+    The capability type handling each type of data, for a kind of device (its capability types, in the order they
+    were added). It is computed once and shared by all the devices of the same kind.
+    """
+    return MappingProxyType(
+        {capability_type.handle: capability_type for capability_type in capability_types if capability_type.handle}
+    )
+
 
 class NetworkDevice(BaseModel):
     mac_address: MacAddress
@@ -24,19 +45,56 @@ class NetworkDevice(BaseModel):
     capabilities: dict[type[Capability], Capability] = Field(
         init=False, default_factory=dict[type["Capability"], "Capability"]
     )
+    # The capability handling the Ethernet frames received by the device.
+    frame_handler: Capability | None = Field(init=False, default=None, exclude=True)
 
     def add_connection(self, port: int, device: NetworkDevice, other_device_port: int):
         """Add a connection to another device on a specific port."""
-        self.log(f"Adding connection from {self} on port {port} to {device} on port {other_device_port}")
+        self.log("Adding connection from %s on port %s to %s on port %s", self, port, device, other_device_port)
+        # A port has a single cable: unplug the previous ones.
+        for device_a, port_a in ((self, port), (device, other_device_port)):
+            previous = device_a.connected_devices.inverse.get(port_a)
+            if previous is not None:
+                device_a.remove_connection(previous)
         self.connected_devices.set(device, port)
         device.connected_devices.set(self, other_device_port)
 
+    def remove_connection(self, device: NetworkDevice):
+        """Remove the connection to another device, on both sides."""
+        self.log("Removing connection from %s to %s", self, device)
+        if device in self.connected_devices:
+            self.connected_devices.pop(device)
+        if self in device.connected_devices:
+            device.connected_devices.pop(self)
+
     def add_capability(self, *capabilities: Capability):
         for capability in capabilities:
             capability.bind_to(self)
-            if capability.handle:
-                self.data_handlers[capability.handle] = capability
             self.capabilities[type(capability)] = capability
+        self._wire()
+
+    def remove_capability(self, capability_type: type[Capability]):
+        if self.capabilities.pop(capability_type, None) is not None:
+            self._wire()
+
+    def _wire(self):
+        """
+        Resolve the dispatch of the data to the capabilities, and the references between the capabilities, once for
+        all the frames handled by the device.
+        """
+        capabilities = self.capabilities
+        dispatch = compile_dispatch(tuple(capabilities))
+        self.data_handlers = {
+            data_type: capabilities[capability_type] for data_type, capability_type in dispatch.items()
+        }
+        self.frame_handler = self.data_handlers.get(EthernetFrame)
+        for capability in capabilities.values():
+            capability.wire()
+
+    def reset(self):
+        """Forget everything learned during the previous simulations (ARP tables, MAC address tables...)."""
+        for capability in self.capabilities.values():
+            capability.reset()
 
     def get_capability[C: Capability](self, capability_type: type[C]) -> C | None:
         return self.capabilities.get(capability_type, None)  # type: ignore
@@ -53,14 +111,25 @@ class NetworkDevice(BaseModel):
         the behavior of the device when it receives a packet.
         This method should be overridden in subclasses to handle specific packet types.
         """
-        self.log(f"Handling request from {source}")
+        self.log("Handling request from %s", source)
 
-        cap = self.data_handlers.get(type(frame))
-        if not cap:
-            self.log(f"No handler found for frame type {type(frame)}")
+        handler = self.frame_handler
+        if handler is None:
+            self.log("No handler found for frame type %s", type(frame))
             return None
 
-        return cap(source, frame)
+        return handler(source, frame)
+
+    def receive(self, engine: SimulationEngine, port: int, frame: EthernetFrameT):
+        """
+        Handle a frame delivered by the simulation engine on a port.
+        Unlike `handle_request`, nothing is returned: the responses are transmitted through the engine.
+        """
+        handler = self.frame_handler
+        if handler is None:
+            self.log("No handler found for frame type %s", type(frame))
+            return
+        handler.receive(engine, port, frame)
 
     def __hash__(self):
         return hash(self.mac_address)
@@ -71,15 +140,13 @@ class NetworkDevice(BaseModel):
             return False
         return self.mac_address == value.mac_address
 
-    def log(self, message: str):
-        """Log a message from the device."""
-        if hasattr(self, "ip_address"):
-            message = f"[{self.__class__.__name__}] {self.mac_address} ~ {getattr(self, 'ip_address')} : {message}"
-        else:
-            message = f"[{self.__class__.__name__}] {self.mac_address} : {message}"
-        print(message)
+    def log(self, message: str, *args: object):
+        """
+        Log a message from the device, with `args` merged in like the `logging` messages.
+        The message is only formatted if the trace logger is enabled, so it costs nothing otherwise.
+        """
+        if trace_logger.isEnabledFor(logging.DEBUG):
+            trace_logger.debug("[%s] %s : %s", self.__class__.__name__, self.mac_address, message % args)
 
 
 from .capabilities.base import Capability  # noqa: E402 avoid circular import
-
-BidirectionalMap["NetworkDevice", int].model_rebuild()
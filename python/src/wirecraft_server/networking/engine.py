@@ -0,0 +1,340 @@
+"""
+The discrete-event simulation engine.
+
+Instead of calling the neighbours recursively (see `NetworkDevice.handle_request`), the devices transmit their frames
+through the engine, which schedules their delivery after the latency of the link. The deliveries are processed in time
+order from a single priority queue, so any number of pings, ARP requests and broadcasts progress together, and the
+Python stack never grows with the length of the path.
+
+```python
+engine = SimulationEngine()
+probe = engine.ping(computer_a, IPv4Address("192.168.0.3"))
+engine.run()
+assert probe.success
+```
+"""
+
+from __future__ import annotations
+
+import heapq
+import itertools
+import logging
+from collections.abc import Callable
+from ipaddress import IPv4Address
+from typing import TYPE_CHECKING, Any
+
+from .capabilities import ARPCapability, Layer2Switching
+from .mac_address import MacAddress
+from .osi import DEFAULT_TTL, ARPOpCode, ARPPacket, EthernetFrame, ICMPMessage, ICMPType, IPv4Packet
+from .trace import current_trace
+
+if TYPE_CHECKING:
+    from .device import NetworkDevice
+    from .trace import PacketTrace
+    from .utils import EthernetFrameT
+
+    type FrameListener = Callable[[int, EthernetFrameT], None]
+
+logger = logging.getLogger(__name__)
+
+
+class Delivery:
+    """A frame in transit, delivered to `device` on `port` at the scheduled time."""
+
+    __slots__ = ("device", "frame", "hops", "port")
+
+    def __init__(self, device: NetworkDevice, port: int, frame: EthernetFrameT, hops: int):
+        self.device = device
+        self.port = port
+        self.frame = frame
+        self.hops = hops
+
+
+class Timer:
+    __slots__ = ("callback",)
+
+    def __init__(self, callback: Callable[[], Any]):
+        self.callback = callback
+
+
+class SimulationEngine:
+    """
+    Deliver the frames transmitted by the devices, in simulated time.
+
+    - Each link has a latency (`default_latency` unless set with `set_link_latency`), in simulated seconds.
+    - A frame is dropped after `max_hops` links, like with a TTL: the frames sent by a device with `transmit` start
+      from 0, and only the frames forwarded by a switch with `forward` carry the hop count of the received frame, so a
+      frame can't circulate forever in a loop. The switches also drop the frames they already forwarded (counted in
+      `looped_count`). By default, a frame can cross `Layer2Switching.MAX_FORWARDING_DEPTH` switches, as with
+      `handle_request`.
+    - At most `max_pending` deliveries are queued, the next ones are dropped.
+
+    If a `PacketTrace` is attached to `trace`, every frame sent, received or dropped is recorded in it. The trace active
+    in the context the engine is created in is attached by default (see `PacketTrace.activate`).
+    """
+
+    def __init__(self, default_latency: float = 0.001, max_hops: int | None = None, max_pending: int = 100_000):
+        self.default_latency = default_latency
+        # A frame crossing N switches crosses N + 1 links.
+        self.max_hops = max_hops if max_hops is not None else Layer2Switching.MAX_FORWARDING_DEPTH + 1
+        self.max_pending = max_pending
+        self.now = 0.0
+
+        self._queue: list[tuple[float, int, Delivery | Timer]] = []
+        self._sequence = itertools.count()
+        self._latencies: dict[frozenset[NetworkDevice], float] = {}
+        self._listeners: dict[NetworkDevice, list[FrameListener]] = {}
+        # The hop count of the delivery being processed.
+        self._hops = 0
+        self.trace: PacketTrace | None = current_trace()
+
+        self.delivered_count = 0
+        self.dropped_count = 0
+        self.expired_count = 0
+        # The frames dropped by the switches because they went around a loop.
+        self.looped_count = 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._queue)
+
+    def set_link_latency(self, device_a: NetworkDevice, device_b: NetworkDevice, latency: float):
+        self._latencies[frozenset((device_a, device_b))] = latency
+
+    def listen(self, device: NetworkDevice, listener: FrameListener):
+        """Call `listener` with every frame delivered to the device, before the device handles it."""
+        self._listeners.setdefault(device, []).append(listener)
+
+    def unlisten(self, device: NetworkDevice, listener: FrameListener):
+        listeners = self._listeners.get(device)
+        if listeners is not None and listener in listeners:
+            listeners.remove(listener)
+            if not listeners:
+                del self._listeners[device]
+
+    def call_later(self, delay: float, callback: Callable[[], Any]):
+        """Call `callback` after `delay` simulated seconds."""
+        heapq.heappush(self._queue, (self.now + delay, next(self._sequence), Timer(callback)))
+
+    def transmit(self, device: NetworkDevice, port: int, frame: EthernetFrameT):
+        """Send a new frame through a port of a device, to the device connected on the other end of the cable."""
+        self._send(device, port, frame, 1)
+
+    def forward(self, device: NetworkDevice, port: int, frame: EthernetFrameT):
+        """Forward the frame being delivered through another port, counting one more hop."""
+        self._send(device, port, frame, self._hops + 1)
+
+    def _send(self, device: NetworkDevice, port: int, frame: EthernetFrameT, hops: int):
+        trace = self.trace
+        neighbour = device.connected_devices.inverse.get(port)
+        if neighbour is None:
+            self.dropped_count += 1
+            if trace is not None:
+                trace.record(self.now, device, port, "drop", frame, "no cable")
+            return
+        if hops > self.max_hops:
+            self.expired_count += 1
+            if trace is not None:
+                trace.record(self.now, device, port, "drop", frame, "too many hops")
+            return
+        if len(self._queue) >= self.max_pending:
+            self.dropped_count += 1
+            if trace is not None:
+                trace.record(self.now, device, port, "drop", frame, "too many frames in transit")
+            return
+
+        if trace is not None:
+            trace.record(self.now, device, port, "send", frame)
+        latency = self._latencies.get(frozenset((device, neighbour)), self.default_latency)
+        delivery = Delivery(neighbour, neighbour.connected_devices[device], frame, hops)
+        heapq.heappush(self._queue, (self.now + latency, next(self._sequence), delivery))
+
+    def drop_looped(self, device: NetworkDevice, port: int, frame: EthernetFrameT):
+        """Called by a switch receiving a frame it already forwarded."""
+        self.looped_count += 1
+        if self.trace is not None:
+            self.trace.record(self.now, device, port, "drop", frame, "loop")
+
+    def step(self, until: float | None = None, max_events: int | None = None) -> int:
+        """
+        Process the events scheduled up to `until` (all of them if None), but at most `max_events` of them.
+        Return the number of events processed.
+        """
+        queue = self._queue
+        processed = 0
+        while queue and (until is None or queue[0][0] <= until):
+            if max_events is not None and processed >= max_events:
+                break
+            time, _, item = heapq.heappop(queue)
+            self.now = time
+            processed += 1
+            if isinstance(item, Timer):
+                self._hops = 0
+                item.callback()
+            else:
+                self._deliver(item)
+        self._hops = 0
+        return processed
+
+    def advance(self, duration: float, max_events: int | None = None) -> int:
+        """Move the simulated time forward, processing the events scheduled in the meantime."""
+        until = self.now + duration
+        processed = self.step(until, max_events)
+        if max_events is None or processed < max_events:
+            self.now = until
+        return processed
+
+    def run(self, max_events: int = 1_000_000) -> int:
+        """Process the events until there is nothing left to do (or `max_events` events have been processed)."""
+        processed = self.step(max_events=max_events)
+        if self._queue:
+            logger.warning("The simulation is still running after %s events, %s pending", processed, self.pending)
+        return processed
+
+    def _deliver(self, delivery: Delivery):
+        self._hops = delivery.hops
+        self.delivered_count += 1
+        device = delivery.device
+        if self.trace is not None:
+            self.trace.record(self.now, device, delivery.port, "receive", delivery.frame)
+        listeners = self._listeners.get(device)
+        if listeners is not None:
+            for listener in tuple(listeners):
+                listener(delivery.port, delivery.frame)
+        device.receive(self, delivery.port, delivery.frame)
+
+    def ping(self, source: NetworkDevice, target_ip: IPv4Address, timeout: float = 1.0) -> PingProbe:
+        """Start a ping from a device. The result is known once the engine has processed the exchange."""
+        probe = PingProbe(self, source, target_ip)
+        probe.start(timeout)
+        return probe
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "now": self.now,
+            "pending": self.pending,
+            "delivered": self.delivered_count,
+            "dropped": self.dropped_count,
+            "expired": self.expired_count,
+            "looped": self.looped_count,
+        }
+
+
+class PingProbe:
+    """
+    A ping in progress: resolve the MAC address of the next hop with ARP if needed, then send an ICMP echo request and
+    wait for the reply. `done` is set once the reply is received or after the timeout.
+    """
+
+    __slots__ = (
+        "_arp_sent",
+        "_ipv4",
+        "_next_hop",
+        "_port",
+        "done",
+        "engine",
+        "error",
+        "source",
+        "success",
+        "target_ip",
+    )
+
+    def __init__(self, engine: SimulationEngine, source: NetworkDevice, target_ip: IPv4Address):
+        self.engine = engine
+        self.source = source
+        self.target_ip = target_ip
+        self.done = False
+        self.success = False
+        self.error: str | None = None
+        self._next_hop = target_ip
+        self._port = 0
+        self._arp_sent = False
+
+    def __repr__(self):
+        return f"PingProbe({self.source} -> {self.target_ip}, done={self.done}, success={self.success})"
+
+    def start(self, timeout: float):
+        # The capabilities of the source are resolved once, they are wired to its ARP capability.
+        arp = self.source.get_capability(ARPCapability)
+        routing = arp.routing if arp is not None else None
+        ipv4 = arp.ipv4 if arp is not None else None
+        if arp is None or routing is None or ipv4 is None:
+            self._finish(False, "The source device can't send pings")
+            return
+        self._ipv4 = ipv4
+
+        route = routing.routing_table.get_route(self.target_ip)
+        if route is None:
+            self._finish(False, f"No route to {self.target_ip}")
+            return
+        self._port = route.interface
+        if route.gateway is not None:
+            self._next_hop = route.gateway
+
+        self.engine.listen(self.source, self._on_frame)
+        self.engine.call_later(timeout, self._on_timeout)
+
+        mac_address = arp.lookup(self._next_hop)
+        if mac_address is None:
+            self._send_arp_request()
+        else:
+            self._send_echo_request(mac_address)
+
+    def _send_arp_request(self):
+        ipv4 = self._ipv4
+        self._arp_sent = True
+        self.engine.transmit(
+            self.source,
+            self._port,
+            EthernetFrame(
+                destination_mac=MacAddress.broadcast(),
+                source_mac=self.source.mac_address,
+                payload=ARPPacket(
+                    opcode=ARPOpCode.REQUEST,
+                    sender_mac=self.source.mac_address,
+                    sender_ip=ipv4.ip_address,
+                    target_ip=self._next_hop,
+                ),
+            ),
+        )
+
+    def _send_echo_request(self, mac_address: MacAddress):
+        ipv4 = self._ipv4
+        self.engine.transmit(
+            self.source,
+            self._port,
+            EthernetFrame(
+                destination_mac=mac_address,
+                source_mac=self.source.mac_address,
+                payload=IPv4Packet(
+                    ttl=DEFAULT_TTL,
+                    source_ip=ipv4.ip_address,
+                    destination_ip=self.target_ip,
+                    payload=ICMPMessage(type=ICMPType.ECHO_REQUEST),
+                ),
+            ),
+        )
+
+    def _on_frame(self, port: int, frame: EthernetFrameT):
+        payload = frame.payload
+        if isinstance(payload, ARPPacket):
+            if self._arp_sent and payload.opcode is ARPOpCode.REPLY and payload.sender_ip == self._next_hop:
+                self._arp_sent = False
+                self._send_echo_request(payload.sender_mac)
+        elif (
+            isinstance(payload, IPv4Packet)
+            and payload.source_ip == self.target_ip
+            and isinstance(payload.payload, ICMPMessage)
+            and payload.payload.type is ICMPType.ECHO_REPLY
+        ):
+            self._finish(True)
+
+    def _on_timeout(self):
+        if not self.done:
+            self._finish(False, f"Ping to {self.target_ip} timed out")
+
+    def _finish(self, success: bool, error: str | None = None):
+        self.done = True
+        self.success = success
+        self.error = error
+        self.engine.unlisten(self.source, self._on_frame)
@@ -1,20 +1,54 @@
 from __future__ import annotations
 
-from typing import Annotated
+import re
+import weakref
+from typing import Any, ClassVar
 
-from pydantic import RootModel
-from pydantic_extra_types.mac_address import MacAddress as MacAddressPydantic
+from pydantic import GetCoreSchemaHandler
+from pydantic_core import core_schema
 
+BROADCAST = 0xFFFF_FFFF_FFFF
+_HEX_DIGITS = re.compile("[0-9a-fA-F]{12}")
 
-class MacAddress(RootModel[str]):
-    root: Annotated[str, MacAddressPydantic]
+
+class MacAddress:
+    """
+    A MAC address, stored as a 48 bits integer.
+
+    The instances are interned: building the same address twice gives the same object, so the comparisons and the
+    lookups in the MAC address tables and the ARP tables are integer operations (or even identity checks).
+    The string representation (`aa:bb:cc:dd:ee:ff`) is only built for the logs and the serialization.
+    """
+
+    __slots__ = ("__weakref__", "_string", "value")
+
+    _interned: ClassVar[weakref.WeakValueDictionary[int, MacAddress]] = weakref.WeakValueDictionary()
+    _broadcast: ClassVar[MacAddress]
+
+    value: int
+    _string: str | None
+
+    def __new__(cls, address: str | int | MacAddress) -> MacAddress:  # noqa: PYI034 the class is not subclassed
+        if isinstance(address, MacAddress):
+            return address
+        value = address if isinstance(address, int) else _parse(address)
+        if not 0 <= value <= BROADCAST:
+            raise ValueError(f"Invalid MAC address: {address!r}")
+
+        instance = cls._interned.get(value)
+        if instance is None:
+            instance = super().__new__(cls)
+            instance.value = value
+            instance._string = None
+            cls._interned[value] = instance
+        return instance
 
     @classmethod
     def broadcast(cls) -> MacAddress:
         """
-        Create a MacAddress instance representing the broadcast address.
+        Get the MacAddress instance representing the broadcast address.
         """
-        return cls("ff:ff:ff:ff:ff:ff")
+        return cls._broadcast
 
     @property
     def is_broadcast(self) -> bool:
@@ -22,12 +56,52 @@ class MacAddress(RootModel[str]):
         Check if the MAC address is a broadcast address.
         A broadcast MAC address is ff:ff:ff:ff:ff:ff.
         """
-        return self == MacAddress("ff:ff:ff:ff:ff:ff")
+        return self.value == BROADCAST
+
+    @property
+    def root(self) -> str:
+        """The MAC address as a string, e.g. `aa:bb:cc:dd:ee:ff`."""
+        if self._string is None:
+            hex_value = f"{self.value:012x}"
+            self._string = ":".join(hex_value[i : i + 2] for i in range(0, 12, 2))
+        return self._string
+
+    def __eq__(self, other: object) -> bool:
+        if self is other:
+            return True
+        if not isinstance(other, MacAddress):
+            return NotImplemented
+        return self.value == other.value
 
     def __hash__(self):
-        return hash(self.root)
+        return hash(self.value)
+
+    def __int__(self):
+        return self.value
+
+    def __reduce__(self):
+        return (MacAddress, (self.value,))
 
     def __repr__(self):
         return self.root
 
     __str__ = __repr__
+
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source: Any, handler: GetCoreSchemaHandler) -> core_schema.CoreSchema:
+        return core_schema.no_info_plain_validator_function(
+            cls,
+            json_schema_input_schema=core_schema.str_schema(),
+            serialization=core_schema.plain_serializer_function_ser_schema(str),
+        )
+
+
+def _parse(address: str) -> int:
+    """Parse a MAC address written as `aa:bb:cc:dd:ee:ff`, `aa-bb-cc-dd-ee-ff` or `aabb.ccdd.eeff`."""
+    digits = address.replace(":", "").replace("-", "").replace(".", "")
+    if _HEX_DIGITS.fullmatch(digits) is None:
+        raise ValueError(f"Invalid MAC address: {address!r}")
+    return int(digits, 16)
+
+
+MacAddress._broadcast = MacAddress(BROADCAST)  # pyright: ignore[reportPrivateUsage]
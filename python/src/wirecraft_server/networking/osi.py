@@ -1,20 +1,31 @@
+"""
+The data exchanged between the simulated devices.
+
+These objects are built at every hop of the simulation, so they are plain slotted dataclasses: they are never
+validated (they are only built by the simulator itself, from already validated values).
+"""
+
 from __future__ import annotations
 
+from dataclasses import dataclass
 from enum import Enum
 from ipaddress import IPv4Address
 from typing import Generic, TypeVar
 
-from pydantic import BaseModel
-
 from .mac_address import MacAddress
 
 P = TypeVar("P", bound="Packet", covariant=True)  # because new syntax infer variable (wrongly)
 
+# The TTL of the IPv4 packets sent by the devices.
+DEFAULT_TTL = 64
+
 
-class OsiDataModel(BaseModel):
+@dataclass(slots=True, kw_only=True)
+class OsiDataModel:
     pass
 
 
+@dataclass(slots=True, kw_only=True)
 class EthernetFrame(OsiDataModel, Generic[P]):  # noqa: UP046
     destination_mac: MacAddress
     source_mac: MacAddress
@@ -26,11 +37,12 @@ class ARPOpCode(Enum):
     REPLY = 2
 
 
+@dataclass(slots=True, kw_only=True)
 class Packet(OsiDataModel):
     pass
 
 
-# @dataclass(kw_only=True)
+@dataclass(slots=True, kw_only=True)
 class ARPPacket(Packet):
     opcode: ARPOpCode
     sender_mac: MacAddress
@@ -39,7 +51,7 @@ class ARPPacket(Packet):
     target_ip: IPv4Address
 
 
-# @dataclass(kw_only=True)
+@dataclass(slots=True, kw_only=True)
 class IPv4Packet(Packet):
     ttl: int
     source_ip: IPv4Address
@@ -47,6 +59,7 @@ class IPv4Packet(Packet):
     payload: IPv4Message
 
 
+@dataclass(slots=True, kw_only=True)
 class IPv4Message(OsiDataModel):
     pass
 
@@ -56,27 +69,31 @@ class ICMPType(Enum):
     ECHO_REQUEST = 8
 
 
-# @dataclass(kw_only=True)
+@dataclass(slots=True, kw_only=True)
 class ICMPMessage(IPv4Message):
     type: ICMPType
     code: int = 0
 
 
+@dataclass(slots=True, kw_only=True)
 class UDPDatagram(IPv4Message):
     source_port: int
     destination_port: int
     payload: UDPMessage
 
 
+@dataclass(slots=True, kw_only=True)
 class UDPMessage(OsiDataModel):
     pass
 
 
+@dataclass(slots=True, kw_only=True)
 class TCPSegment(IPv4Message):
     source_port: int
     destination_port: int
     payload: TCPMessage
 
 
+@dataclass(slots=True, kw_only=True)
 class TCPMessage(OsiDataModel):
     pass
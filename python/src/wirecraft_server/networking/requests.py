@@ -3,43 +3,49 @@ from ipaddress import IPv4Address
 from .capabilities import ARPCapability, IPv4Capability, Routing
 from .device import NetworkDevice
 from .mac_address import MacAddress
-from .osi import ARPOpCode, ARPPacket, EthernetFrame, ICMPMessage, ICMPType, IPv4Packet
+from .osi import DEFAULT_TTL, ARPOpCode, ARPPacket, EthernetFrame, ICMPMessage, ICMPType, IPv4Packet
 
 
-def send_arp_request(source: NetworkDevice, target_ip: IPv4Address):
-    """Send an ARP request to resolve the MAC address of a target IP."""
-    source.log(f"Sending ARP request for IP {target_ip}")
-    source.log(f"Resolving the route for {target_ip}")
-    routing_cap = source.get_capability(Routing)
-    if routing_cap is None:
-        source.log("No routing capability found, cannot send ARP request")
-        raise ValueError("No routing capability found")
-
+def host_capabilities(source: NetworkDevice) -> tuple[Routing, ARPCapability, IPv4Capability]:
+    """The capabilities a device needs to send requests, wired to its ARP capability when the device is built."""
     arp_cap = source.get_capability(ARPCapability)
     if arp_cap is None:
         source.log("No ARP capability found, cannot send ARP request")
         raise ValueError("No ARP capability found")
 
-    ipv4_cap = source.get_capability(IPv4Capability)
+    routing_cap = arp_cap.routing
+    if routing_cap is None:
+        source.log("No routing capability found, cannot send ARP request")
+        raise ValueError("No routing capability found")
+
+    ipv4_cap = arp_cap.ipv4
     if ipv4_cap is None:
         source.log("No IPv4 capability found, cannot send ARP request")
         raise ValueError("No IPv4 capability found")
+    return routing_cap, arp_cap, ipv4_cap
+
+
+def send_arp_request(source: NetworkDevice, target_ip: IPv4Address):
+    """Send an ARP request to resolve the MAC address of a target IP."""
+    source.log("Sending ARP request for IP %s", target_ip)
+    source.log("Resolving the route for %s", target_ip)
+    routing_cap, arp_cap, ipv4_cap = host_capabilities(source)
 
     route = routing_cap.routing_table.get_route(target_ip)
     if route is None:
-        source.log(f"No route found for {target_ip}")
+        source.log("No route found for %s", target_ip)
         raise ValueError("No route to destination")
 
     if route.gateway is not None:
-        source.log(f"The route for {target_ip} goes through a gateway, which is not allowed for ARP requests.")
+        source.log("The route for %s goes through a gateway, which is not allowed for ARP requests.", target_ip)
         raise ValueError("ARP requests should be sent to a directly connected device, not through a gateway")
 
     device = source.connected_devices.inverse.get(route.interface)
     if device is None:
-        source.log(f"No device connected on the specified interface {route.interface}")
+        source.log("No device connected on the specified interface %s", route.interface)
         return
 
-    source.log(f"Sending ARP request through the interface {route.interface} to {device}")
+    source.log("Sending ARP request through the interface %s to %s", route.interface, device)
     request = EthernetFrame(
         destination_mac=MacAddress.broadcast(),
         source_mac=source.mac_address,
@@ -54,40 +60,30 @@ def send_arp_request(source: NetworkDevice, target_ip: IPv4Address):
     response = device.handle_request(source, request)
     if response and isinstance(response.payload, ARPPacket) and response.payload.opcode is ARPOpCode.REPLY:
         source.log(
-            f"Got response from {device}: the MAC address for {response.payload.sender_ip} is {response.payload.sender_mac}"
+            "Got response from %s: the MAC address for %s is %s",
+            device,
+            response.payload.sender_ip,
+            response.payload.sender_mac,
         )
-        arp_cap.arp_table.set(response.payload.sender_ip, response.payload.sender_mac)
+        arp_cap.learn(response.payload.sender_ip, response.payload.sender_mac)
     else:
-        source.log(f"No response or invalid response received for ARP request for {target_ip}")
+        source.log("No response or invalid response received for ARP request for %s", target_ip)
 
 
 def send_ping(source: NetworkDevice, target_ip: IPv4Address):
-    source.log(f"Sending ping to {target_ip}")
+    source.log("Sending ping to %s", target_ip)
 
-    routing_cap = source.get_capability(Routing)
-    if routing_cap is None:
-        source.log("No routing capability found, cannot send ARP request")
-        raise ValueError("No routing capability found")
-
-    arp_cap = source.get_capability(ARPCapability)
-    if arp_cap is None:
-        source.log("No ARP capability found, cannot send ARP request")
-        raise ValueError("No ARP capability found")
-
-    ipv4_cap = source.get_capability(IPv4Capability)
-    if ipv4_cap is None:
-        source.log("No IPv4 capability found, cannot send ARP request")
-        raise ValueError("No IPv4 capability found")
+    routing_cap, arp_cap, ipv4_cap = host_capabilities(source)
 
     route = routing_cap.resolve_route(target_ip)
     if route is None:
         return False
 
     if route.gateway is None:
-        source.log(f"Using direct connection to {target_ip}")
+        source.log("Using direct connection to %s", target_ip)
         target_ip = target_ip
     else:
-        source.log(f"Using gateway {route.gateway} for {target_ip}")
+        source.log("Using gateway %s for %s", route.gateway, target_ip)
         target_ip = route.gateway
 
     target_mac = arp_cap.resolve_mac(target_ip)
@@ -96,7 +92,7 @@ def send_ping(source: NetworkDevice, target_ip: IPv4Address):
 
     icmp_packet = ICMPMessage(type=ICMPType.ECHO_REQUEST)
     ipv4_packet = IPv4Packet(
-        ttl=64,
+        ttl=DEFAULT_TTL,
         source_ip=ipv4_cap.ip_address,
         destination_ip=target_ip,
         payload=icmp_packet,
@@ -110,7 +106,7 @@ def send_ping(source: NetworkDevice, target_ip: IPv4Address):
     if device is None:
         raise ValueError("No device connected on the specified interface")
 
-    source.log(f"Sending ICMP Echo Request through the interface {route.interface}")
+    source.log("Sending ICMP Echo Request through the interface %s", route.interface)
     response = device.handle_request(source, ethernet_frame)
     if response is None:
         source.log("No response received")
@@ -121,8 +117,8 @@ def send_ping(source: NetworkDevice, target_ip: IPv4Address):
         and isinstance(response.payload.payload, ICMPMessage)
         and response.payload.payload.type is ICMPType.ECHO_REPLY
     ):
-        source.log(f"Received ICMP Echo Reply from {target_ip}")
+        source.log("Received ICMP Echo Reply from %s", target_ip)
         return True
     else:
-        source.log(f"Received unexpected response: {response.payload}")
+        source.log("Received unexpected response: %s", response.payload)
         return False
@@ -1,31 +1,98 @@
 from __future__ import annotations
 
+from collections.abc import Iterable
+from dataclasses import dataclass, field
 from ipaddress import IPv4Address, IPv4Network
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel
+
+# The number of lookups kept in the cache of a routing table.
+LOOKUP_CACHE_SIZE = 4096
 
 
 class Route(BaseModel):
     destination: IPv4Network
     gateway: IPv4Address | None = None
     interface: int  # Interfaces are ports number in our simplified model
+    metric: int = 0  # When multiple routes have the same destination, the lowest metric wins
+
+
+@dataclass(kw_only=True, eq=False, repr=False, slots=True)
+class RoutingTable:
+    """
+    A routing table, using the longest prefix match.
+
+    The routes are indexed by prefix length, then by network address (as integers): a lookup is at most one dict
+    access per prefix length in use, from the longest to the shortest. A default route is a route to 0.0.0.0/0.
+    The results of the lookups are cached until the table changes.
+    """
+
+    table: list[Route] = field(default_factory=list[Route])
+
+    # prefix length -> network address -> route
+    _prefixes: dict[int, dict[int, Route]] = field(init=False, default_factory=dict[int, dict[int, Route]])
+    # The prefix lengths in use, longest first, with their netmask.
+    _lengths: list[tuple[int, int]] = field(init=False, default_factory=list[tuple[int, int]])
+    _cache: dict[int, Route | None] = field(init=False, default_factory=dict[int, Route | None])
 
+    def __post_init__(self):
+        if self.table:
+            routes, self.table = self.table, []
+            self.add_routes(routes)
 
-# @dataclass(kw_only=True, eq=False, repr=False)
-class RoutingTable(BaseModel):
-    table: list[Route] = Field(default_factory=list[Route])
+    def __repr__(self):
+        return f"RoutingTable({self.table})"
 
-    def add_route(self, destination: IPv4Network, gateway: IPv4Address | None = None, interface: int = 0):
+    def add_route(
+        self,
+        destination: IPv4Network,
+        gateway: IPv4Address | None = None,
+        interface: int = 0,
+        metric: int = 0,
+    ):
         """
         Add a route to the routing table.
         """
-        self.table.append(Route(destination=destination, gateway=gateway, interface=interface))
+        self.add_routes((Route(destination=destination, gateway=gateway, interface=interface, metric=metric),))
+
+    def add_routes(self, routes: Iterable[Route]):
+        """
+        Add multiple routes at once, the index is only updated once.
+        """
+        for route in routes:
+            self.table.append(route)
+            destination = route.destination
+            networks = self._prefixes.get(destination.prefixlen)
+            if networks is None:
+                networks = self._prefixes[destination.prefixlen] = {}
+            network = int(destination.network_address)
+            current = networks.get(network)
+            if current is None or route.metric < current.metric:
+                networks[network] = route
+
+        self._lengths = [
+            (length, int(IPv4Network(f"0.0.0.0/{length}").netmask)) for length in sorted(self._prefixes, reverse=True)
+        ]
+        self._cache.clear()
 
     def get_route(self, target: IPv4Address) -> Route | None:
         """
-        Find a route for a given destination IP address.
+        Find the most specific route for a given destination IP address.
         """
-        for route in self.table:
-            if target in route.destination:
-                return route
-        return None
+        address = int(target)
+        try:
+            return self._cache[address]
+        except KeyError:
+            pass
+
+        route = None
+        prefixes = self._prefixes
+        for length, netmask in self._lengths:
+            route = prefixes[length].get(address & netmask)
+            if route is not None:
+                break
+
+        if len(self._cache) >= LOOKUP_CACHE_SIZE:
+            self._cache.clear()
+        self._cache[address] = route
+        return route
@@ -0,0 +1,92 @@
+"""
+The state learned by the simulated devices (ARP tables, MAC address tables...), isolated from the live network.
+
+The devices keep their live tables in their capabilities. When a `NetworkState` is active in the current context (see
+`NetworkState.activate`), the capabilities read and write its tables instead, so a simulation can run on a network
+without changing what the live network learned, nor being influenced by it.
+
+A state is forked in O(1): the fork reads the tables of its parent until it writes them (copy-on-write), so each test
+can run on its own fork of the same base state. The states are context local, several threads (or asyncio tasks) can
+run simulations on the same network at the same time, each in its own state, as long as the topology doesn't change.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Generator, Mapping
+from contextlib import contextmanager
+from contextvars import ContextVar
+from types import MappingProxyType
+from typing import Any
+
+_EMPTY_TABLE: Mapping[Any, Any] = MappingProxyType({})
+
+_current_state: ContextVar[NetworkState | None] = ContextVar("network_state", default=None)
+
+
+class NetworkState:
+    """
+    The learned tables of a simulation. A table is identified by the live table it replaces (e.g. the `arp_table` of
+    an `ARPCapability`), so a state can be used with any network.
+    """
+
+    __slots__ = ("_parent", "_tables")
+
+    def __init__(self, parent: NetworkState | None = None):
+        self._parent = parent
+        # The tables written in this state, by id of their live table (kept, so its id can't be reused).
+        self._tables: dict[int, tuple[dict[Any, Any], dict[Any, Any]]] = {}
+
+    def __repr__(self):
+        return f"NetworkState(tables={len(self._tables)}, forked={self._parent is not None})"
+
+    def fork(self) -> NetworkState:
+        """A new state starting from this one. This state must not be written while its forks are used."""
+        return NetworkState(self)
+
+    def read[K, V](self, live_table: dict[K, V]) -> Mapping[K, V]:
+        """Get a table to read it. It may be shared with the parent states, it must not be changed."""
+        key = id(live_table)
+        state = self
+        while state is not None:
+            entry = state._tables.get(key)
+            if entry is not None:
+                return entry[1]
+            state = state._parent
+        return _EMPTY_TABLE
+
+    def write[K, V](self, live_table: dict[K, V]) -> dict[K, V]:
+        """Get a table to change it, copying the table of the parent states the first time."""
+        entry = self._tables.get(id(live_table))
+        if entry is None:
+            parent = self._parent
+            table = dict(parent.read(live_table)) if parent is not None else {}
+            entry = self._tables[id(live_table)] = (live_table, table)
+        return entry[1]
+
+    def set_table[K, V](self, live_table: dict[K, V], table: dict[K, V]):
+        """
+        Replace a table of this state, e.g. to share the same table between many devices of a base state. A shared
+        table must not be changed: only use the forks of the state then.
+        """
+        self._tables[id(live_table)] = (live_table, table)
+
+    @contextmanager
+    def activate(self) -> Generator[NetworkState]:
+        """Use this state for the simulations run in the current context."""
+        token = _current_state.set(self)
+        try:
+            yield self
+        finally:
+            _current_state.reset(token)
+
+
+def read_table[K, V](live_table: dict[K, V]) -> Mapping[K, V]:
+    """The table to read in the current context: the live table, or the one of the active state."""
+    state = _current_state.get()
+    return live_table if state is None else state.read(live_table)
+
+
+def write_table[K, V](live_table: dict[K, V]) -> dict[K, V]:
+    """The table to change in the current context: the live table, or the one of the active state."""
+    state = _current_state.get()
+    return live_table if state is None else state.write(live_table)
@@ -0,0 +1,121 @@
+"""
+The packet trace of a simulation: what the simulation engine did with the frames (sent, received, dropped), to show
+the traffic to the players.
+
+Recording an event only appends a tuple to a ring buffer, the frames are described when the events are read. The
+engines have no trace unless one is attached (see `SimulationEngine.trace`), so tracing costs nothing when it is off.
+The engines created while a trace is active in the current context (see `PacketTrace.activate`) record in it, e.g. the
+engines of the tests of a level.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import deque
+from collections.abc import Generator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Literal
+
+from pydantic import BaseModel
+
+from .osi import ARPOpCode, ARPPacket, ICMPMessage, IPv4Packet
+
+if TYPE_CHECKING:
+    from .device import NetworkDevice
+    from .utils import EthernetFrameT
+
+type TraceAction = Literal["send", "receive", "drop"]
+
+
+class TraceEvent(BaseModel):
+    sequence: int
+    time: float
+    device: str
+    port: int | None
+    action: TraceAction
+    source_mac: str
+    destination_mac: str
+    summary: str
+    reason: str | None = None
+
+
+def describe_frame(frame: EthernetFrameT) -> str:
+    """A short description of a frame, e.g. `ARP request 192.168.0.2 -> 192.168.0.3`."""
+    payload = frame.payload
+    if isinstance(payload, ARPPacket):
+        kind = "request" if payload.opcode is ARPOpCode.REQUEST else "reply"
+        return f"ARP {kind} {payload.sender_ip} -> {payload.target_ip}"
+    if isinstance(payload, IPv4Packet):
+        message = payload.payload
+        kind = f"ICMP {message.type.name.lower().replace('_', ' ')}" if isinstance(message, ICMPMessage) else "IPv4"
+        return f"{kind} {payload.source_ip} -> {payload.destination_ip} (ttl={payload.ttl})"
+    return type(payload).__name__
+
+
+_current_trace: ContextVar[PacketTrace | None] = ContextVar("packet_trace", default=None)
+
+
+class PacketTrace:
+    """The last `size` events of the simulations recording in it (possibly from several threads)."""
+
+    def __init__(self, size: int):
+        self._events: deque[tuple[int, float, NetworkDevice, int | None, TraceAction, EthernetFrameT, str | None]] = (
+            deque(maxlen=size)
+        )
+        self._lock = threading.Lock()
+        self.last_sequence = 0
+
+    def __len__(self):
+        return len(self._events)
+
+    def record(
+        self,
+        time: float,
+        device: NetworkDevice,
+        port: int | None,
+        action: TraceAction,
+        frame: EthernetFrameT,
+        reason: str | None = None,
+    ):
+        with self._lock:
+            self.last_sequence += 1
+            self._events.append((self.last_sequence, time, device, port, action, frame, reason))
+
+    @contextmanager
+    def activate(self) -> Generator[PacketTrace]:
+        """Record the simulations of the engines created in the current context in this trace."""
+        token = _current_trace.set(self)
+        try:
+            yield self
+        finally:
+            _current_trace.reset(token)
+
+    def events(self, since: int = 0) -> list[TraceEvent]:
+        """The events recorded after the sequence number `since` (those still in the buffer)."""
+        with self._lock:
+            events = list(self._events)
+        return [
+            TraceEvent(
+                sequence=sequence,
+                time=time,
+                device=device.mac_address.root,
+                port=port,
+                action=action,
+                source_mac=frame.source_mac.root,
+                destination_mac=frame.destination_mac.root,
+                summary=describe_frame(frame),
+                reason=reason,
+            )
+            for sequence, time, device, port, action, frame, reason in events
+            if sequence > since
+        ]
+
+    def clear(self):
+        with self._lock:
+            self._events.clear()
+
+
+def current_trace() -> PacketTrace | None:
+    """The trace active in the current context, if any."""
+    return _current_trace.get()
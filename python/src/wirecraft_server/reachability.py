@@ -0,0 +1,176 @@
+"""
+The reachability of the devices of a level, computed from the cables only (without simulating any frame).
+
+The connected components are the devices connected by cables, directly or not. The L2 broadcast domains are where a
+broadcast frame can go: the switches forward the frames from a port to all the others, so all their ports are in the
+same domain, while the other devices (the hosts, the routers...) stop the frames, so each of their ports is in its own
+domain. The ports blocked by the spanning trees are ignored, they never split a domain.
+
+Both are kept in union-find structures, updated when a device or a cable is added: checking that two devices are
+connected, or that a device can reach an IP address at L2, doesn't depend on the size of the level. Removing a device
+or a cable can split a component, the structures are built again then.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable
+from ipaddress import IPv4Address
+
+from .database.models import Cable, Device
+
+# The types of the devices forwarding the frames between their ports.
+L2_FORWARDING_TYPES = frozenset({"switch"})
+
+# A port of a device in the broadcast domains (None for all the ports of a switch).
+type Interface = tuple[int, int | None]
+
+
+class UnionFind[T]:
+    """Disjoint sets, with union by size and path halving."""
+
+    __slots__ = ("_parents", "_sizes")
+
+    def __init__(self):
+        self._parents: dict[T, T] = {}
+        self._sizes: dict[T, int] = {}
+
+    def __len__(self):
+        return len(self._parents)
+
+    def find(self, item: T) -> T:
+        """The representative of the set of an item (an unknown item is alone in its set)."""
+        parents = self._parents
+        parent = parents.get(item, item)
+        while parent != item:
+            grandparent = parents[parent]
+            parents[item] = grandparent
+            item, parent = grandparent, parents.get(grandparent, grandparent)
+        return item
+
+    def union(self, a: T, b: T):
+        root_a = self.find(a)
+        root_b = self.find(b)
+        if root_a == root_b:
+            return
+        size_a = self._sizes.get(root_a, 1)
+        size_b = self._sizes.get(root_b, 1)
+        if size_a < size_b:
+            root_a, root_b = root_b, root_a
+        self._parents[root_b] = root_a
+        self._parents.setdefault(root_a, root_a)
+        self._sizes[root_a] = size_a + size_b
+        self._sizes.pop(root_b, None)
+
+    def connected(self, a: T, b: T) -> bool:
+        return self.find(a) == self.find(b)
+
+    def clear(self):
+        self._parents.clear()
+        self._sizes.clear()
+
+
+class Reachability:
+    """The connected components and the L2 broadcast domains of a level."""
+
+    __slots__ = ("_addresses", "_cables", "_components", "_devices", "_domains", "_ports")
+
+    def __init__(self):
+        self._devices: dict[int, Device] = {}
+        self._cables: dict[int, Cable] = {}
+        # The ids of the devices, by IP address.
+        self._addresses: dict[IPv4Address, set[int]] = {}
+        # The ports of the devices with a cable, by device id.
+        self._ports: dict[int, set[int]] = {}
+        self._components = UnionFind[int]()
+        self._domains = UnionFind[Interface]()
+
+    def __repr__(self):
+        return f"Reachability(devices={len(self._devices)}, cables={len(self._cables)})"
+
+    @classmethod
+    def build(cls, devices: Iterable[Device], cables: Iterable[Cable]) -> Reachability:
+        reachability = cls()
+        for device in devices:
+            reachability.add_device(device)
+        for cable in cables:
+            reachability.add_cable(cable)
+        return reachability
+
+    def add_device(self, device: Device):
+        self._devices[device.id] = device
+        if device.ip is not None:
+            self._addresses.setdefault(IPv4Address(device.ip), set()).add(device.id)
+
+    def update_device(self, device: Device):
+        """Apply the change of the IP address of a device."""
+        self._forget_address(device.id)
+        self.add_device(device)
+
+    def remove_device(self, device_id: int):
+        """Remove a device, with the cables connected to it."""
+        del self._devices[device_id]
+        self._forget_address(device_id)
+        self._cables = {
+            cable_id: cable
+            for cable_id, cable in self._cables.items()
+            if device_id not in (cable.device_id_1, cable.device_id_2)
+        }
+        self._rebuild()
+
+    def _forget_address(self, device_id: int):
+        # The devices are changed in place, their previous IP address is not known anymore.
+        for device_ids in self._addresses.values():
+            device_ids.discard(device_id)
+
+    def add_cable(self, cable: Cable):
+        self._cables[cable.id] = cable
+        self._ports.setdefault(cable.device_id_1, set()).add(cable.port_1)
+        self._ports.setdefault(cable.device_id_2, set()).add(cable.port_2)
+        self._components.union(cable.device_id_1, cable.device_id_2)
+        self._domains.union(
+            self._interface(cable.device_id_1, cable.port_1), self._interface(cable.device_id_2, cable.port_2)
+        )
+
+    def remove_cable(self, cable_id: int):
+        del self._cables[cable_id]
+        self._rebuild()
+
+    def _rebuild(self):
+        self._ports.clear()
+        self._components.clear()
+        self._domains.clear()
+        for cable in self._cables.values():
+            self.add_cable(cable)
+
+    def _interface(self, device_id: int, port: int) -> Interface:
+        device = self._devices.get(device_id)
+        if device is not None and device.type in L2_FORWARDING_TYPES:
+            return (device_id, None)
+        return (device_id, port)
+
+    def connected(self, device_a: int, device_b: int) -> bool:
+        """Whether two devices are connected by cables, directly or not."""
+        return self._components.connected(device_a, device_b)
+
+    def same_domain(self, device_a: int, port_a: int, device_b: int, port_b: int) -> bool:
+        """Whether the broadcast frames sent on a port of a device are received on a port of another device."""
+        return self._domains.connected(self._interface(device_a, port_a), self._interface(device_b, port_b))
+
+    def can_reach(self, device_id: int, port: int, ip_address: IPv4Address) -> bool:
+        """
+        Whether a device with this IP address is in the broadcast domain of a port of a device, i.e. whether an ARP
+        request for this address sent on this port can be answered.
+        """
+        domain = self._domains.find(self._interface(device_id, port))
+        for other_id in self._addresses.get(ip_address, ()):
+            if other_id == device_id:
+                continue
+            other = self._devices[other_id]
+            if other.type in L2_FORWARDING_TYPES:
+                if self._domains.find((other_id, None)) == domain:
+                    return True
+                continue
+            for other_port in self._ports.get(other_id, ()):
+                if self._domains.find((other_id, other_port)) == domain:
+                    return True
+        return False
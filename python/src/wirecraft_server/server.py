@@ -1,25 +1,28 @@
 from __future__ import annotations
 
 import asyncio
-import contextlib
-import json
 import logging
-import time
-import urllib.parse
-from pathlib import Path
+from collections.abc import Hashable, Iterable
 from typing import Any, Self
 
 from aiohttp import WSMessage, WSMsgType, web
-from pydantic_core import from_json, to_json
-from sqlalchemy.ext.asyncio import create_async_engine
 
+from .codec import CODECS, JSON_CODEC, Message
+from .connection import Client, LevelSubscriptions
 from .context import ctx
-from .database import init_db
-from .database.session import async_session
-from .handlers import CablesHandler, DevicesHandler, LaunchHandler, TasksHandler
-from .handlers_core import Handler
-
-TICK_RATE = 20
+from .database import connect_database, level_cache
+from .executor import EventExecutor
+from .grading import Grader
+from .handlers import (
+    CablesHandler,
+    DevicesHandler,
+    LaunchHandler,
+    SimulationHandler,
+    TasksHandler,
+    TopologyHandler,
+)
+from .handlers_core import EventRouter, Handler
+from .tick import TickScheduler
 
 logger = logging.getLogger(__name__)
 
@@ -30,9 +33,8 @@ class Server:
     """
 
     def __init__(self) -> None:
-        self._current_tick = 0
-        self.client_connexions: set[web.WebSocketResponse] = set()
-        self._last_refresh: float = time.perf_counter()
+        self.client_connexions: set[Client] = set()
+        self.subscriptions = LevelSubscriptions()
 
         # nb: if this event is set, the server will stop
         # This is used if we *need* to stop the server in any other way than CTRL+C
@@ -45,7 +47,10 @@ class Server:
             DevicesHandler(self),
             TasksHandler(self),
             LaunchHandler(self),
+            SimulationHandler(self),
+            TopologyHandler(self),
         ]
+        self.router = EventRouter(self.handlers)
 
     def start(self):
         logger.info("Server started!")
@@ -58,78 +63,66 @@ class Server:
             logger.exception("Server crashed!")
             raise SystemExit(1)
 
-    async def _wait_next_refresh(self):
-        """This method allow the server to do background tasks at a fixed rate."""
-        delay = 1 / TICK_RATE
-        _next = self._last_refresh + delay
-        _now = time.perf_counter()
-        _wait = _next - _now
-        if _wait < 0:
-            # TODO(airopi): implement server slow down (increase delay in case of poor performances)
-            # logger.warning("Can't keep up ! %ss behind the normal refresh", -round(_wait, 3))
-            self._last_refresh = _now
-            return self._stop.is_set()
-
-        self._last_refresh = _next
-        with contextlib.suppress(asyncio.TimeoutError):
-            await asyncio.wait_for(self._stop.wait(), _wait)
-        return self._stop.is_set()
-
-    def _connect(self, ws: web.WebSocketResponse) -> Self:
+    def _connect(self, client: Client) -> Self:
         """Handle a new client connection."""
-        self.client_connexions.add(ws)
+        self.client_connexions.add(client)
         logger.debug("New client connected")
         return self
 
-    def _disconnect(self, ws: web.WebSocketResponse):
-        """Handle a client disconnection."""
-        self.client_connexions.remove(ws)
+    def _disconnect(self, client: Client):
+        """Handle a client disconnection. Called by the client when it is disconnected, then by the websocket handler."""
+        if client not in self.client_connexions:
+            return
+        self.client_connexions.remove(client)
+        self.subscriptions.unsubscribe(client)
         logger.debug("Client disconnected")
 
     async def _websocket_handler(self, request: web.Request):
         """
         There is an "websocket_handler" running per client.
         This task maintain the connection and receive the messages from the client.
+        The wire format is negotiated with the websocket subprotocol, JSON is used if the client doesn't ask for one.
         """
-        ws = web.WebSocketResponse()
+        ws = web.WebSocketResponse(protocols=tuple(CODECS))
         await ws.prepare(request)
 
-        self._connect(ws)
+        client = Client(
+            ws,
+            max_queue_size=ctx.send_queue_size,
+            policy=ctx.slow_client_policy,
+            drop_threshold=ctx.slow_client_drop_threshold,
+            codec=CODECS.get(ws.ws_protocol or "", JSON_CODEC),
+            on_disconnect=self._disconnect,
+        )
+        client.start()
+        self._connect(client)
         try:
             async for msg in ws:
-                if msg.type == WSMsgType.TEXT:
-                    data = json.loads(msg.data)
-                    logger.debug("Received: %s", data)
-                    await self._handle_message(msg)
+                if msg.type in (WSMsgType.TEXT, WSMsgType.BINARY):
+                    await self._handle_message(client, msg)
         except Exception:
             logger.exception("Client error")
         finally:
-            self._disconnect(ws)
+            self._disconnect(client)
+            await client.stop()
         return ws
 
-    async def _handle_message(self, msg: WSMessage):
+    async def _handle_message(self, client: Client, msg: WSMessage):
         """
         Handle the messages received from the client.
-        It will search for an handler for the event type and call it.
+        The router decodes the message once and finds the event registered for its type, then the executor runs it.
         """
-        data = from_json(msg.data)
-        logger.debug("Received: %s", data)
-        handled: bool = False
-        # Loop is used so multiple handler could handle the same event.
-        # This is useful for example if we want to log the event and then handle it.
-        for handler in self.handlers:
-            # t for type and d for data
-            # inspired by https://discord.com/developers/docs/events/gateway-events#payload-structure
-            try:
-                if event := handler.__handler_events__.get(data["t"]):
-                    handled = True
-                    await event(data["d"])
-            except Exception:
-                logger.exception("Error while handling event %s:", data["t"])
-                continue
-
-        if not handled:
-            logger.warning("Unhandled event: %s", data)
+        logger.debug("Received: %s", msg.data)
+        try:
+            decoded = client.codec.decode(msg.data)
+        except Exception:
+            logger.warning("Invalid message for the %s format: %r", client.codec.protocol, msg.data)
+            return
+        parsed = self.router.parse(decoded)
+        if parsed is None:
+            return
+        event, data = parsed
+        self.executor.submit(event, data, client)
 
     async def _websocket_helthcheck(self, request: web.Request):
         """
@@ -142,24 +135,46 @@ class Server:
         await ws.close()
         return ws
 
+    async def _metrics(self, request: web.Request):
+        """
+        Expose the server metrics as JSON.
+        """
+        return web.json_response(self.metrics())
+
+    def metrics(self) -> dict[str, Any]:
+        return {
+            "ticks": self.ticks.stats(),
+            "clients": [client.stats() for client in self.client_connexions],
+            "events": self.executor.stats(),
+            "level_cache": level_cache.stats(),
+            "grading": self.grader.stats(),
+            "simulations": {
+                level.level_id: level.network.engine.stats()
+                for level in level_cache.cached_levels()
+                if level.network is not None
+            },
+        }
+
     async def _run(self):
-        if ctx.database_type == "sqlite":
-            path = Path(ctx.database)
-            resolved = path.resolve()
-            encoded_path = urllib.parse.quote(str(resolved))
-            db = f"sqlite+aiosqlite:///{encoded_path}"
-        elif ctx.database_type == "postgresql":
-            db = f"postgresql+asyncpg://{ctx.database}"
-        else:
-            raise ValueError(f"Unsupported database type: {ctx.database_type}")
-
-        engine = create_async_engine(db)
-        async_session.configure(bind=engine)
-        await init_db(engine)
+        await connect_database()
+        level_cache.configure(max_levels=ctx.level_cache_size, ttl=ctx.level_cache_ttl)
+
+        self.executor = EventExecutor(ctx.max_concurrent_events)
+        self.grader = Grader(
+            ctx.grading_backend,
+            workers=ctx.grading_workers,
+            timeout=ctx.grading_timeout,
+            cache_size=ctx.grading_cache_size,
+            prewarm=ctx.grading_prewarm,
+        )
+        self.ticks = TickScheduler(ctx.tick_rate, min_rate=ctx.min_tick_rate, max_catch_up=ctx.max_tick_catch_up)
+        self.ticks.add_job("simulation", self._step_simulations, priority=10, budget=0.5 / ctx.tick_rate)
+        self.ticks.add_job("flush_positions", self._flush_positions, interval=ctx.position_flush_interval, priority=-10)
 
         self.app = web.Application()
         self.app.router.add_get("/", self._websocket_handler)
         self.app.router.add_get("/health", self._websocket_helthcheck)
+        self.app.router.add_get("/metrics", self._metrics)
         self.runner = web.AppRunner(self.app)
         await self.runner.setup()
         self.site = web.TCPSite(self.runner, ctx.bind, 8765)
@@ -167,31 +182,35 @@ class Server:
 
         logger.info("WebSocket server started on ws://%s0:8765", ctx.bind)
 
-        while True:
-            stopped = await self._wait_next_refresh()
-            if stopped:
-                logger.info("Server stopped!")
-                break
-            # await update_devices()
-            # await update_routing_tables()
-            # print(global_device_list[1].ping("192.168.1.3"))
-            await self._tick()
+        try:
+            await self.ticks.run(self._stop)
+            logger.info("Server stopped!")
+        finally:
+            # The positions are written in batch, make sure the last ones are not lost.
+            await self._flush_positions()
+            self.grader.close()
 
-    async def broadcast_json(self, data: Any):
-        await self.broadcast(to_json(data))
+    async def _step_simulations(self):
+        """Move the simulations of the cached levels forward by a tick."""
+        for level in level_cache.cached_levels():
+            if level.network is not None and level.network.engine.pending:
+                level.network.engine.advance(self.ticks.interval, max_events=ctx.simulation_events_per_tick)
 
-    async def broadcast(self, message: bytes):
-        """
-        Send message to all connected clients.
-        """
-        if self.client_connexions:
-            await asyncio.gather(*[ws.send_bytes(message) for ws in self.client_connexions])
+    async def _flush_positions(self):
+        try:
+            await level_cache.flush_positions()
+        except Exception:
+            logger.exception("Failed to write the device positions to the database")
+
+    async def broadcast_json(self, data: Any):
+        await self.broadcast(Message(data["t"], data.get("d")))
 
-    async def _tick(self):
+    async def broadcast(self, message: Message, clients: Iterable[Client] | None = None, key: Hashable | None = None):
         """
-        This can be activated to tell the client what is the current tick.
+        Send message to the given clients, or to all connected clients.
+        The message is only queued: each client has its own writer task, so a slow client doesn't slow down the others.
         """
-        self._current_tick += 1
-        if self._current_tick % 60 == 0:
-            # await self.broadcast_json({"t": "TICK_EVENT", "d": self._current_tick})
-            pass
+        if clients is None:
+            clients = self.client_connexions
+        for client in clients:
+            client.send(message, key)
@@ -0,0 +1,251 @@
+"""
+The live simulation network of the levels.
+
+The network of a level is built once, the first time a simulation is launched on it, and is then kept in the level
+cache. The level cache patches it on every change of the level (a device or a cable added, a device updated...), so a
+launch doesn't have to build it again. The tests run on forks of a state of the network (see `networking.state`), so
+they don't change what the live network learned, and don't depend on each other.
+"""
+
+from __future__ import annotations
+
+import logging
+from collections import deque
+from collections.abc import Iterable, Iterator
+from ipaddress import IPv4Address, IPv4Network
+from typing import TYPE_CHECKING
+
+from .database.models import Cable, Device
+from .networking.capabilities import (
+    ARPCapability,
+    BasicEthernetFrameCapability,
+    ICMPCapability,
+    IPv4Capability,
+    Layer2Switching,
+    Routing,
+    SpanningTree,
+)
+from .networking.capabilities.base import Capability
+from .networking.device import NetworkDevice
+from .networking.engine import SimulationEngine
+from .networking.state import NetworkState
+from .networking.trace import PacketTrace
+from .reachability import Reachability
+
+if TYPE_CHECKING:
+    from .database.cache import LevelData
+
+logger = logging.getLogger(__name__)
+
+
+def build_network_device(device: Device) -> NetworkDevice:
+    """Build the simulated device of a device placed in a level."""
+    network_device = NetworkDevice(mac_address=device.mac)
+    capabilities: list[Capability] = []
+
+    if device.ip:
+        capabilities.append(IPv4Capability(ip_address=IPv4Address(device.ip)))
+
+    if device.type == "switch":
+        capabilities += (Layer2Switching(), SpanningTree())
+    if device.type == "pc":
+        routing = Routing()
+        routing.routing_table.add_route(IPv4Network("192.168.0.0/24"), interface=1)  # the port on a PC is 1
+        capabilities += (routing, ICMPCapability(), ARPCapability(), BasicEthernetFrameCapability())
+
+    # The capabilities are wired together once, when they are all added.
+    network_device.add_capability(*capabilities)
+    return network_device
+
+
+class LevelNetwork:
+    """
+    The simulated network of a level, patched incrementally when the level changes.
+    Its engine runs the continuous traffic of the level, stepped by the server ticks.
+    Once `enable_trace` is called, the traffic of its engine and of the tests run on it is recorded in `trace`.
+    """
+
+    def __init__(self) -> None:
+        self.engine = SimulationEngine()
+        self.trace: PacketTrace | None = None
+        # The simulated devices, by device id.
+        self.devices: dict[int, NetworkDevice] = {}
+        # The device ids, by device name.
+        self.names: dict[str, int] = {}
+        self._device_names: dict[int, str] = {}
+        self._cables: dict[int, Cable] = {}
+        # Which devices can reach each other, to fail fast without simulating the frames.
+        self.reachability = Reachability()
+
+    def __repr__(self):
+        return f"LevelNetwork(devices={len(self.devices)}, cables={len(self._cables)})"
+
+    @classmethod
+    def build(cls, devices: Iterable[Device], cables: Iterable[Cable]) -> LevelNetwork:
+        network = cls()
+        for device in devices:
+            network.add_device(device)
+        for cable in cables:
+            network.add_cable(cable)
+        return network
+
+    def add_device(self, device: Device):
+        self.devices[device.id] = build_network_device(device)
+        self.names[device.name] = device.id
+        self._device_names[device.id] = device.name
+        self.reachability.add_device(device)
+
+    def update_device(self, device: Device):
+        """Apply the changes of the configuration of a device (its name and its IP address)."""
+        network_device = self.devices[device.id]
+
+        old_name = self._device_names[device.id]
+        if old_name != device.name:
+            if self.names.get(old_name) == device.id:
+                del self.names[old_name]
+            self.names[device.name] = device.id
+            self._device_names[device.id] = device.name
+
+        self.reachability.update_device(device)
+        ipv4 = network_device.get_capability(IPv4Capability)
+        if device.ip is None:
+            network_device.remove_capability(IPv4Capability)
+        elif ipv4 is None:
+            network_device.add_capability(IPv4Capability(ip_address=IPv4Address(device.ip)))
+        else:
+            ipv4.ip_address = IPv4Address(device.ip)
+
+    def remove_device(self, device_id: int):
+        """Remove a device, with the cables connected to it."""
+        for cable in [cable for cable in self._cables.values() if device_id in (cable.device_id_1, cable.device_id_2)]:
+            self.remove_cable(cable.id)
+        del self.devices[device_id]
+        self.reachability.remove_device(device_id)
+        name = self._device_names.pop(device_id)
+        if self.names.get(name) == device_id:
+            del self.names[name]
+
+    def add_cable(self, cable: Cable):
+        device_a = self.devices[cable.device_id_1]
+        device_b = self.devices[cable.device_id_2]
+        device_a.add_connection(cable.port_1, device_b, cable.port_2)
+        self._cables[cable.id] = cable
+        self.reachability.add_cable(cable)
+        _topology_changed(device_a, device_b)
+
+    def remove_cable(self, cable_id: int):
+        cable = self._cables.pop(cable_id)
+        self.reachability.remove_cable(cable_id)
+        device_a = self.devices[cable.device_id_1]
+        device_b = self.devices[cable.device_id_2]
+        device_a.remove_connection(device_b)
+        _topology_changed(device_a, device_b)
+
+    def enable_trace(self, size: int) -> PacketTrace:
+        """Start recording the last `size` events of the simulations of the level, if it is not already done."""
+        if self.trace is None:
+            self.trace = self.engine.trace = PacketTrace(size)
+        return self.trace
+
+    def reset(self):
+        """Forget everything learned during the previous simulation."""
+        for device in self.devices.values():
+            device.reset()
+
+    def state(self, prewarm: bool = False) -> NetworkState:
+        """
+        A new state to run simulations on this network without changing the live one: an empty one, or one with the
+        ARP and MAC address tables filled from the topology if `prewarm` is true. Run each simulation in its own fork.
+        The spanning trees are computed first, so the simulations only read the network (and can run in parallel).
+        """
+        for device in self.devices.values():
+            if (spanning_tree := device.get_capability(SpanningTree)) is not None:
+                _ = spanning_tree.blocked_ports
+        state = NetworkState()
+        if prewarm:
+            prewarm_state(state, self.devices.values())
+        # The tables of the pre-warmed state are shared, they must not be changed.
+        return state.fork()
+
+
+def prewarm_state(state: NetworkState, devices: Iterable[NetworkDevice]):
+    """
+    Fill the tables of a state as if all the devices of each broadcast domain had already talked to each other: the
+    ARP tables have the addresses of all the hosts of the domain, and the MAC address tables have the port to reach
+    each device of the domain.
+    The hosts of a domain share the same ARP table, the state must only be used through its forks.
+    """
+    done: set[NetworkDevice] = set()
+    for device in devices:
+        if device in done:
+            continue
+        domain = _flood(device)
+        done |= domain
+
+        addresses = {
+            ipv4.ip_address: host.mac_address
+            for host in domain
+            if (ipv4 := host.get_capability(IPv4Capability)) is not None
+        }
+        for host in domain:
+            if (arp := host.get_capability(ARPCapability)) is not None:
+                state.set_table(arp.arp_table, addresses)
+
+        with state.activate():
+            for switch in domain:
+                if (switching := switch.get_capability(Layer2Switching)) is None:
+                    continue
+                for neighbour in _links(switch):
+                    port = switch.connected_devices[neighbour]
+                    for reached in _flood(neighbour, previous=switch):
+                        switching.learn(reached.mac_address, port)
+
+
+def _is_blocked(device: NetworkDevice, port: int) -> bool:
+    spanning_tree = device.get_capability(SpanningTree)
+    return spanning_tree is not None and spanning_tree.is_blocked(port)
+
+
+def _links(device: NetworkDevice) -> Iterator[NetworkDevice]:
+    """The devices a frame can go to from a device (the ports blocked by the spanning trees are not used)."""
+    for neighbour, port in device.connected_devices.items():
+        if not _is_blocked(device, port) and not _is_blocked(neighbour, neighbour.connected_devices[device]):
+            yield neighbour
+
+
+def _flood(start: NetworkDevice, previous: NetworkDevice | None = None) -> set[NetworkDevice]:
+    """
+    The devices reached by a broadcast sent by `start`, or forwarded by `start` if it received it from `previous`
+    (the broadcast doesn't go back to `previous` then). Only the switches forward the frames.
+    """
+    reached = {start}
+    if previous is not None:
+        reached.add(previous)
+    queue = deque((start,))
+    while queue:
+        device = queue.popleft()
+        if (device is not start or previous is not None) and Layer2Switching not in device.capabilities:
+            continue
+        for neighbour in _links(device):
+            if neighbour not in reached:
+                reached.add(neighbour)
+                queue.append(neighbour)
+    if previous is not None:
+        reached.discard(previous)
+    return reached
+
+
+def _topology_changed(*devices: NetworkDevice):
+    """Compute the spanning trees of the devices again, the next time they are needed."""
+    for device in devices:
+        spanning_tree = device.get_capability(SpanningTree)
+        if spanning_tree is not None:
+            spanning_tree.invalidate()
+
+
+def get_level_network(level: LevelData) -> LevelNetwork:
+    """Get the simulated network of a cached level, building it if it doesn't exist yet."""
+    if level.network is None:
+        level.network = LevelNetwork.build(level.devices.values(), level.cables.values())
+        logger.debug("Built %r for level %s", level.network, level.level_id)
+    return level.network
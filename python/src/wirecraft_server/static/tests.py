@@ -1,11 +1,17 @@
-from collections.abc import Sequence
+from collections.abc import Collection, Sequence
 from ipaddress import IPv4Address
+from typing import TYPE_CHECKING
 
 from pydantic import BaseModel
 
 from ..database.models import Device
+from ..networking.capabilities import Routing
 from ..networking.device import NetworkDevice
-from ..networking.requests import send_ping
+from ..networking.engine import SimulationEngine
+
+if TYPE_CHECKING:
+    from ..grading import LevelTopology
+    from ..reachability import Reachability
 
 
 class TestFailure(Exception):
@@ -20,9 +26,21 @@ class Test(BaseModel):
         devices: Sequence[Device],
         network: dict[int, NetworkDevice],
         map_names: dict[str, int],
+        reachability: "Reachability | None" = None,
     ) -> None:
+        """
+        Raise a `TestFailure` if the test fails.
+        `reachability` tells which devices can reach each other from the cables, to fail fast when it is given.
+        """
         raise NotImplementedError
 
+    def dependencies(self, topology: "LevelTopology") -> Collection[int] | None:
+        """
+        The ids of the devices the result of the test depends on (with the cables between them), or None if it depends
+        on the whole level. The result of the test is reused until one of them changes.
+        """
+        return None
+
 
 class DevicePresenceTest(Test):
     name: str
@@ -33,6 +51,7 @@ class DevicePresenceTest(Test):
         devices: Sequence[Device],
         network: dict[int, NetworkDevice],
         map_names: dict[str, int],
+        reachability: "Reachability | None" = None,
     ):
         for device in devices:
             if device.name == self.name:
@@ -42,12 +61,21 @@ class DevicePresenceTest(Test):
 
         raise TestFailure(f"Device {self.name} of type {self.type} not found in the network.")
 
+    def dependencies(self, topology: "LevelTopology") -> Collection[int] | None:
+        return topology.find(self.name)
+
 
 class CableConnectionTest(Test):
     source: str
     destination: str
 
-    def __call__(self, devices: Sequence[Device], network: dict[int, NetworkDevice], map_names: dict[str, int]) -> None:
+    def __call__(
+        self,
+        devices: Sequence[Device],
+        network: dict[int, NetworkDevice],
+        map_names: dict[str, int],
+        reachability: "Reachability | None" = None,
+    ) -> None:
         source_device_id = map_names.get(self.source)
         destination_device_id = map_names.get(self.destination)
 
@@ -62,6 +90,9 @@ class CableConnectionTest(Test):
         if destination_device not in source_device.connected_devices:
             raise TestFailure(f"Device {self.source} is not connected to {self.destination}.")
 
+    def dependencies(self, topology: "LevelTopology") -> Collection[int] | None:
+        return topology.find(self.source) | topology.find(self.destination)
+
 
 class PingTest(Test):
     source: str
@@ -72,12 +103,32 @@ class PingTest(Test):
         devices: Sequence[Device],
         network: dict[int, NetworkDevice],
         map_names: dict[str, int],
+        reachability: "Reachability | None" = None,
     ):
         source_device_id = map_names.get(self.source)
         if source_device_id is None:
             raise TestFailure(f"Source device '{self.source}' not found in the network.")
 
         source_device = network[source_device_id]
-        response = send_ping(source_device, self.destination)
-        if not response:
+        if reachability is not None and not self._may_succeed(source_device_id, source_device, reachability):
             raise TestFailure(f"Ping from {self.source} to {self.destination} failed.")
+
+        engine = SimulationEngine()
+        probe = engine.ping(source_device, self.destination)
+        engine.run()
+        if not probe.success:
+            raise TestFailure(f"Ping from {self.source} to {self.destination} failed.")
+
+    def _may_succeed(self, source_device_id: int, source_device: NetworkDevice, reachability: "Reachability") -> bool:
+        """False if the next hop can't be reached from the source at L2: the ping would fail, no need to simulate it."""
+        routing = source_device.get_capability(Routing)
+        route = routing.routing_table.get_route(self.destination) if routing is not None else None
+        if route is None:
+            # The simulation fails right away.
+            return True
+        next_hop = route.gateway if route.gateway is not None else self.destination
+        return reachability.can_reach(source_device_id, route.interface, next_hop)
+
+    def dependencies(self, topology: "LevelTopology") -> Collection[int] | None:
+        # Everything reachable from the source (the destination can only be reached through the cables).
+        return topology.component(self.source)
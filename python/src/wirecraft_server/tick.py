@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+type TickJobCallback = Callable[[], Awaitable[Any]]
+
+
+class TickJob:
+    """
+    A job run by the tick scheduler.
+
+    The job runs at most once every `interval` seconds (at every tick if 0). The jobs with the highest priority run
+    first. If a job runs for longer than its `budget` (in seconds), an overrun is recorded.
+    """
+
+    __slots__ = (
+        "budget",
+        "callback",
+        "deferred_count",
+        "deferred_ticks",
+        "forced_count",
+        "interval",
+        "last_run",
+        "max_duration",
+        "name",
+        "overrun_count",
+        "priority",
+        "run_count",
+        "total_duration",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        callback: TickJobCallback,
+        interval: float = 0,
+        priority: int = 0,
+        budget: float | None = None,
+    ):
+        self.name = name
+        self.callback = callback
+        self.interval = interval
+        self.priority = priority
+        self.budget = budget
+        self.last_run = time.perf_counter()
+
+        self.run_count = 0
+        self.overrun_count = 0
+        self.deferred_count = 0
+        # The number of ticks the job has been deferred in a row.
+        self.deferred_ticks = 0
+        self.forced_count = 0
+        self.total_duration = 0.0
+        self.max_duration = 0.0
+
+    def __repr__(self):
+        return f"TickJob({self.name})"
+
+    def is_due(self, now: float) -> bool:
+        return now - self.last_run >= self.interval
+
+    async def run(self, now: float):
+        self.last_run = now
+        self.deferred_ticks = 0
+        try:
+            await self.callback()
+        except Exception:
+            logger.exception("Error in the tick job %s:", self.name)
+        duration = time.perf_counter() - now
+        self.run_count += 1
+        self.total_duration += duration
+        self.max_duration = max(self.max_duration, duration)
+        if self.budget is not None and duration > self.budget:
+            self.overrun_count += 1
+            logger.debug("%r took %.3fs, over its budget of %.3fs", self, duration, self.budget)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "priority": self.priority,
+            "runs": self.run_count,
+            "avg_duration": self.total_duration / self.run_count if self.run_count else 0,
+            "max_duration": self.max_duration,
+            "overruns": self.overrun_count,
+            "deferred": self.deferred_count,
+            "forced": self.forced_count,
+        }
+
+
+class TickScheduler:
+    """
+    Run the background jobs of the server at a fixed rate.
+
+    - When a tick runs late, the next ticks run back to back to catch up, but at most `max_catch_up` of them: beyond
+      that, the late ticks are skipped (and counted).
+    - When the ticks keep overrunning their time budget (1 / rate), the scheduler is overloaded and slows down, down to
+      `min_rate`. It goes back to the target rate once the load decreases.
+    - Within a tick, the jobs run by priority. Once the budget of the tick is spent, the remaining jobs are deferred to
+      the next tick. A job deferred `max_deferrals` ticks in a row runs anyway, so the low priority jobs are never
+      starved by a sustained load.
+    """
+
+    # The tick duration is smoothed over the last ticks (exponential moving average).
+    SMOOTHING = 0.1
+    # Slow down when the ticks use more than this part of their budget, speed up when they use less than `RECOVER`.
+    OVERLOAD = 0.9
+    RECOVER = 0.5
+    STEP = 1.25
+
+    def __init__(self, rate: float, min_rate: float | None = None, max_catch_up: int = 5, max_deferrals: int = 5):
+        self.rate = rate
+        self.min_rate = min(rate, min_rate) if min_rate is not None else rate
+        self.max_catch_up = max_catch_up
+        self.max_deferrals = max_deferrals
+        self.current_rate = rate
+        self._jobs: list[TickJob] = []
+
+        self.tick = 0
+        self.skipped_ticks = 0
+        self.overloaded = False
+        self.last_duration = 0.0
+        self.avg_duration = 0.0
+        self.max_duration = 0.0
+        self.lag = 0.0
+        self.max_lag = 0.0
+
+    @property
+    def interval(self) -> float:
+        return 1 / self.current_rate
+
+    def add_job(
+        self,
+        name: str,
+        callback: TickJobCallback,
+        *,
+        interval: float = 0,
+        priority: int = 0,
+        budget: float | None = None,
+    ) -> TickJob:
+        """Register a job to run on the ticks. See `TickJob`."""
+        if any(job.name == name for job in self._jobs):
+            raise ValueError(f"Tick job {name} is already registered.")
+        job = TickJob(name, callback, interval, priority, budget)
+        self._jobs.append(job)
+        self._jobs.sort(key=lambda job: -job.priority)
+        return job
+
+    def remove_job(self, name: str):
+        self._jobs = [job for job in self._jobs if job.name != name]
+
+    async def run(self, stop: asyncio.Event):
+        """Run the ticks until `stop` is set."""
+        deadline = time.perf_counter()
+        while not stop.is_set():
+            deadline += self.interval
+            wait = deadline - time.perf_counter()
+            if wait > 0:
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(stop.wait(), wait)
+                if stop.is_set():
+                    break
+            else:
+                # Let the other tasks (the clients) run between two late ticks.
+                await asyncio.sleep(0)
+
+            started_at = time.perf_counter()
+            self.lag = max(0.0, started_at - deadline)
+            self.max_lag = max(self.max_lag, self.lag)
+            late_ticks = int(self.lag / self.interval)
+            if late_ticks > self.max_catch_up:
+                skipped = late_ticks - self.max_catch_up
+                self.skipped_ticks += skipped
+                deadline += skipped * self.interval
+                logger.warning("Can't keep up! %ss behind, %s ticks skipped", round(self.lag, 3), skipped)
+
+            await self.run_tick(started_at)
+
+    async def run_tick(self, started_at: float | None = None):
+        """Run the jobs due for a single tick."""
+        if started_at is None:
+            started_at = time.perf_counter()
+        self.tick += 1
+        budget_end = started_at + self.interval
+        now = started_at
+        for job in self._jobs:
+            if not job.is_due(now):
+                continue
+            if now >= budget_end:
+                if job.deferred_ticks < self.max_deferrals:
+                    job.deferred_count += 1
+                    job.deferred_ticks += 1
+                    continue
+                job.forced_count += 1
+                logger.debug("%r deferred for %s ticks, running it over the tick budget", job, job.deferred_ticks)
+            await job.run(now)
+            now = time.perf_counter()
+
+        self.last_duration = now - started_at
+        self.max_duration = max(self.max_duration, self.last_duration)
+        self.avg_duration += self.SMOOTHING * (self.last_duration - self.avg_duration)
+        self._adapt()
+
+    def _adapt(self):
+        """Slow down the ticks when they overrun their budget, and speed up again when the load decreases."""
+        load = self.avg_duration / self.interval
+        if load > self.OVERLOAD:
+            self.current_rate = max(self.min_rate, self.current_rate / self.STEP)
+            if not self.overloaded:
+                logger.warning("The server is overloaded, slowing down to %.1f ticks per second", self.current_rate)
+            self.overloaded = True
+        elif load < self.RECOVER:
+            self.current_rate = min(self.rate, self.current_rate * self.STEP)
+            if self.overloaded and self.current_rate == self.rate:
+                logger.info("The server is back to %s ticks per second", self.rate)
+                self.overloaded = False
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "tick": self.tick,
+            "rate": self.rate,
+            "current_rate": self.current_rate,
+            "overloaded": self.overloaded,
+            "last_duration": self.last_duration,
+            "avg_duration": self.avg_duration,
+            "max_duration": self.max_duration,
+            "lag": self.lag,
+            "max_lag": self.max_lag,
+            "skipped_ticks": self.skipped_ticks,
+            "jobs": {job.name: job.stats() for job in self._jobs},
+        }
@@ -1,35 +1,28 @@
-import random
-
 from .networking.mac_address import MacAddress
 
+# Knuth's multiplicative hash constant, used to spread the IDs over the first 3 bytes.
+_MIX = 0x9E3779B1
+
 
 def id_to_mac(id: int) -> MacAddress:
     """
-    Convert an integer ID to a MAC address string.
-    To 3 first bytes are random, the last 3 bytes are derived from the ID.
+    Convert an integer ID to a MAC address.
+    The 3 first bytes are derived from the ID, the last 3 bytes are the ID itself.
 
     Example with 7983034:
         In binary, 7983034 is represented as: 0b01111001 11001111 10111010
         We just take the last 3 bytes and convert them to hex:
         01111001 11001111 10111010 -> 79:cf:ba
 
-        The first 3 bytes are random but with set seed to ensure idempotency.
+        The first 3 bytes are a hash of the ID, so the addresses look random but are idempotent. The first byte is
+        marked as a locally administered unicast address.
     """
-    rand = random.Random(id)  # noqa: S311
-    mac = [
-        rand.randint(0, 255),
-        rand.randint(0, 255),
-        rand.randint(0, 255),
-        id >> 16,
-        (id >> 8) & 0xFF,
-        id & 0xFF,
-    ]
-    return MacAddress(":".join(f"{byte:02x}" for byte in mac))
+    low = id & 0xFFFFFF
+    high = (id * _MIX >> 8) & 0xFFFFFF
+    high = (high & ~0x010000) | 0x020000  # unicast, locally administered
+    return MacAddress(high << 24 | low)
 
 
 def mac_to_id(mac: MacAddress) -> int:
     """Revert id_to_mac"""
-    parts = mac.root.split(":")
-    if len(parts) != 6:
-        raise ValueError(f"Invalid MAC address format: {mac}")
-    return int(parts[3], 16) << 16 | int(parts[4], 16) << 8 | int(parts[5], 16)
+    return mac.value & 0xFFFFFF
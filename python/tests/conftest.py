@@ -0,0 +1,25 @@
+from collections.abc import AsyncGenerator
+
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from wirecraft_server.database import cache
+from wirecraft_server.database.cache import LevelCache
+
+engine = create_async_engine("sqlite+aiosqlite:///:memory:", poolclass=StaticPool)
+async_session = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+
+
+@pytest.fixture
+async def level_cache(monkeypatch: pytest.MonkeyPatch) -> AsyncGenerator[LevelCache]:
+    """A level cache backed by an empty in-memory database."""
+    monkeypatch.setattr(cache, "async_session", async_session)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.drop_all)
+        await conn.run_sync(SQLModel.metadata.create_all)
+
+    yield LevelCache(max_levels=2, ttl=600)
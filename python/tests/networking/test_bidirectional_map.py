@@ -0,0 +1,35 @@
+from wirecraft_server.networking.bidirectional_map import BidirectionalMap
+
+
+def test_bidirectional_map():
+    bimap = BidirectionalMap[str, int]([("a", 1), ("b", 2)])
+    assert bimap["a"] == 1
+    assert bimap.inverse[2] == "b"
+    assert "a" in bimap
+    assert len(bimap) == 2
+    assert bimap.inverse.inverse is bimap
+
+    # A key is moved to another value: its previous value is forgotten.
+    bimap["a"] = 3
+    assert bimap.root == {"a": 3, "b": 2}
+    assert bimap.inverse.root == {3: "a", 2: "b"}
+
+    # A value is given to another key: its previous key is forgotten.
+    bimap["c"] = 2
+    assert bimap.root == {"a": 3, "c": 2}
+    assert bimap.inverse.root == {3: "a", 2: "c"}
+
+    del bimap["a"]
+    assert bimap.pop("c") == 2
+    assert not bimap
+    assert bimap.inverse.root == {}
+
+
+def test_inverse_is_shared():
+    bimap = BidirectionalMap[str, int]()
+    inverse = bimap.inverse
+    inverse[1] = "a"
+    assert bimap["a"] == 1
+    bimap.clear()
+    assert 1 not in inverse
+    assert list(bimap.values()) == []
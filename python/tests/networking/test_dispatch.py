@@ -0,0 +1,74 @@
+import pytest
+
+from wirecraft_server.networking import IPv4Address, MacAddress, NetworkDevice
+from wirecraft_server.networking.capabilities import (
+    ARPCapability,
+    BasicEthernetFrameCapability,
+    ICMPCapability,
+    IPv4Capability,
+    Layer2Switching,
+    Routing,
+    SpanningTree,
+)
+from wirecraft_server.networking.device import compile_dispatch
+from wirecraft_server.networking.osi import ARPPacket, EthernetFrame, IPv4Packet
+from wirecraft_server.networking.requests import host_capabilities
+
+
+def test_dispatch_is_shared():
+    devices = [NetworkDevice(mac_address=MacAddress(i)) for i in range(1, 3)]
+    for i, device in enumerate(devices):
+        device.add_capability(
+            BasicEthernetFrameCapability(),
+            ARPCapability(),
+            IPv4Capability(ip_address=IPv4Address(f"192.168.0.{i + 1}")),
+        )
+        assert device.frame_handler is device.get_capability(BasicEthernetFrameCapability)
+        assert device.data_handlers[ARPPacket] is device.get_capability(ARPCapability)
+        assert device.data_handlers[IPv4Packet] is device.get_capability(IPv4Capability)
+
+    dispatch = compile_dispatch((BasicEthernetFrameCapability, ARPCapability, IPv4Capability))
+    assert compile_dispatch((BasicEthernetFrameCapability, ARPCapability, IPv4Capability)) is dispatch
+    assert dispatch[EthernetFrame] is BasicEthernetFrameCapability
+
+    # The references between the capabilities follow the changes.
+    device = devices[0]
+    arp = device.get_capability(ARPCapability)
+    assert arp is not None
+    assert arp._ipv4 is device.get_capability(IPv4Capability)
+    ethernet = device.get_capability(BasicEthernetFrameCapability)
+    assert ethernet is not None
+    assert ethernet._arp_handler is arp
+    assert ethernet._ipv4_handler is device.get_capability(IPv4Capability)
+    device.remove_capability(IPv4Capability)
+    assert arp._ipv4 is None
+    assert IPv4Packet not in device.data_handlers
+    assert ethernet._ipv4_handler is None, "The handlers of the payloads should be wired again"
+
+
+def test_host_wiring():
+    computer = NetworkDevice(mac_address=MacAddress(1))
+    computer.add_capability(ARPCapability(), ICMPCapability())
+    with pytest.raises(ValueError, match="No routing capability found"):
+        host_capabilities(computer)
+
+    computer.add_capability(Routing(), IPv4Capability(ip_address=IPv4Address("192.168.0.1")))
+    assert host_capabilities(computer) == (
+        computer.get_capability(Routing),
+        computer.get_capability(ARPCapability),
+        computer.get_capability(IPv4Capability),
+    )
+    ipv4 = computer.get_capability(IPv4Capability)
+    assert ipv4 is not None
+    assert ipv4._icmp_handler is computer.get_capability(ICMPCapability)
+
+
+def test_switch_wiring():
+    switch = NetworkDevice(mac_address=MacAddress(1))
+    switch.add_capability(Layer2Switching())
+    switching = switch.get_capability(Layer2Switching)
+    assert switching is not None
+    assert switching._spanning_tree is None
+    switch.add_capability(SpanningTree())
+    assert switching._spanning_tree is switch.get_capability(SpanningTree)
+    assert switch.frame_handler is switching
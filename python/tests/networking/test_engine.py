@@ -0,0 +1,148 @@
+import itertools
+
+from wirecraft_server.networking import IPv4Address, IPv4Network, MacAddress, NetworkDevice
+from wirecraft_server.networking.capabilities import (
+    ARPCapability,
+    BasicEthernetFrameCapability,
+    ICMPCapability,
+    IPv4Capability,
+    Layer2Switching,
+    Routing,
+)
+from wirecraft_server.networking.engine import SimulationEngine
+from wirecraft_server.networking.requests import send_ping
+
+
+def make_computer(mac: str, ip: str) -> NetworkDevice:
+    computer = NetworkDevice(mac_address=MacAddress(mac))
+    routing = Routing()
+    routing.routing_table.add_route(IPv4Network("192.168.0.0/24"))
+    computer.add_capability(
+        BasicEthernetFrameCapability(),
+        routing,
+        ARPCapability(),
+        IPv4Capability(ip_address=IPv4Address(ip)),
+        ICMPCapability(),
+    )
+    return computer
+
+
+def make_switch(mac: str) -> NetworkDevice:
+    switch = NetworkDevice(mac_address=MacAddress(mac))
+    switch.add_capability(Layer2Switching())
+    return switch
+
+
+def test_ping_through_switches():
+    computer_a = make_computer("AA:AA:AA:AA:AA:AA", "192.168.0.2")
+    computer_b = make_computer("BB:BB:BB:BB:BB:BB", "192.168.0.3")
+    switch_a = make_switch("11:11:EE:FF:00:11")
+    switch_b = make_switch("22:DD:EE:FF:00:11")
+    computer_a.add_connection(0, switch_a, 0)
+    switch_a.add_connection(1, switch_b, 0)
+    switch_b.add_connection(1, computer_b, 0)
+
+    engine = SimulationEngine()
+    probe = engine.ping(computer_a, IPv4Address("192.168.0.3"))
+    failed = engine.ping(computer_a, IPv4Address("192.168.0.4"))
+    engine.run()
+
+    assert probe.done
+    assert probe.success, probe.error
+    assert failed.done
+    assert not failed.success
+    assert engine.pending == 0
+
+    arp = computer_a.get_capability(ARPCapability)
+    assert arp is not None
+    assert arp.arp_table[IPv4Address("192.168.0.3")] == MacAddress("BB:BB:BB:BB:BB:BB")
+    switching = switch_a.get_capability(Layer2Switching)
+    assert switching is not None
+    assert switching._mac_address_table[MacAddress("BB:BB:BB:BB:BB:BB")] == 1
+    assert switching._mac_address_table[MacAddress("AA:AA:AA:AA:AA:AA")] == 0
+
+
+def test_concurrent_pings_and_latency():
+    computers = [make_computer(f"02:00:00:00:00:{i:02x}", f"192.168.0.{i}") for i in range(1, 5)]
+    switch = make_switch("02:00:00:00:01:00")
+    for port, computer in enumerate(computers):
+        computer.add_connection(0, switch, port)
+    engine = SimulationEngine(default_latency=0.1)
+
+    probes = [engine.ping(computer, IPv4Address(f"192.168.0.{5 - i}")) for i, computer in enumerate(computers, 1)]
+    # ARP request, ARP reply, echo request and echo reply: 4 exchanges of 2 links.
+    engine.advance(0.75)
+    assert not any(probe.done for probe in probes), "The pings should not be done before the latency elapsed"
+    engine.advance(0.1)
+    assert all(probe.success for probe in probes)
+
+
+def test_forwarding_loop_is_bounded():
+    computer_a = make_computer("AA:AA:AA:AA:AA:AA", "192.168.0.2")
+    switches = [make_switch(f"02:00:00:00:02:{i:02x}") for i in range(3)]
+    computer_a.add_connection(0, switches[0], 0)
+    # A loop between the three switches.
+    switches[0].add_connection(1, switches[1], 0)
+    switches[1].add_connection(1, switches[2], 0)
+    switches[2].add_connection(1, switches[0], 2)
+
+    engine = SimulationEngine(max_hops=16)
+    probe = engine.ping(computer_a, IPv4Address("192.168.0.3"))
+    engine.run()
+
+    assert probe.done
+    assert not probe.success
+    assert engine.looped_count > 0, "The frames going around the loop should be dropped"
+
+
+def make_chain(length: int) -> tuple[NetworkDevice, list[NetworkDevice]]:
+    """Two computers linked by a chain of switches, return the first computer and the switches."""
+    computer_a = make_computer("AA:AA:AA:AA:AA:AA", "192.168.0.2")
+    computer_b = make_computer("BB:BB:BB:BB:BB:BB", "192.168.0.3")
+    switches = [make_switch(f"02:00:00:00:{i >> 8:02x}:{i & 0xFF:02x}") for i in range(length)]
+    computer_a.add_connection(0, switches[0], 0)
+    for switch_a, switch_b in itertools.pairwise(switches):
+        switch_a.add_connection(1, switch_b, 0)
+    switches[-1].add_connection(1, computer_b, 0)
+    return computer_a, switches
+
+
+def test_hop_limit_applies_per_frame():
+    computer_a, switches = make_chain(20)
+
+    # Each of the 4 frames of the ping crosses 21 links, 84 in total.
+    engine = SimulationEngine(max_hops=32)
+    probe = engine.ping(computer_a, IPv4Address("192.168.0.3"))
+    engine.run()
+    assert probe.success, probe.error
+    assert engine.expired_count == 0
+
+    for switch in switches:
+        switching = switch.get_capability(Layer2Switching)
+        assert switching is not None
+        switching.reset()
+    arp = computer_a.get_capability(ARPCapability)
+    assert arp is not None
+    arp.reset()
+    engine = SimulationEngine(max_hops=16)
+    probe = engine.ping(computer_a, IPv4Address("192.168.0.3"))
+    engine.run()
+    assert not probe.success
+    assert engine.expired_count == 1
+
+
+def test_forwarding_depth_limit():
+    depth = Layer2Switching.MAX_FORWARDING_DEPTH
+    computer_a, _ = make_chain(depth)
+    engine = SimulationEngine()
+    probe = engine.ping(computer_a, IPv4Address("192.168.0.3"))
+    engine.run()
+    assert probe.success, probe.error
+    assert send_ping(computer_a, IPv4Address("192.168.0.3")), "handle_request should have the same limit"
+
+    computer_a, _ = make_chain(depth + 1)
+    engine = SimulationEngine()
+    probe = engine.ping(computer_a, IPv4Address("192.168.0.3"))
+    engine.run()
+    assert not probe.success
+    assert not send_ping(computer_a, IPv4Address("192.168.0.3"))
@@ -0,0 +1,127 @@
+from wirecraft_server.networking import IPv4Address, IPv4Network, MacAddress, NetworkDevice
+from wirecraft_server.networking.capabilities import (
+    ARPCapability,
+    BasicEthernetFrameCapability,
+    ICMPCapability,
+    IPv4Capability,
+    Layer2Switching,
+    Routing,
+    SpanningTree,
+)
+from wirecraft_server.networking.engine import SimulationEngine
+from wirecraft_server.networking.osi import DEFAULT_TTL, ICMPMessage, ICMPType, IPv4Packet
+from wirecraft_server.networking.requests import send_ping
+
+
+def make_computer(mac: str, ip: str) -> NetworkDevice:
+    computer = NetworkDevice(mac_address=MacAddress(mac))
+    routing = Routing()
+    routing.routing_table.add_route(IPv4Network("192.168.0.0/24"))
+    computer.add_capability(
+        BasicEthernetFrameCapability(),
+        routing,
+        ARPCapability(),
+        IPv4Capability(ip_address=IPv4Address(ip)),
+        ICMPCapability(),
+    )
+    return computer
+
+
+def make_mesh(size: int, spanning_tree: bool = False) -> list[NetworkDevice]:
+    """Switches all connected to each other: the port `j` of the switch `i` is connected to the switch `j`."""
+    switches = [NetworkDevice(mac_address=MacAddress(f"02:00:00:00:01:{i:02x}")) for i in range(size)]
+    for switch in switches:
+        switch.add_capability(Layer2Switching())
+        if spanning_tree:
+            switch.add_capability(SpanningTree())
+    for i, switch_a in enumerate(switches):
+        for j in range(i + 1, size):
+            switch_a.add_connection(j, switches[j], i)
+    return switches
+
+
+def test_loop_with_handle_request():
+    computer_a = make_computer("AA:AA:AA:AA:AA:AA", "192.168.0.2")
+    computer_b = make_computer("BB:BB:BB:BB:BB:BB", "192.168.0.3")
+    switches = make_mesh(6)
+    computer_a.add_connection(0, switches[0], 10)
+    computer_b.add_connection(0, switches[5], 10)
+
+    assert send_ping(computer_a, IPv4Address("192.168.0.3")) is True, "Ping should succeed despite the loops"
+    assert send_ping(computer_a, IPv4Address("192.168.0.4")) is False, "Ping to a missing device should fail"
+    loops = 0
+    for switch in switches:
+        switching = switch.get_capability(Layer2Switching)
+        assert switching is not None
+        loops += switching.loops_detected
+    assert loops > 0, "The floods should have gone around the loops"
+
+
+def test_loop_with_engine():
+    computer_a = make_computer("AA:AA:AA:AA:AA:AA", "192.168.0.2")
+    computer_b = make_computer("BB:BB:BB:BB:BB:BB", "192.168.0.3")
+    switches = make_mesh(6)
+    computer_a.add_connection(0, switches[0], 10)
+    computer_b.add_connection(0, switches[5], 10)
+
+    engine = SimulationEngine()
+    probe = engine.ping(computer_a, IPv4Address("192.168.0.3"))
+    missing = engine.ping(computer_a, IPv4Address("192.168.0.4"))
+    engine.run()
+
+    assert probe.success, probe.error
+    assert missing.done
+    assert not missing.success
+    assert engine.looped_count > 0
+    assert engine.delivered_count < 1000, "The floods should be bounded"
+
+
+def test_spanning_tree():
+    switches = make_mesh(4, spanning_tree=True)
+
+    blocked: list[set[int]] = []
+    for switch in switches:
+        spanning_tree = switch.get_capability(SpanningTree)
+        assert spanning_tree is not None
+        blocked.append(set(spanning_tree.blocked_ports))
+    # The switch 0 is the root bridge, all the others are connected to it.
+    assert blocked == [set(), {2, 3}, {1, 3}, {1, 2}]
+
+    computer_a = make_computer("AA:AA:AA:AA:AA:AA", "192.168.0.2")
+    computer_b = make_computer("BB:BB:BB:BB:BB:BB", "192.168.0.3")
+    computer_a.add_connection(0, switches[1], 10)
+    computer_b.add_connection(0, switches[3], 10)
+
+    engine = SimulationEngine()
+    probe = engine.ping(computer_a, IPv4Address("192.168.0.3"))
+    engine.run()
+    assert probe.success, probe.error
+    assert engine.looped_count == 0, "No frame should go around a loop"
+
+    # The link between the switches 0 and 3 is removed: 3 is now reached through 1.
+    switches[0].remove_connection(switches[3])
+    for switch in (switches[0], switches[3]):
+        spanning_tree = switch.get_capability(SpanningTree)
+        assert spanning_tree is not None
+        spanning_tree.invalidate()
+    spanning_tree = switches[3].get_capability(SpanningTree)
+    assert spanning_tree is not None
+    assert spanning_tree.blocked_ports == {2}
+
+
+def test_reply_ttl():
+    computer = make_computer("AA:AA:AA:AA:AA:AA", "192.168.0.2")
+    ipv4 = computer.get_capability(IPv4Capability)
+    assert ipv4 is not None
+
+    reply = ipv4(
+        computer,
+        IPv4Packet(
+            ttl=1,
+            source_ip=IPv4Address("192.168.0.3"),
+            destination_ip=IPv4Address("192.168.0.2"),
+            payload=ICMPMessage(type=ICMPType.ECHO_REQUEST),
+        ),
+    )
+    assert reply is not None
+    assert reply.ttl == DEFAULT_TTL, "A reply is a new packet, it doesn't inherit the TTL of the request"
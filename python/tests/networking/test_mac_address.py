@@ -0,0 +1,36 @@
+import pytest
+from pydantic import TypeAdapter, ValidationError
+
+from wirecraft_server.networking import MacAddress
+
+
+def test_mac_address_interned():
+    mac = MacAddress("AA:BB:CC:DD:EE:FF")
+    assert mac is MacAddress("aa-bb-cc-dd-ee-ff")
+    assert mac is MacAddress("aabb.ccdd.eeff")
+    assert mac is MacAddress(0xAABBCCDDEEFF)
+    assert mac.root == "aa:bb:cc:dd:ee:ff"
+    assert str(mac) == "aa:bb:cc:dd:ee:ff"
+    assert mac != MacAddress("aa:bb:cc:dd:ee:00")
+
+
+def test_mac_address_broadcast():
+    assert MacAddress.broadcast() is MacAddress("ff:ff:ff:ff:ff:ff")
+    assert MacAddress.broadcast().is_broadcast
+    assert not MacAddress("aa:bb:cc:dd:ee:ff").is_broadcast
+
+
+@pytest.mark.parametrize("address", ["aa:bb:cc:dd:ee", "0x:bb:cc:dd:ee:ff", "gg:bb:cc:dd:ee:ff", 1 << 48])
+def test_mac_address_invalid(address: str | int):
+    with pytest.raises(ValueError, match="Invalid MAC address"):
+        MacAddress(address)
+
+
+def test_mac_address_pydantic():
+    adapter = TypeAdapter(MacAddress)
+    mac = adapter.validate_python("AA:BB:CC:DD:EE:FF")
+    assert mac is MacAddress("aa:bb:cc:dd:ee:ff")
+    assert adapter.validate_json('"aa:bb:cc:dd:ee:ff"') is mac
+    assert adapter.dump_json(mac) == b'"aa:bb:cc:dd:ee:ff"'
+    with pytest.raises(ValidationError):
+        adapter.validate_python("not a mac")
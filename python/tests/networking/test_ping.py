@@ -45,7 +45,7 @@ def test_direct_ping():
 
     assert send_ping(computer_a, IPv4Address("192.168.0.3")) is False, "Ping should fail before connection!"
 
-    assert arp_cap_a.arp_table.root == {}, "ARP table of A should still be empty"
+    assert arp_cap_a.arp_table == {}, "ARP table of A should still be empty"
 
     computer_a.add_connection(0, computer_b, 0)
 
@@ -0,0 +1,40 @@
+from wirecraft_server.networking import IPv4Address, IPv4Network
+from wirecraft_server.networking.routing import Route, RoutingTable
+
+
+def test_longest_prefix_match():
+    table = RoutingTable()
+    table.add_route(IPv4Network("0.0.0.0/0"), gateway=IPv4Address("10.0.0.1"), interface=0)
+    table.add_route(IPv4Network("192.168.0.0/16"), interface=1)
+    table.add_route(IPv4Network("192.168.1.0/24"), interface=2)
+
+    assert table.get_route(IPv4Address("192.168.1.5")) == Route(destination=IPv4Network("192.168.1.0/24"), interface=2)
+    assert table.get_route(IPv4Address("192.168.2.5")) == Route(destination=IPv4Network("192.168.0.0/16"), interface=1)
+    default = table.get_route(IPv4Address("8.8.8.8"))
+    assert default is not None
+    assert default.gateway == IPv4Address("10.0.0.1"), "The default route should be used"
+
+
+def test_route_metric_and_cache_invalidation():
+    table = RoutingTable()
+    assert table.get_route(IPv4Address("192.168.1.5")) is None
+
+    table.add_route(IPv4Network("192.168.1.0/24"), interface=1, metric=10)
+    route = table.get_route(IPv4Address("192.168.1.5"))
+    assert route is not None
+    assert route.interface == 1, "The cached miss should be invalidated by add_route"
+
+    table.add_route(IPv4Network("192.168.1.0/24"), interface=2, metric=5)
+    table.add_route(IPv4Network("192.168.1.0/24"), interface=3, metric=20)
+    route = table.get_route(IPv4Address("192.168.1.5"))
+    assert route is not None
+    assert route.interface == 2, "The route with the lowest metric should win"
+    assert len(table.table) == 3
+
+
+def test_bulk_load():
+    routes = [Route(destination=IPv4Network(f"10.{i >> 8}.{i & 0xFF}.0/24"), interface=i) for i in range(20_000)]
+    table = RoutingTable(table=routes)
+    route = table.get_route(IPv4Address("10.40.32.1"))
+    assert route is not None
+    assert route.interface == 40 << 8 | 32
@@ -0,0 +1,89 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from wirecraft_server.database import Cable, Device
+from wirecraft_server.networking import IPv4Address
+from wirecraft_server.networking.capabilities import ARPCapability, Layer2Switching
+from wirecraft_server.networking.engine import SimulationEngine
+from wirecraft_server.networking.requests import send_ping
+from wirecraft_server.networking.state import NetworkState
+from wirecraft_server.simulation import LevelNetwork
+from wirecraft_server.utils import id_to_mac
+
+
+def make_network(hosts: int = 2) -> LevelNetwork:
+    """Hosts connected to a switch: the host `i` (id `i`) has the IP address 192.168.0.`i`, on the port `i` of the switch."""
+    devices = [Device(id=100, name="sw", type="switch", x=0, y=0, level_id=0)]
+    devices += [
+        Device(id=i, name=f"pc{i}", type="pc", x=0, y=0, level_id=0, ip=f"192.168.0.{i}") for i in range(1, hosts + 1)
+    ]
+    cables = [Cable(id=i, device_id_1=i, port_1=1, device_id_2=100, port_2=i, level_id=0) for i in range(1, hosts + 1)]
+    return LevelNetwork.build(devices, cables)
+
+
+def capability[C: ARPCapability | Layer2Switching](
+    network: LevelNetwork, device_id: int, capability_type: type[C]
+) -> C:
+    capability = network.devices[device_id].get_capability(capability_type)
+    assert capability is not None
+    return capability
+
+
+def test_fork_is_copy_on_write():
+    network = make_network()
+    arp = capability(network, 1, ARPCapability)
+    base = NetworkState()
+    with base.activate():
+        arp.learn(IPv4Address("192.168.0.9"), id_to_mac(9))
+
+    fork = base.fork()
+    assert fork.read(arp.arp_table) is base.read(arp.arp_table), "A table should only be copied when written"
+    with fork.activate():
+        assert arp.lookup(IPv4Address("192.168.0.9")) == id_to_mac(9)
+        arp.learn(IPv4Address("192.168.0.8"), id_to_mac(8))
+    assert IPv4Address("192.168.0.8") not in base.read(arp.arp_table)
+    assert arp.arp_table == {}, "The live table should not be changed"
+
+
+def test_simulations_are_isolated():
+    network = make_network()
+    pc1 = network.devices[1]
+    state = network.state()
+
+    for _ in range(2):
+        with state.fork().activate():
+            assert capability(network, 1, ARPCapability).lookup(IPv4Address("192.168.0.2")) is None
+            assert send_ping(pc1, IPv4Address("192.168.0.2"))
+            assert capability(network, 100, Layer2Switching).lookup(pc1.mac_address) == 1
+
+    assert capability(network, 1, ARPCapability).arp_table == {}
+    assert capability(network, 100, Layer2Switching).lookup(pc1.mac_address) is None
+
+
+def test_prewarm():
+    network = make_network(hosts=3)
+    with network.state(prewarm=True).activate():
+        arp = capability(network, 1, ARPCapability)
+        assert arp.lookup(IPv4Address("192.168.0.3")) == id_to_mac(3)
+        switching = capability(network, 100, Layer2Switching)
+        assert [switching.lookup(id_to_mac(i)) for i in (1, 2, 3)] == [1, 2, 3]
+
+        # No ARP request is needed: only the echo request and the echo reply are sent through the switch.
+        engine = SimulationEngine()
+        probe = engine.ping(network.devices[1], IPv4Address("192.168.0.3"))
+        engine.run()
+        assert probe.success
+        assert engine.delivered_count == 4
+
+
+def test_parallel_simulations():
+    network = make_network(hosts=8)
+    state = network.state()
+
+    def ping(source: int) -> bool:
+        with state.fork().activate():
+            target = IPv4Address(f"192.168.0.{source % 8 + 1}")
+            return all(send_ping(network.devices[source], target) for _ in range(20))
+
+    with ThreadPoolExecutor(4) as executor:
+        assert all(executor.map(ping, range(1, 9)))
+    assert all(capability(network, i, ARPCapability).arp_table == {} for i in range(1, 9))
@@ -0,0 +1,65 @@
+import logging
+
+import pytest
+
+from wirecraft_server.networking import IPv4Address, IPv4Network, MacAddress, NetworkDevice
+from wirecraft_server.networking.capabilities import (
+    ARPCapability,
+    BasicEthernetFrameCapability,
+    ICMPCapability,
+    IPv4Capability,
+    Routing,
+)
+from wirecraft_server.networking.engine import SimulationEngine
+from wirecraft_server.networking.trace import PacketTrace
+
+
+def make_computer(mac: str, ip: str) -> NetworkDevice:
+    computer = NetworkDevice(mac_address=MacAddress(mac))
+    routing = Routing()
+    routing.routing_table.add_route(IPv4Network("192.168.0.0/24"))
+    computer.add_capability(
+        BasicEthernetFrameCapability(),
+        routing,
+        ARPCapability(),
+        IPv4Capability(ip_address=IPv4Address(ip)),
+        ICMPCapability(),
+    )
+    return computer
+
+
+def test_packet_trace():
+    computer_a = make_computer("AA:AA:AA:AA:AA:AA", "192.168.0.2")
+    computer_b = make_computer("BB:BB:BB:BB:BB:BB", "192.168.0.3")
+    computer_a.add_connection(0, computer_b, 0)
+
+    engine = SimulationEngine()
+    engine.trace = PacketTrace(size=6)
+    engine.ping(computer_a, IPv4Address("192.168.0.3"))
+    engine.run()
+
+    # The buffer only keeps the last events.
+    events = engine.trace.events()
+    assert [(event.device, event.action, event.summary) for event in events] == [
+        ("bb:bb:bb:bb:bb:bb", "send", "ARP reply 192.168.0.3 -> 192.168.0.2"),
+        ("aa:aa:aa:aa:aa:aa", "receive", "ARP reply 192.168.0.3 -> 192.168.0.2"),
+        ("aa:aa:aa:aa:aa:aa", "send", "ICMP echo request 192.168.0.2 -> 192.168.0.3 (ttl=64)"),
+        ("bb:bb:bb:bb:bb:bb", "receive", "ICMP echo request 192.168.0.2 -> 192.168.0.3 (ttl=64)"),
+        ("bb:bb:bb:bb:bb:bb", "send", "ICMP echo reply 192.168.0.3 -> 192.168.0.2 (ttl=64)"),
+        ("aa:aa:aa:aa:aa:aa", "receive", "ICMP echo reply 192.168.0.3 -> 192.168.0.2 (ttl=64)"),
+    ]
+    assert events[0].sequence == 3
+    assert [event.sequence for event in engine.trace.events(since=events[-2].sequence)] == [events[-1].sequence]
+
+
+def test_device_log_is_lazy(caplog: pytest.LogCaptureFixture):
+    class Unformattable:
+        def __str__(self) -> str:
+            raise AssertionError("The message should not be formatted")
+
+    device = NetworkDevice(mac_address=MacAddress("AA:AA:AA:AA:AA:AA"))
+    device.log("Value: %s", Unformattable())
+
+    with caplog.at_level(logging.DEBUG, logger="wirecraft_server.networking.trace"):
+        device.log("Value: %s", 42)
+    assert caplog.messages == ["[NetworkDevice] aa:aa:aa:aa:aa:aa : Value: 42"]
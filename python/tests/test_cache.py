@@ -0,0 +1,132 @@
+import asyncio
+
+import pytest
+from sqlmodel import select
+
+from wirecraft_server.database import Cable, Device, cache
+from wirecraft_server.database.cache import LevelCache
+
+
+async def test_level_cache_reads(level_cache: LevelCache):
+    level = await level_cache.get_level(0)
+    assert level.devices == {}
+    assert (level_cache.hits, level_cache.misses) == (0, 1)
+
+    device = await level_cache.add_device(Device(name="pc1", type="pc", x=0, y=0, level_id=0))
+    cable = await level_cache.add_cable(
+        Cable(device_id_1=device.id, port_1=0, device_id_2=device.id, port_2=1, level_id=0)
+    )
+
+    level = await level_cache.get_level(0)
+    assert level.devices == {device.id: device}
+    assert level.cables == {cable.id: cable}
+    assert await level_cache.get_device(device.id) is device
+    assert (level_cache.hits, level_cache.misses) == (2, 1)
+
+
+async def test_level_cache_write_through(level_cache: LevelCache):
+    device = await level_cache.add_device(Device(name="pc1", type="pc", x=0, y=0, level_id=0))
+
+    # The level is not cached yet, it is loaded from the device id.
+    updated = await level_cache.update_device(device.id, x=10, y=20)
+    assert (updated.x, updated.y) == (10, 20)
+    assert level_cache.misses == 1
+
+    async with cache.async_session() as session:
+        stored = (await session.exec(select(Device).where(Device.id == device.id))).one()
+    assert (stored.x, stored.y) == (10, 20), "The update should be written to the database"
+
+
+async def test_level_cache_write_during_load(level_cache: LevelCache, monkeypatch: pytest.MonkeyPatch):
+    read = asyncio.Event()
+    resume = asyncio.Event()
+    read_level = level_cache._read_level
+
+    async def slow_read_level(level_id: int):
+        level = await read_level(level_id)
+        read.set()
+        await resume.wait()
+        return level
+
+    monkeypatch.setattr(level_cache, "_read_level", slow_read_level)
+
+    # The level is read from the database before the device is added, and cached after.
+    loading = asyncio.create_task(level_cache.get_level(0))
+    await read.wait()
+    adding = asyncio.create_task(level_cache.add_device(Device(name="pc1", type="pc", x=0, y=0, level_id=0)))
+    await asyncio.sleep(0.01)
+    resume.set()
+    level = await loading
+    device = await adding
+
+    assert level.devices == {device.id: device}, "A device added during the load should be in the cached level"
+    assert (await level_cache.get_level(0)) is level
+
+
+async def test_level_cache_eviction(level_cache: LevelCache):
+    for level_id in range(3):
+        await level_cache.get_level(level_id)
+    assert level_cache.evictions == 1, "The least recently used level should be evicted"
+
+    await level_cache.get_level(2)
+    assert level_cache.hits == 1
+
+    level_cache.ttl = 0
+    level_cache.evict_idle()
+    assert level_cache.stats()["levels"] == 0, "Idle levels should be evicted"
+
+
+async def test_level_cache_positions_write_behind(level_cache: LevelCache):
+    await level_cache.get_level(0)
+    device = await level_cache.add_device(Device(name="pc1", type="pc", x=0, y=0, level_id=0))
+    other = await level_cache.add_device(Device(name="pc2", type="pc", x=0, y=0, level_id=0))
+
+    for step in range(10):
+        await level_cache.update_device_position(device.id, step, -step)
+    await level_cache.update_device_position(other.id, 42, 42)
+    assert (device.x, device.y) == (9, -9), "The position should be applied in memory right away"
+
+    async with cache.async_session() as session:
+        stored = (await session.exec(select(Device).where(Device.id == device.id))).one()
+        assert (stored.x, stored.y) == (0, 0), "The position should not be written before the flush"
+
+    # The level is evicted before the flush, the positions should not be lost when it is reloaded.
+    level_cache.clear()
+    device = await level_cache.get_device(device.id)
+    assert (device.x, device.y) == (9, -9)
+
+    await level_cache.flush_positions()
+    assert level_cache.flushed_positions == 2
+    async with cache.async_session() as session:
+        stored = (await session.exec(select(Device).where(Device.id == device.id))).one()
+        assert (stored.x, stored.y) == (9, -9)
+        stored = (await session.exec(select(Device).where(Device.id == other.id))).one()
+        assert (stored.x, stored.y) == (42, 42)
+
+
+async def test_level_cache_sync(level_cache: LevelCache):
+    level_cache.change_log_size = 3
+    initial = await level_cache.sync_level(0, since_version=0)
+    assert initial.snapshot, "An unknown version should get a snapshot"
+
+    device = await level_cache.add_device(Device(name="pc1", type="pc", x=0, y=0, level_id=0))
+    diff = await level_cache.sync_level(0, initial.version)
+    assert not diff.snapshot
+    assert diff.devices.added == [device]
+    assert diff.devices.updated == []
+    assert diff.version > initial.version
+
+    await level_cache.update_device_position(device.id, 1, 1)
+    await level_cache.update_device_position(device.id, 2, 2)
+    last = await level_cache.sync_level(0, diff.version)
+    assert last.devices.added == []
+    assert last.devices.updated == [device], "Multiple updates of the same device should be merged"
+
+    no_change = await level_cache.sync_level(0, last.version)
+    assert not no_change.snapshot
+    assert no_change.devices.updated == []
+
+    await level_cache.update_device_position(device.id, 3, 3)
+    truncated = await level_cache.sync_level(0, initial.version)
+    assert truncated.snapshot, "The change log has been truncated, a snapshot should be sent"
+    assert truncated.devices.added == [device]
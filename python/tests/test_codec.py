@@ -0,0 +1,44 @@
+from wirecraft_server.codec import COMPACT_CODEC, JSON_CODEC, Message
+from wirecraft_server.database import Device
+from wirecraft_server.handlers.devices import UpdateDevicePositionData
+from wirecraft_server.handlers_core import EventRouter
+from wirecraft_server.server import Server
+
+
+def test_message_encoded_once_per_codec():
+    message = Message("PING_RESPONSE", {"content": "pong"})
+    encoded = message.encode(JSON_CODEC)
+    assert encoded == b'{"t":"PING_RESPONSE","d":{"content":"pong"}}'
+    assert message.encode(JSON_CODEC) is encoded
+
+    compact = message.encode(COMPACT_CODEC)
+    assert COMPACT_CODEC.decode_message(compact) == ("PING_RESPONSE", {"content": "pong"})
+
+
+def test_compact_devices():
+    devices = [
+        Device(id=1, name="pc1", type="pc", x=-5, y=10, level_id=0, ip="192.168.1.1"),
+        Device(id=2, name="routeur é", type="router", x=0, y=0, level_id=0),
+    ]
+    message = Message("GET_LEVEL_DEVICES_RESPONSE", devices)
+    compact = message.encode(COMPACT_CODEC)
+    assert len(compact) < len(message.encode(JSON_CODEC))
+
+    event_type, decoded = COMPACT_CODEC.decode_message(compact)
+    assert event_type == "GET_LEVEL_DEVICES_RESPONSE"
+    assert decoded == [device.model_dump() for device in devices]
+
+
+def test_compact_position_update_is_routed():
+    router: EventRouter = Server().router
+    decoded = COMPACT_CODEC.decode(COMPACT_CODEC.encode_position(3, -10, 20))
+    parsed = router.parse(decoded)
+    assert parsed is not None
+    event, data = parsed
+    assert event.type == "UPDATE_DEVICE_POSITION"
+    assert data == UpdateDevicePositionData(device_id=3, x=-10, y=20)
+
+    # The other events are still JSON, after the generic opcode.
+    parsed = router.parse(COMPACT_CODEC.decode(b'\x00{"t":"GET_LEVEL_DEVICES","d":{"level_id":1}}'))
+    assert parsed is not None
+    assert parsed[0].type == "GET_LEVEL_DEVICES"
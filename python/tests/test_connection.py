@@ -0,0 +1,87 @@
+import asyncio
+from typing import cast
+
+from aiohttp import web
+
+from wirecraft_server.codec import Message
+from wirecraft_server.connection import Client
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent: list[bytes] = []
+        self.closed = False
+        self.blocked = asyncio.Event()
+
+    async def send_bytes(self, data: bytes):
+        await self.blocked.wait()
+        self.sent.append(data)
+
+    async def close(self):
+        self.closed = True
+
+
+async def test_client_send_queue():
+    ws = FakeWebSocket()
+    client = Client(cast(web.WebSocketResponse, ws), max_queue_size=3, policy="drop", drop_threshold=2)
+    client.start()
+
+    client.send(Message("a", None))
+    await asyncio.sleep(0)  # the writer task is now blocked sending "a"
+    client.send(Message("b", None), key=1)
+    client.send(Message("c", None), key=2)
+    client.send(Message("d", None), key=1)  # supersedes "b"
+    client.send(Message("e", None))
+    client.send(Message("f", None))  # the queue is full
+    assert client.queue_depth == 3
+    assert client.coalesced_count == 1
+    assert client.dropped_count == 1
+    assert not ws.closed
+
+    ws.blocked.set()
+    await asyncio.sleep(0.01)
+    assert ws.sent == [b'{"t":"a","d":null}', b'{"t":"d","d":null}', b'{"t":"c","d":null}', b'{"t":"e","d":null}']
+    assert client.queue_depth == 0
+
+    await client.stop()
+
+
+async def test_client_disconnect_policy():
+    ws = FakeWebSocket()
+    client = Client(cast(web.WebSocketResponse, ws), max_queue_size=1, policy="disconnect")
+    client.start()
+
+    client.send(Message("a", None))
+    await asyncio.sleep(0)
+    client.send(Message("b", None))
+    client.send(Message("c", None))
+    await asyncio.sleep(0)
+    assert ws.closed, "The slow client should be disconnected"
+
+    await client.stop()
+
+
+async def test_client_writer_failures():
+    ws = FakeWebSocket()
+    ws.blocked.set()
+    disconnected: list[Client] = []
+    client = Client(cast(web.WebSocketResponse, ws), on_disconnect=disconnected.append)
+    client.start()
+
+    client.send(Message("a", object()))  # can't be encoded
+    client.send(Message("b", None))
+    await asyncio.sleep(0.01)
+    assert ws.sent == [b'{"t":"b","d":null}'], "The writer should skip the message it can't encode"
+    assert client.dropped_count == 1
+    assert not disconnected
+
+    async def send_bytes(data: bytes):
+        raise RuntimeError("broken websocket")
+
+    ws.send_bytes = send_bytes
+    client.send(Message("c", None))
+    await asyncio.sleep(0.01)
+    assert ws.closed
+    assert disconnected == [client]
+
+    await client.stop()
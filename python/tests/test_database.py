@@ -0,0 +1,82 @@
+import os
+from pathlib import Path
+
+import pytest
+from sqlalchemy import ClauseElement, or_, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlmodel import col, select
+
+from wirecraft_server.context import ctx
+from wirecraft_server.database import Cable, Device, init_db
+from wirecraft_server.database.engine import DatabaseType, create_database_engine
+
+
+async def test_sqlite_pragmas(tmp_path: Path):
+    engine = create_database_engine("sqlite", str(tmp_path / "database.db"), sqlite_busy_timeout=2.5)
+    try:
+        async with engine.connect() as conn:
+            assert (await conn.execute(text("PRAGMA journal_mode"))).scalar() == "wal"
+            assert (await conn.execute(text("PRAGMA synchronous"))).scalar() == 1  # NORMAL
+            assert (await conn.execute(text("PRAGMA busy_timeout"))).scalar() == 2500
+    finally:
+        await engine.dispose()
+
+
+def test_postgresql_options():
+    engine = create_database_engine(
+        "postgresql", "user:password@localhost/wirecraft", pool_size=20, max_overflow=0, statement_cache_size=0
+    )
+    assert isinstance(engine.pool, AsyncAdaptedQueuePool)
+    assert engine.pool.size() == 20
+    assert engine.url.drivername == "postgresql+asyncpg"
+
+
+LEVEL_QUERIES = {
+    "level devices": select(Device).where(Device.level_id == 1),
+    "level cables": select(Cable).where(Cable.level_id == 1),
+    "device cables": select(Cable).where(or_(col(Cable.device_id_1) == 1, col(Cable.device_id_2) == 1)),
+}
+
+
+async def migrated_engine(monkeypatch: pytest.MonkeyPatch, database_type: DatabaseType, database: str) -> AsyncEngine:
+    monkeypatch.setattr(ctx, "reset_database", False)
+    engine = create_database_engine(database_type, database)
+    await init_db(engine)
+    return engine
+
+
+async def query_plan(conn: AsyncConnection, statement: ClauseElement) -> str:
+    query = str(statement.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+    if conn.dialect.name == "sqlite":
+        rows = await conn.execute(text(f"EXPLAIN QUERY PLAN {query}"))
+        return "\n".join(row.detail for row in rows)
+    # Without this, PostgreSQL scans the (small) test tables instead of using the indexes.
+    await conn.execute(text("SET enable_seqscan = off"))
+    rows = await conn.execute(text(f"EXPLAIN {query}"))
+    return "\n".join(row[0] for row in rows)
+
+
+@pytest.mark.parametrize("query", LEVEL_QUERIES)
+async def test_sqlite_query_plan(monkeypatch: pytest.MonkeyPatch, tmp_path: Path, query: str):
+    engine = await migrated_engine(monkeypatch, "sqlite", str(tmp_path / "database.db"))
+    try:
+        async with engine.connect() as conn:
+            plan = await query_plan(conn, LEVEL_QUERIES[query])
+    finally:
+        await engine.dispose()
+    assert "USING INDEX" in plan
+    assert not any(line.startswith("SCAN") for line in plan.splitlines()), plan
+
+
+@pytest.mark.skipif("TEST_POSTGRESQL_DATABASE" not in os.environ, reason="TEST_POSTGRESQL_DATABASE is not set")
+@pytest.mark.parametrize("query", LEVEL_QUERIES)
+async def test_postgresql_query_plan(monkeypatch: pytest.MonkeyPatch, query: str):
+    engine = await migrated_engine(monkeypatch, "postgresql", os.environ["TEST_POSTGRESQL_DATABASE"])
+    try:
+        async with engine.connect() as conn:
+            plan = await query_plan(conn, LEVEL_QUERIES[query])
+    finally:
+        await engine.dispose()
+    assert "Index" in plan
+    assert "Seq Scan" not in plan, plan
@@ -0,0 +1,107 @@
+import asyncio
+from typing import Any, Literal, cast
+
+import pytest
+from aiohttp import web
+from pydantic import BaseModel
+
+from wirecraft_server import executor as executor_module
+from wirecraft_server.connection import Client
+from wirecraft_server.database import Cable, Device
+from wirecraft_server.database.cache import LevelCache
+from wirecraft_server.executor import EventExecutor
+from wirecraft_server.handlers_core import Event
+
+
+class LevelData(BaseModel):
+    level_id: int
+
+
+class DeviceData(BaseModel):
+    device_id: int
+
+
+class FakeEvent:
+    def __init__(self, type: str, scope: Literal["client", "level"], log: list[str], delay: float):
+        self.type = type
+        self.scope = scope
+        self.log = log
+        self.delay = delay
+
+    async def __call__(self, data: Any, client: Client):
+        self.log.append(f"start {self.type}")
+        await asyncio.sleep(self.delay)
+        self.log.append(f"end {self.type}")
+
+
+def make_event(type: str, scope: Literal["client", "level"], log: list[str], delay: float = 0.01) -> Event[Any, Any]:
+    return cast(Event[Any, Any], FakeEvent(type, scope, log, delay))
+
+
+async def test_reads_run_in_parallel():
+    log: list[str] = []
+    executor = EventExecutor(max_concurrency=8)
+    client = Client(cast(web.WebSocketResponse, None))
+
+    tasks = [executor.submit(make_event(f"GET_{i}", "client", log), LevelData(level_id=0), client) for i in range(3)]
+    await asyncio.gather(*tasks)
+
+    assert log[:3] == ["start GET_0", "start GET_1", "start GET_2"], "The reads should run concurrently"
+    assert executor.latencies["GET_0"].count == 1
+
+
+async def test_writes_keep_order():
+    log: list[str] = []
+    executor = EventExecutor(max_concurrency=8)
+    client_a = Client(cast(web.WebSocketResponse, None))
+    client_b = Client(cast(web.WebSocketResponse, None))
+
+    tasks = [
+        executor.submit(make_event("GET_A", "client", log, delay=0.02), LevelData(level_id=0), client_a),
+        executor.submit(make_event("ADD_B", "level", log), LevelData(level_id=0), client_b),
+        executor.submit(make_event("GET_B", "client", log), LevelData(level_id=0), client_b),
+        executor.submit(make_event("GET_OTHER_LEVEL", "client", log), LevelData(level_id=1), client_a),
+    ]
+    await asyncio.gather(*tasks)
+
+    assert log.index("end GET_A") < log.index("start ADD_B"), "The write should wait for the previous read"
+    assert log.index("end ADD_B") < log.index("start GET_B"), "The read should wait for the previous write"
+    assert log.index("start GET_OTHER_LEVEL") < log.index("end GET_A"), "Independent events should not wait"
+    assert not executor._keys, "The keys should be released once the events are done"
+
+
+async def test_concurrency_limit():
+    log: list[str] = []
+    executor = EventExecutor(max_concurrency=1)
+    clients = [Client(cast(web.WebSocketResponse, None)) for _ in range(2)]
+
+    tasks = [
+        executor.submit(make_event(f"GET_{i}", "client", log), LevelData(level_id=i), client)
+        for i, client in enumerate(clients)
+    ]
+    await asyncio.gather(*tasks)
+
+    assert log == ["start GET_0", "end GET_0", "start GET_1", "end GET_1"]
+
+
+async def test_device_events_keep_level_order(level_cache: LevelCache, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(executor_module, "level_cache", level_cache)
+    await level_cache.get_level(0)
+    device = await level_cache.add_device(Device(name="pc1", type="pc", x=0, y=0, level_id=0))
+    log: list[str] = []
+    executor = EventExecutor(max_concurrency=8)
+    client_a = Client(cast(web.WebSocketResponse, None))
+    client_b = Client(cast(web.WebSocketResponse, None))
+
+    cable = Cable(device_id_1=device.id, port_1=0, device_id_2=device.id, port_2=1, level_id=0)
+    tasks = [
+        executor.submit(
+            make_event("UPDATE_DEVICE", "level", log, delay=0.02), DeviceData(device_id=device.id), client_a
+        ),
+        executor.submit(make_event("ADD_CABLE", "level", log), cable, client_b),
+    ]
+    await asyncio.gather(*tasks)
+
+    assert log == ["start UPDATE_DEVICE", "end UPDATE_DEVICE", "start ADD_CABLE", "end ADD_CABLE"], (
+        "The changes of a device and of its level should be serialized"
+    )
@@ -0,0 +1,174 @@
+import time
+from collections.abc import Hashable, Sequence
+from typing import TYPE_CHECKING, cast
+
+import pytest
+
+from wirecraft_server.codec import Message
+from wirecraft_server.connection import LevelSubscriptions
+from wirecraft_server.context import ctx
+from wirecraft_server.database import Cable, Device
+from wirecraft_server.database.cache import LevelCache
+from wirecraft_server.grading import Grader, GradingBackend
+from wirecraft_server.handlers import simulation as simulation_handlers
+from wirecraft_server.handlers.simulation import GetSimulationTraceData, SimulationHandler
+from wirecraft_server.networking import NetworkDevice
+from wirecraft_server.reachability import Reachability
+from wirecraft_server.static import levels
+from wirecraft_server.static.base import Level, Task
+from wirecraft_server.static.tests import DevicePresenceTest, Test as LevelTest
+
+if TYPE_CHECKING:
+    from wirecraft_server.connection import Client
+    from wirecraft_server.server import Server
+
+
+class SlowTest(LevelTest):
+    duration: float
+
+    def __call__(
+        self,
+        devices: Sequence[Device],
+        network: dict[int, NetworkDevice],
+        map_names: dict[str, int],
+        reachability: Reachability | None = None,
+    ):
+        time.sleep(self.duration)
+
+
+class RecordingServer:
+    def __init__(self):
+        self.subscriptions = LevelSubscriptions()
+
+
+class RecordingClient:
+    def __init__(self):
+        self.level_id: int | None = None
+        self.messages: list[Message] = []
+
+    def send(self, message: Message, key: Hashable | None = None):
+        self.messages.append(message)
+
+
+@pytest.mark.parametrize("prewarm", [False, True])
+@pytest.mark.parametrize("backend", ["inline", "thread", "process"])
+async def test_grade(level_cache: LevelCache, backend: GradingBackend, prewarm: bool):
+    level_data = await level_cache.get_level(1)
+    pc1 = await level_cache.add_device(Device(name="pc1", type="pc", x=0, y=0, level_id=1, ip="192.168.0.2"))
+    pc2 = await level_cache.add_device(Device(name="pc2", type="pc", x=0, y=0, level_id=1, ip="192.168.0.4"))
+    switch = await level_cache.add_device(Device(name="sw", type="switch", x=0, y=0, level_id=1))
+    for port, device in enumerate((pc1, pc2)):
+        await level_cache.add_cable(
+            Cable(device_id_1=device.id, port_1=1, device_id_2=switch.id, port_2=port, level_id=1)
+        )
+
+    grader = Grader(backend, workers=2, prewarm=prewarm)
+    try:
+        tasks = await grader.grade(levels[1], level_data)
+        assert [task.completed for task in tasks] == [False, True]
+        assert tasks[0].error_message == "Ping from pc1 to 192.168.0.3 failed."
+
+        await level_cache.update_device(pc2.id, ip="192.168.0.3")
+        tasks = await grader.grade(levels[1], level_data)
+        assert [task.completed for task in tasks] == [True, True]
+    finally:
+        grader.close()
+
+    assert all(task.completed is None for task in levels[1].tasks), "The static level should not be changed"
+    assert grader.stats()["launches"] == 2
+    if backend != "process":
+        assert level_data.network is not None, "The live network of the level should be used"
+
+
+async def test_grade_timeout(level_cache: LevelCache):
+    level_data = await level_cache.get_level(0)
+    level = Level(
+        id=0,
+        tasks=[
+            Task(name="slow", description="", tests=[SlowTest(duration=1)]),
+            Task(name="fast", description="", tests=[DevicePresenceTest(name="pc1", type="pc")]),
+        ],
+    )
+
+    grader = Grader("thread", workers=2, timeout=0.1)
+    try:
+        start = time.perf_counter()
+        tasks = await grader.grade(level, level_data)
+        assert time.perf_counter() - start < 0.5, "The launch should not wait for the slow task"
+    finally:
+        grader.close()
+
+    assert tasks[0].completed is False
+    assert tasks[0].error_message == "The evaluation timed out after 0.1 seconds."
+    assert tasks[1].completed is False
+    assert tasks[1].error_message == "Device pc1 of type pc not found in the network."
+    assert grader.stats()["timeouts"] == 1
+    assert grader.stats()["abandoned"] == 1, "The running slow task can't be cancelled"
+    assert level_data.network is None, "The network read by the abandoned worker must not be patched anymore"
+
+
+async def test_grade_cache(level_cache: LevelCache):
+    level_data = await level_cache.get_level(0)
+    pc1 = await level_cache.add_device(Device(name="pc1", type="pc", x=0, y=0, level_id=0))
+    switch = await level_cache.add_device(Device(name="switch", type="switch", x=0, y=0, level_id=0))
+    await level_cache.add_cable(Cable(device_id_1=pc1.id, port_1=1, device_id_2=switch.id, port_2=0, level_id=0))
+
+    grader = Grader("inline")
+    tasks = await grader.grade(levels[0], level_data)
+    assert [task.completed for task in tasks] == [True, False, True, True, False]
+    assert grader.stats()["cache_misses"] == 5
+
+    # Nothing changed (the positions are not part of the fingerprints).
+    await level_cache.update_device(pc1.id, x=10, y=10)
+    assert [task.completed for task in await grader.grade(levels[0], level_data)] == [True, False, True, True, False]
+    assert grader.stats()["cache_hits"] == 5
+
+    # Only the tasks depending on pc2 are evaluated again.
+    pc2 = await level_cache.add_device(Device(name="pc2", type="pc", x=0, y=0, level_id=0))
+    await level_cache.add_cable(Cable(device_id_1=pc2.id, port_1=1, device_id_2=switch.id, port_2=1, level_id=0))
+    tasks = await grader.grade(levels[0], level_data)
+    assert [task.completed for task in tasks] == [True, True, True, True, True]
+    stats = grader.stats()
+    assert stats["cache_hits"] == 5 + 3
+    assert stats["cache_misses"] == 5 + 2
+
+
+async def test_grade_cache_eviction(level_cache: LevelCache):
+    level_data = await level_cache.get_level(0)
+    grader = Grader("inline", cache_size=2)
+    await grader.grade(levels[0], level_data)
+    assert grader.stats()["cached_results"] == 2
+
+    # Only the results of the last 2 tasks are kept.
+    await grader.grade(levels[0], level_data)
+    assert grader.stats()["cache_hits"] == 2
+    assert grader.stats()["cache_misses"] == 5 + 3
+
+
+@pytest.mark.parametrize("backend", ["inline", "thread"])
+async def test_grade_trace(level_cache: LevelCache, monkeypatch: pytest.MonkeyPatch, backend: GradingBackend):
+    monkeypatch.setattr(ctx, "simulation_trace_size", 64)
+    monkeypatch.setattr(simulation_handlers, "level_cache", level_cache)
+    level_data = await level_cache.get_level(1)
+    pc1 = await level_cache.add_device(Device(name="pc1", type="pc", x=0, y=0, level_id=1, ip="192.168.0.2"))
+    pc2 = await level_cache.add_device(Device(name="pc2", type="pc", x=0, y=0, level_id=1, ip="192.168.0.3"))
+    await level_cache.add_cable(Cable(device_id_1=pc1.id, port_1=1, device_id_2=pc2.id, port_2=1, level_id=1))
+
+    client = RecordingClient()
+    handler = SimulationHandler(cast("Server", RecordingServer()))
+    data = GetSimulationTraceData(level_id=1)
+    # The trace of the level is recorded once a client asked for it.
+    await handler.get_simulation_trace(data, cast("Client", client))
+    assert client.messages[-1].data == []
+
+    grader = Grader(backend)
+    try:
+        tasks = await grader.grade(levels[1], level_data)
+    finally:
+        grader.close()
+    assert all(task.completed for task in tasks)
+
+    await handler.get_simulation_trace(data, cast("Client", client))
+    summaries = {event.summary for event in client.messages[-1].data}
+    assert "ICMP echo request 192.168.0.2 -> 192.168.0.3 (ttl=64)" in summaries
+    assert "ICMP echo reply 192.168.0.3 -> 192.168.0.2 (ttl=64)" in summaries
@@ -0,0 +1,29 @@
+from wirecraft_server.database import Device
+from wirecraft_server.handlers.devices import UpdateDevicePositionData
+from wirecraft_server.server import Server
+
+
+def test_router_parse():
+    router = Server().router
+
+    parsed = router.parse('{"t": "UPDATE_DEVICE_POSITION", "d": {"device_id": 1, "x": 10, "y": -20}}')
+    assert parsed is not None, "The event should be handled"
+    event, data = parsed
+    assert event.type == "UPDATE_DEVICE_POSITION"
+    assert data == UpdateDevicePositionData(device_id=1, x=10, y=-20)
+
+    parsed = router.parse(b'{"t": "ADD_DEVICE", "d": {"name": "pc1", "type": "pc", "x": 0, "y": 0, "level_id": 0}}')
+    assert parsed is not None, "The event should be handled"
+    _, data = parsed
+    assert isinstance(data, Device)
+    assert data.name == "pc1"
+
+
+def test_router_parse_invalid():
+    router = Server().router
+
+    assert router.parse('{"t": "UNKNOWN_EVENT", "d": {}}') is None, "Unknown events should not be handled"
+    assert router.parse('{"d": {}}') is None, "Messages without type should not be handled"
+    assert router.parse('{"t": "UPDATE_DEVICE_POSITION", "d": {"device_id": 1}}') is None, "Data should be validated"
+    assert router.parse('{"t": "ADD_DEVICE", "d": {"name": "pc1"}}') is None, "SQLModel tables should be validated"
+    assert router.parse("not a json") is None, "Invalid JSON should not be handled"
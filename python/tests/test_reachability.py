@@ -0,0 +1,103 @@
+import random
+import re
+
+import pytest
+
+from wirecraft_server.database import Cable, Device
+from wirecraft_server.networking import IPv4Address
+from wirecraft_server.networking.engine import SimulationEngine
+from wirecraft_server.reachability import Reachability, UnionFind
+from wirecraft_server.simulation import LevelNetwork
+from wirecraft_server.static.tests import PingTest, TestFailure as PingFailure
+
+
+def make_device(device_id: int, type: str = "pc", ip: str | None = None) -> Device:
+    return Device(id=device_id, name=f"{type}{device_id}", type=type, x=0, y=0, level_id=0, ip=ip)
+
+
+def make_cable(cable_id: int, device_1: int, port_1: int, device_2: int, port_2: int) -> Cable:
+    return Cable(id=cable_id, device_id_1=device_1, port_1=port_1, device_id_2=device_2, port_2=port_2, level_id=0)
+
+
+def test_union_find():
+    sets = UnionFind[int]()
+    assert not sets.connected(1, 2)
+    sets.union(1, 2)
+    sets.union(3, 4)
+    sets.union(2, 4)
+    assert sets.connected(1, 3)
+    assert not sets.connected(1, 5)
+    assert len(sets) == 4
+
+
+def test_broadcast_domains():
+    devices = [make_device(i, ip=f"192.168.0.{i}") for i in range(1, 7)] + [make_device(10, "switch")]
+    cables = [
+        make_cable(1, 1, 1, 10, 1),
+        make_cable(2, 2, 1, 10, 2),
+        # A PC with two ports doesn't forward the frames: 4 and 6 are connected, but not in the same domain.
+        make_cable(3, 4, 1, 5, 1),
+        make_cable(4, 5, 2, 6, 1),
+    ]
+    reachability = Reachability.build(devices, cables)
+
+    assert reachability.connected(1, 2)
+    assert reachability.connected(4, 6)
+    assert not reachability.connected(1, 3)
+    assert reachability.same_domain(1, 1, 2, 1)
+    assert not reachability.same_domain(4, 1, 6, 1)
+
+    assert reachability.can_reach(1, 1, IPv4Address("192.168.0.2"))
+    assert not reachability.can_reach(1, 1, IPv4Address("192.168.0.3"))
+    assert not reachability.can_reach(1, 1, IPv4Address("192.168.0.1")), "A device can't reach itself"
+    assert reachability.can_reach(4, 1, IPv4Address("192.168.0.5"))
+    assert not reachability.can_reach(4, 1, IPv4Address("192.168.0.6"))
+
+    devices[2].ip = "192.168.0.7"
+    reachability.update_device(devices[2])
+    reachability.add_cable(make_cable(5, 3, 1, 10, 3))
+    assert reachability.can_reach(1, 1, IPv4Address("192.168.0.7"))
+    assert not reachability.can_reach(1, 1, IPv4Address("192.168.0.3"))
+
+    reachability.remove_cable(1)
+    assert not reachability.connected(1, 2)
+    reachability.remove_device(5)
+    assert not reachability.connected(4, 6)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_consistent_with_simulation(seed: int):
+    """A ping can only succeed if the destination is reachable at L2."""
+    rng = random.Random(seed)
+    devices = [make_device(i, ip=f"192.168.0.{i}") for i in range(1, 9)]
+    devices += [make_device(i, "switch") for i in range(10, 14)]
+    free_ports = {device.id: list(range(1, 3) if device.type == "pc" else range(1, 5)) for device in devices}
+    cables: list[Cable] = []
+    for cable_id in range(12):
+        device_1, device_2 = rng.sample([device_id for device_id, ports in free_ports.items() if ports], 2)
+        cables.append(
+            make_cable(cable_id, device_1, free_ports[device_1].pop(0), device_2, free_ports[device_2].pop(0))
+        )
+    network = LevelNetwork.build(devices, cables)
+
+    for source in range(1, 9):
+        for destination in range(1, 9):
+            state = network.state()
+            with state.activate():
+                engine = SimulationEngine()
+                probe = engine.ping(network.devices[source], IPv4Address(f"192.168.0.{destination}"))
+                engine.run()
+            if probe.success:
+                assert network.reachability.can_reach(source, 1, IPv4Address(f"192.168.0.{destination}"))
+
+
+def test_ping_test_fails_fast(monkeypatch: pytest.MonkeyPatch):
+    network = LevelNetwork.build([make_device(1, ip="192.168.0.1"), make_device(2, ip="192.168.0.2")], [])
+
+    def ping(*args: object):
+        raise AssertionError("The ping should not be simulated")
+
+    monkeypatch.setattr(SimulationEngine, "ping", ping)
+    test = PingTest(source="pc1", destination=IPv4Address("192.168.0.2"))
+    with pytest.raises(PingFailure, match=re.escape("Ping from pc1 to 192.168.0.2 failed.")):
+        test(devices=[], network=network.devices, map_names=network.names, reachability=network.reachability)
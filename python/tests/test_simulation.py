@@ -0,0 +1,41 @@
+from wirecraft_server.database import Cable, Device
+from wirecraft_server.database.cache import LevelCache
+from wirecraft_server.networking import IPv4Address
+from wirecraft_server.networking.capabilities import ARPCapability, IPv4Capability
+from wirecraft_server.networking.requests import send_ping
+from wirecraft_server.simulation import get_level_network
+
+
+async def test_level_network_is_patched(level_cache: LevelCache):
+    level = await level_cache.get_level(0)
+    pc1 = await level_cache.add_device(Device(name="pc1", type="pc", x=0, y=0, level_id=0, ip="192.168.0.1"))
+    network = get_level_network(level)
+    assert set(network.devices) == {pc1.id}
+    assert get_level_network(level) is network, "The network should be built only once"
+
+    pc2 = await level_cache.add_device(Device(name="pc2", type="pc", x=0, y=0, level_id=0, ip="192.168.0.2"))
+    switch = await level_cache.add_device(Device(name="sw", type="switch", x=0, y=0, level_id=0))
+    for port, device in enumerate((pc1, pc2)):
+        await level_cache.add_cable(
+            Cable(device_id_1=device.id, port_1=1, device_id_2=switch.id, port_2=port, level_id=0)
+        )
+    assert network.names == {"pc1": pc1.id, "pc2": pc2.id, "sw": switch.id}
+    assert send_ping(network.devices[pc1.id], IPv4Address("192.168.0.2"))
+
+    await level_cache.update_device(pc2.id, ip="192.168.0.3", name="pc3")
+    assert network.names["pc3"] == pc2.id
+    assert "pc2" not in network.names
+    ipv4 = network.devices[pc2.id].get_capability(IPv4Capability)
+    assert ipv4 is not None
+    assert ipv4.ip_address == IPv4Address("192.168.0.3")
+
+    network.reset()
+    arp = network.devices[pc1.id].get_capability(ARPCapability)
+    assert arp is not None
+    assert arp.arp_table == {}, "The learned state should be forgotten"
+    assert send_ping(network.devices[pc1.id], IPv4Address("192.168.0.3"))
+    assert not send_ping(network.devices[pc1.id], IPv4Address("192.168.0.2"))
+
+    network.remove_device(switch.id)
+    assert not network.devices[pc1.id].connected_devices.root
+    assert "sw" not in network.names
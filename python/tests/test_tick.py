@@ -0,0 +1,112 @@
+import asyncio
+import time
+
+from wirecraft_server.tick import TickScheduler
+
+
+async def test_jobs_priority_and_interval():
+    scheduler = TickScheduler(rate=100)
+    log: list[str] = []
+
+    async def low():
+        log.append("low")
+
+    async def high():
+        log.append("high")
+
+    async def rare():
+        log.append("rare")
+
+    scheduler.add_job("low", low, priority=-1)
+    scheduler.add_job("high", high, priority=1)
+    scheduler.add_job("rare", rare, interval=3600)
+
+    await scheduler.run_tick()
+    await scheduler.run_tick()
+    assert log == ["high", "low", "high", "low"], "The jobs should run by priority, and only when they are due"
+    assert scheduler.tick == 2
+
+
+async def test_jobs_deferred_when_tick_budget_spent():
+    scheduler = TickScheduler(rate=100)
+    log: list[str] = []
+
+    async def slow():
+        time.sleep(0.02)  # noqa: ASYNC251 the job blocks the loop on purpose
+        log.append("slow")
+
+    async def other():
+        log.append("other")
+
+    scheduler.add_job("slow", slow, priority=1, budget=0.01)
+    scheduler.add_job("other", other)
+
+    await scheduler.run_tick()
+    assert log == ["slow"]
+    stats = scheduler.stats()["jobs"]
+    assert stats["other"]["deferred"] == 1
+    assert stats["slow"]["overruns"] == 1
+
+
+async def test_overload_slows_down_and_recovers():
+    scheduler = TickScheduler(rate=100, min_rate=10)
+    busy = True
+
+    async def work():
+        if busy:
+            time.sleep(0.02)  # noqa: ASYNC251
+
+    scheduler.add_job("work", work)
+    for _ in range(30):
+        await scheduler.run_tick()
+    assert scheduler.overloaded
+    assert scheduler.current_rate < 100
+    assert scheduler.current_rate >= 10
+
+    busy = False
+    for _ in range(60):
+        await scheduler.run_tick()
+    assert not scheduler.overloaded
+    assert scheduler.current_rate == 100
+
+
+async def test_bounded_catch_up():
+    scheduler = TickScheduler(rate=100, max_catch_up=2)
+    stop = asyncio.Event()
+    blocked = False
+
+    async def block():
+        nonlocal blocked
+        if not blocked:
+            blocked = True
+            time.sleep(0.1)  # noqa: ASYNC251 about 10 ticks late
+        elif scheduler.tick >= 6:
+            stop.set()
+
+    scheduler.add_job("block", block)
+    await asyncio.wait_for(scheduler.run(stop), timeout=5)
+    assert scheduler.skipped_ticks >= 5, "The late ticks beyond the catch-up limit should be skipped"
+    assert scheduler.max_lag >= 0.05
+
+
+async def test_deferred_jobs_are_not_starved():
+    scheduler = TickScheduler(rate=100, max_deferrals=3)
+    log: list[str] = []
+
+    async def slow():
+        time.sleep(0.02)  # noqa: ASYNC251 every tick overruns its budget
+        log.append("slow")
+
+    async def flush():
+        log.append("flush")
+
+    scheduler.add_job("slow", slow, priority=1)
+    scheduler.add_job("flush", flush, priority=-10)
+
+    for _ in range(8):
+        await scheduler.run_tick()
+    assert log.count("slow") == 8
+    assert log.count("flush") == 2, "The job should run after being deferred 3 ticks in a row"
+    stats = scheduler.stats()["jobs"]["flush"]
+    assert stats["deferred"] == 6
+    assert stats["forced"] == 2
@@ -0,0 +1,135 @@
+import json
+from collections.abc import Hashable, Iterable
+from typing import TYPE_CHECKING, cast
+
+import pytest
+
+from wirecraft_server.codec import Message
+from wirecraft_server.connection import LevelSubscriptions
+from wirecraft_server.database import cache, topology
+from wirecraft_server.database.cache import LevelCache
+from wirecraft_server.handlers.topology import ExportTopologyData, ImportTopologyData, TopologyHandler
+
+if TYPE_CHECKING:
+    from wirecraft_server.connection import Client
+    from wirecraft_server.server import Server
+
+TOPOLOGY: list[dict[str, object]] = [
+    {"kind": "device", "id": 10, "name": "sw1", "type": "switch", "x": 0, "y": 0},
+    {"kind": "device", "id": 20, "name": "pc1", "type": "pc", "x": 1, "y": 2, "ip": "192.168.0.1"},
+    {"kind": "device", "id": 30, "name": "pc2", "type": "pc", "x": 3, "y": 4, "ip": "192.168.0.2", "deletable": False},
+    {"kind": "cable", "device_id_1": 10, "port_1": 1, "device_id_2": 20, "port_2": 1},
+    {"kind": "cable", "device_id_1": 10, "port_1": 2, "device_id_2": 30, "port_2": 1},
+]
+
+
+@pytest.fixture
+def topology_cache(level_cache: LevelCache, monkeypatch: pytest.MonkeyPatch) -> LevelCache:
+    # The level cache fixture already uses the test database.
+    monkeypatch.setattr(topology, "async_session", cache.async_session)
+    monkeypatch.setattr(topology, "level_cache", level_cache)
+    return level_cache
+
+
+def lines(records: list[dict[str, object]]) -> list[str]:
+    return [json.dumps(record) + "\n" for record in records]
+
+
+async def export(level_id: int) -> list[dict[str, object]]:
+    return [json.loads(line) async for line in topology.export_topology(level_id)]
+
+
+async def test_import_export(topology_cache: LevelCache):
+    level = await topology_cache.get_level(1)
+    version = level.version
+
+    result = await topology.import_topology(1, lines(TOPOLOGY))
+    assert (result.devices, result.cables) == (3, 2)
+
+    # The cached level has been reloaded with the new devices and cables.
+    level = await topology_cache.get_level(1)
+    assert sorted(device.name for device in level.devices.values()) == ["pc1", "pc2", "sw1"]
+    assert len(level.cables) == 2
+    assert level.diff(version).snapshot
+
+    exported = await export(1)
+    ids = {record["name"]: record["id"] for record in exported if record["kind"] == "device"}
+    assert [record["kind"] for record in exported] == ["device"] * 3 + ["cable"] * 2
+    assert exported[-1] == {
+        "kind": "cable",
+        "device_id_1": ids["sw1"],
+        "port_1": 2,
+        "device_id_2": ids["pc2"],
+        "port_2": 1,
+    }
+    pc2 = next(record for record in exported if record["name"] == "pc2")
+    assert pc2["deletable"] is False
+
+    # An export can be imported in another level.
+    await topology.import_topology(2, lines(exported))
+    assert len(await export(2)) == 5
+
+
+async def test_import_replace(topology_cache: LevelCache):
+    await topology.import_topology(1, lines(TOPOLOGY))
+    await topology.import_topology(1, lines(TOPOLOGY[:1]), replace=True)
+    level = await topology_cache.get_level(1)
+    assert [device.name for device in level.devices.values()] == ["sw1"]
+    assert level.cables == {}
+
+
+@pytest.mark.parametrize(
+    "records",
+    [
+        [*TOPOLOGY[:1], {"kind": "cable", "device_id_1": 10, "port_1": 1, "device_id_2": 99, "port_2": 1}],
+        [*TOPOLOGY[:1], *TOPOLOGY[:1]],
+        [{"kind": "router", "id": 1}],
+    ],
+)
+async def test_import_invalid(topology_cache: LevelCache, records: list[dict[str, object]]):
+    with pytest.raises(topology.TopologyLineError, match="Invalid topology line"):
+        await topology.import_topology(1, lines(records))
+    # Nothing has been imported.
+    assert await export(1) == []
+
+
+class RecordingClient:
+    def __init__(self):
+        self.level_id: int | None = None
+        self.messages: list[Message] = []
+
+    def send(self, message: Message, key: Hashable | None = None):
+        self.messages.append(message)
+
+
+class RecordingServer:
+    def __init__(self):
+        self.subscriptions = LevelSubscriptions()
+
+    async def broadcast(self, message: Message, clients: "Iterable[Client] | None" = None, key: Hashable | None = None):
+        for client in clients or ():
+            client.send(message, key)
+
+
+async def test_topology_handler(topology_cache: LevelCache):
+    client = RecordingClient()
+    handler = TopologyHandler(cast("Server", RecordingServer()))
+
+    invalid = "".join(lines([*TOPOLOGY[:1], {"kind": "router", "id": 1}]))
+    await handler.import_topology(ImportTopologyData(level_id=1, topology=invalid), cast("Client", client))
+    response = client.messages[-1]
+    assert response.type == "IMPORT_TOPOLOGY_RESPONSE"
+    assert response.data.line == 2
+    assert response.data.error.startswith("Invalid topology line 2:")
+    assert (response.data.devices, response.data.cables) == (0, 0)
+
+    await handler.import_topology(
+        ImportTopologyData(level_id=1, topology="".join(lines(TOPOLOGY))), cast("Client", client)
+    )
+    response = client.messages[-1]
+    assert (response.data.devices, response.data.cables, response.data.error) == (3, 2, None)
+
+    await handler.export_topology(ExportTopologyData(level_id=1), cast("Client", client))
+    response = client.messages[-1]
+    assert response.type == "EXPORT_TOPOLOGY_RESPONSE"
+    assert len(response.data.topology.splitlines()) == 5
@@ -17,3 +17,12 @@ def test_id_to_mac():
     id_from_mac = utils.mac_to_id(mac)
     # Check if we can revert the MAC address back to the original ID
     assert id == id_from_mac, f"Expected ID {id}, got {id_from_mac}"
+
+
+def test_id_to_mac_is_unicast_and_locally_administered():
+    for id in (0, 1, 42, 7983034, 0xFFFFFF):
+        first_byte = utils.id_to_mac(id).value >> 40
+        assert first_byte & 0x01 == 0, "The address should be unicast"
+        assert first_byte & 0x02 == 0x02, "The address should be locally administered"
+        assert utils.mac_to_id(utils.id_to_mac(id)) == id
+    assert utils.id_to_mac(1) != utils.id_to_mac(2)